@@ -0,0 +1,251 @@
+import hashlib
+import importlib.util
+import os
+import re
+import tempfile
+import sympy as sp
+from .Kinematics import Xmat_to_pose
+from .version import __version__
+
+# writes a standalone python module of numpy kernels specialized to one robot:
+#   forward_kinematics(q) -> (B, n+1, 4, 4) world poses (base at index 0, as Kinematics.forward_kinematics)
+#   inverse_dynamics(q, qd, qdd, gravity = 9.81) -> (B, n) (as Dynamics.inverse_dynamics)
+# every joint is unrolled with the structural zeros and constants of its Xmat, S, and I folded in by sympy,
+# common subexpressions of each step pulled out by sympy cse, and every scalar a (B,) array of the batch
+
+GENERATOR_VERSION = 1
+# directory (next to the URDF) kernels are cached in by default
+KERNEL_DIR = "urdf_kernels"
+
+def const(value):
+    # a sympy number that prints as the exact float (with integers kept exact so 0 and 1 fold away)
+    value = float(value)
+    if value.is_integer():
+        return sp.Integer(int(value))
+    return sp.Float(repr(value), 17)
+
+def code(expr):
+    # python source of an expression (bare numbers as the shortest round trip float)
+    if expr.is_Number:
+        return repr(float(expr))
+    return sp.pycode(expr)
+
+def cross(a, b):
+    return [a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0]]
+
+def motion_cross(v, m):
+    # v x m = [w x m_w; w x m_v + v_v x m_w]
+    w_m = cross(v[:3], m[:3])
+    v_m = [left + right for left, right in zip(cross(v[:3], m[3:]), cross(v[3:], m[:3]))]
+    return w_m + v_m
+
+def force_cross(v, f):
+    # v x* f = [w x f_n + v_v x f_l; w x f_l]
+    n_f = [left + right for left, right in zip(cross(v[:3], f[:3]), cross(v[3:], f[3:]))]
+    return n_f + cross(v[:3], f[3:])
+
+def matvec(matrix, vector):
+    return [sp.Add(*[matrix[row][col]*vector[col] for col in range(len(vector))]) for row in range(len(matrix))]
+
+def matTvec(matrix, vector):
+    return [sp.Add(*[matrix[row][col]*vector[row] for row in range(len(vector))]) for col in range(len(matrix[0]))]
+
+class KernelWriter:
+    # accumulates the statements of one kernel function in static single assignment form
+    def __init__(self):
+        self.lines = []
+        self.temps = sp.numbered_symbols("t")
+
+    def emit(self, line):
+        self.lines.append("    " + line)
+
+    def assign(self, prefix, exprs):
+        # bind each non-trivial expression to a new variable (numbers and plain variables are folded into later steps)
+        # and return the list of (folded) values
+        values = list(exprs)
+        todo = [ind for ind, expr in enumerate(values) if not (expr.is_Number or expr.is_Symbol)]
+        if len(todo) == 0:
+            return values
+        replacements, reduced = sp.cse([values[ind] for ind in todo], symbols = self.temps)
+        for symbol, expr in replacements:
+            self.emit(str(symbol) + " = " + sp.pycode(expr))
+        for ind, expr in zip(todo, reduced):
+            if expr.is_Number or expr.is_Symbol:
+                values[ind] = expr
+            else:
+                values[ind] = sp.Symbol(prefix + "_" + str(ind))
+                self.emit(str(values[ind]) + " = " + sp.pycode(expr))
+        return values
+
+    def source(self, signature):
+        return "def " + signature + ":\n" + "\n".join(self.lines) + "\n"
+
+class CodeGenerator:
+    def __init__(self, robot):
+        self.robot = robot
+        self.arrays = robot.to_arrays()
+        self.joints = robot.get_joints_ordered_by_id()
+        self.n = len(self.joints)
+
+    def get_joint_variables(self, writer, jid):
+        # emit the per joint inputs and return (u, v) with X = u*A + v*B + K
+        joint = self.joints[jid]
+        if joint.jtype == 'revolute':
+            writer.emit("c" + str(jid) + " = np.cos(q[" + str(jid) + "])")
+            writer.emit("s" + str(jid) + " = np.sin(q[" + str(jid) + "])")
+            return sp.Symbol("c" + str(jid)), sp.Symbol("s" + str(jid))
+        elif joint.jtype == 'prismatic':
+            writer.emit("q" + str(jid) + " = q[" + str(jid) + "]")
+            return sp.Symbol("q" + str(jid)), sp.Integer(0)
+        return sp.Integer(0), sp.Integer(0)
+
+    def get_Xmat(self, jid, u, v):
+        A, B, K = self.joints[jid].get_transformation_matrix_coefficients()
+        return [[const(A[row,col])*u + const(B[row,col])*v + const(K[row,col]) for col in range(6)] for row in range(6)]
+
+    def get_local_pose(self, jid, u, v):
+        # pose of the child in the parent = pose(X_fixed) * pose(X_free(q)) (as 3x4 rows)
+        joint = self.joints[jid]
+        fixed = [[const(value) for value in row] for row in Xmat_to_pose(self.arrays.Xfixed[jid])[:3]]
+        free = [[sp.Integer(int(row == col)) for col in range(4)] for row in range(3)]
+        axis = int(self.arrays.axis[jid])
+        if joint.jtype == 'revolute':
+            # rotation by theta about the axis (the transpose of the rx/ry/rz coordinate transforms)
+            first, second = [(1,2), (2,0), (0,1)][axis]
+            free[first][first] = u
+            free[second][second] = u
+            free[first][second] = -v
+            free[second][first] = v
+        elif joint.jtype == 'prismatic':
+            free[axis][3] = u
+        return [[sp.Add(*[fixed[row][ind]*free[ind][col] for ind in range(3)]) + (fixed[row][3] if col == 3 else 0) \
+                 for col in range(4)] for row in range(3)]
+
+    def generate_forward_kinematics(self):
+        writer = KernelWriter()
+        writer.emit("q, single, batch = as_batch(q)")
+        writer.emit("poses = np.zeros((" + str(self.n + 1) + ", 4, 4, batch))")
+        writer.emit("poses[:, 3, 3] = 1")
+        writer.emit("poses[0, 0, 0] = poses[0, 1, 1] = poses[0, 2, 2] = 1")
+        identity = [[sp.Integer(int(row == col)) for col in range(4)] for row in range(3)]
+        world = {-1: identity}
+        for jid in range(self.n):
+            writer.emit("# joint " + str(jid) + ": " + self.joints[jid].get_name())
+            u, v = self.get_joint_variables(writer, jid)
+            local = self.get_local_pose(jid, u, v)
+            parent = world[int(self.arrays.parent[jid])]
+            exprs = [sp.Add(*[parent[row][ind]*local[ind][col] for ind in range(3)]) + (parent[row][3] if col == 3 else 0) \
+                     for row in range(3) for col in range(4)]
+            values = writer.assign("T" + str(jid), exprs)
+            world[jid] = [values[4*row:4*row + 4] for row in range(3)]
+            for ind, value in enumerate(values):
+                if value == 0:
+                    continue
+                writer.emit("poses[" + str(jid + 1) + ", " + str(ind // 4) + ", " + str(ind % 4) + "] = " + code(value))
+        writer.emit("poses = np.ascontiguousarray(np.moveaxis(poses, -1, 0))")
+        writer.emit("return poses[0] if single else poses")
+        return writer.source("forward_kinematics(q)")
+
+    def generate_inverse_dynamics(self):
+        writer = KernelWriter()
+        writer.emit("(q, qd, qdd), single, batch = as_batch(q, qd, qdd)")
+        writer.emit("g0, g1, g2 = get_base_acceleration(gravity)")
+        writer.emit("tau = np.empty((" + str(self.n) + ", batch))")
+        a_base = [sp.Integer(0)]*3 + [sp.Symbol("g0"), sp.Symbol("g1"), sp.Symbol("g2")]
+        Xmats, v, a, f = {}, {}, {}, {}
+        # forward pass: velocities, accelerations, and net forces
+        for jid in range(self.n):
+            writer.emit("# joint " + str(jid) + ": " + self.joints[jid].get_name())
+            u, s = self.get_joint_variables(writer, jid)
+            Xmats[jid] = self.get_Xmat(jid, u, s)
+            writer.emit("qd" + str(jid) + " = qd[" + str(jid) + "]")
+            writer.emit("qdd" + str(jid) + " = qdd[" + str(jid) + "]")
+            S = [const(value) for value in self.arrays.S[jid]]
+            vJ = [value*sp.Symbol("qd" + str(jid)) for value in S]
+            aJ = [value*sp.Symbol("qdd" + str(jid)) for value in S]
+            I = [[const(value) for value in row] for row in self.arrays.I[jid + 1]]
+            parent = int(self.arrays.parent[jid])
+            if parent == -1:
+                v[jid] = writer.assign("v" + str(jid), vJ)
+                a[jid] = writer.assign("a" + str(jid), [left + right for left, right in zip(matvec(Xmats[jid], a_base), aJ)])
+            else:
+                v[jid] = writer.assign("v" + str(jid), [left + right for left, right in zip(matvec(Xmats[jid], v[parent]), vJ)])
+                a[jid] = writer.assign("a" + str(jid), [left + right + cross_term for left, right, cross_term in \
+                                       zip(matvec(Xmats[jid], a[parent]), aJ, motion_cross(v[jid], vJ))])
+            f[jid] = writer.assign("f" + str(jid), [left + right for left, right in \
+                                   zip(matvec(I, a[jid]), force_cross(v[jid], matvec(I, v[jid])))])
+        # backward pass: project onto the joints and propagate to the parents
+        for jid in range(self.n - 1, -1, -1):
+            S = [const(value) for value in self.arrays.S[jid]]
+            damping = const(self.arrays.damping[jid])
+            tau = sp.Add(*[value*force for value, force in zip(S, f[jid])]) + damping*sp.Symbol("qd" + str(jid))
+            writer.emit("tau[" + str(jid) + "] = " + code(tau))
+            parent = int(self.arrays.parent[jid])
+            if parent != -1:
+                f[parent] = writer.assign("f" + str(parent) + "_" + str(jid), [left + right for left, right in \
+                                          zip(f[parent], matTvec(Xmats[jid], f[jid]))])
+        writer.emit("tau = np.ascontiguousarray(tau.T)")
+        writer.emit("return tau[0] if single else tau")
+        return writer.source("inverse_dynamics(q, qd, qdd, gravity = 9.81)")
+
+    def generate(self):
+        header = ["# generated by URDFParser " + __version__ + " (code generator version " + str(GENERATOR_VERSION) + \
+                  ") for robot " + self.robot.get_name() + " -- do not edit", \
+                  "# joints (ordered by id): " + ", ".join([joint.get_name() for joint in self.joints]), \
+                  "import numpy as np", "", \
+                  "NUM_JOINTS = " + str(self.n), "", \
+                  "def as_batch(*arrays):", \
+                  "    # (n,) or (B, n) inputs -> (n, B) contiguous arrays so the values of each joint are contiguous", \
+                  "    arrays = [np.asarray(array, dtype=float) for array in arrays]", \
+                  "    single = arrays[0].ndim == 1", \
+                  "    arrays = np.broadcast_arrays(*[np.atleast_2d(array) for array in arrays])", \
+                  "    batch = arrays[0].shape[0]", \
+                  "    arrays = [np.ascontiguousarray(array.T) for array in arrays]", \
+                  "    return (arrays if len(arrays) > 1 else arrays[0]), single, batch", "", \
+                  "def get_base_acceleration(gravity):", \
+                  "    # gravity is either a magnitude acting along -z or a 3 vector (world frame)", \
+                  "    gravity = np.asarray(gravity, dtype=float)", \
+                  "    if gravity.ndim == 0:", \
+                  "        return 0.0, 0.0, float(gravity)", \
+                  "    return -float(gravity[0]), -float(gravity[1]), -float(gravity[2])", ""]
+        return "\n".join(header) + "\n" + self.generate_forward_kinematics() + "\n" + self.generate_inverse_dynamics()
+
+def generate_kernels(robot):
+    # python source of the kernel module for a robot
+    return CodeGenerator(robot).generate()
+
+def get_kernel_path(robot, cache_dir):
+    # the file name holds a hash of everything the kernels depend on (the model values and the generator version)
+    hasher = hashlib.sha256(robot.to_arrays().buffer.tobytes())
+    hasher.update((robot.get_name() + "|" + __version__ + "|" + str(GENERATOR_VERSION)).encode())
+    name = re.sub(r"[^0-9a-zA-Z_]", "_", robot.get_name())
+    return os.path.join(cache_dir, name + "_kernels_" + hasher.hexdigest()[:16] + ".py")
+
+def load_kernels(robot, cache_dir = None):
+    # load the kernel module of a robot from cache_dir (generating and saving it first if needed) which defaults to
+    # the KERNEL_DIR directory next to the robot's URDF
+    # note: the module is cached on the robot so later calls (until the robot is modified) are free
+    if "kernels" in robot.cache:
+        return robot.cache["kernels"]
+    if cache_dir is None:
+        if robot.base_dir is None:
+            raise ValueError("[!Error] The robot was not parsed from a file (or with a base_dir) so pass a cache_dir for its kernels!")
+        cache_dir = os.path.join(robot.base_dir, KERNEL_DIR)
+    path = get_kernel_path(robot, cache_dir)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok = True)
+        # write to a temp file and rename so concurrent processes never import a partial module
+        fd, temp_path = tempfile.mkstemp(dir = cache_dir, suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "w") as temp_file:
+                temp_file.write(generate_kernels(robot))
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    robot.cache["kernels"] = module
+    return module
@@ -0,0 +1,279 @@
+import numpy as np
+from .SpatialAlgebra import skew
+
+###########################
+#    Spatial Operators    #
+###########################
+
+def matvec(X, v):
+    return np.matmul(X, v[..., None])[..., 0]
+
+def matTvec(X, f):
+    return np.matmul(np.swapaxes(X, -1, -2), f[..., None])[..., 0]
+
+def motion_cross(v, m):
+    # v x m = [w x m_w; w x m_v + v_v x m_w]
+    w = v[..., :3]
+    cross = np.empty(np.broadcast_shapes(v.shape, m.shape))
+    cross[..., :3] = np.cross(w, m[..., :3])
+    cross[..., 3:] = np.cross(w, m[..., 3:]) + np.cross(v[..., 3:], m[..., :3])
+    return cross
+
+def force_cross(v, f):
+    # v x* f = [w x f_n + v_v x f_l; w x f_l]
+    w = v[..., :3]
+    cross = np.empty(np.broadcast_shapes(v.shape, f.shape))
+    cross[..., :3] = np.cross(w, f[..., :3]) + np.cross(v[..., 3:], f[..., 3:])
+    cross[..., 3:] = np.cross(w, f[..., 3:])
+    return cross
+
+def get_base_acceleration(gravity):
+    # gravity is either a magnitude acting along -z or a 3 vector (world frame)
+    # note: gravity is modeled as a fictitious upward acceleration of the fixed base
+    gravity = np.asarray(gravity, dtype=float)
+    if gravity.ndim == 0:
+        gravity = np.array([0, 0, -gravity])
+    return np.concatenate((np.zeros(3), -gravity))
+
+def as_batch(*arrays):
+    # (n,) or (B, n) inputs -> (B, n) float arrays and whether the inputs were a single sample
+    arrays = [np.asarray(array, dtype=float) for array in arrays]
+    single = arrays[0].ndim == 1
+    arrays = np.broadcast_arrays(*[np.atleast_2d(array) for array in arrays])
+    return single, [np.ascontiguousarray(array) for array in arrays]
+
+##########################
+#    Inverse Dynamics    #
+##########################
+
+def inverse_dynamics(robot, q, qd, qdd, gravity = 9.81):
+    # recursive Newton-Euler algorithm for a (B, n) batch of states (ordered by id) -> tau (B, n)
+    # note: every step of the forward and backward passes is vectorized across the batch
+    single, (q, qd, qdd) = as_batch(q, qd, qdd)
+    arrays = robot.to_arrays()
+    parent, S, I = arrays.parent, arrays.S, arrays.I
+    batch, n = q.shape
+    Xs = robot.eval_transforms(q)
+    a_base = get_base_acceleration(gravity)
+    v = np.empty((batch,n,6))
+    a = np.empty((batch,n,6))
+    f = np.empty((batch,n,6))
+    # forward pass: velocities, accelerations, and net forces
+    for jid in range(n):
+        vJ = qd[:,jid,None] * S[jid]
+        if parent[jid] == -1:
+            v[:,jid] = vJ
+            a[:,jid] = Xs[:,jid].apply_motion(a_base) + qdd[:,jid,None] * S[jid]
+        else:
+            v[:,jid] = Xs[:,jid].apply_motion(v[:,parent[jid]]) + vJ
+            a[:,jid] = Xs[:,jid].apply_motion(a[:,parent[jid]]) + qdd[:,jid,None] * S[jid] + motion_cross(v[:,jid], vJ)
+        f[:,jid] = matvec(I[jid+1], a[:,jid]) + force_cross(v[:,jid], matvec(I[jid+1], v[:,jid]))
+    # backward pass: project onto the joints and propagate to the parents
+    tau = np.empty((batch,n))
+    for jid in range(n - 1, -1, -1):
+        tau[:,jid] = np.matmul(f[:,jid], S[jid])
+        if parent[jid] != -1:
+            f[:,parent[jid]] += Xs[:,jid].transpose_apply(f[:,jid])
+    # joint damping
+    tau += arrays.damping * qd
+    return tau[0] if single else tau
+
+#####################
+#    Mass Matrix    #
+#####################
+
+def mass_matrix_sparsity(robot):
+    # (rows, cols) of the structurally non-zero lower triangle of H: each joint with itself and its ancestors
+    # note: cached with the other structure caches (read-only as every call shares them)
+    if "mass_matrix_sparsity" not in robot.cache:
+        rows = []
+        cols = []
+        for jid in range(robot.get_num_joints()):
+            for ancestor_id in [jid] + robot.get_ancestors_by_id(jid):
+                rows.append(jid)
+                cols.append(ancestor_id)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        rows.flags.writeable = False
+        cols.flags.writeable = False
+        robot.cache["mass_matrix_sparsity"] = (rows, cols)
+    return robot.cache["mass_matrix_sparsity"]
+
+def mass_matrix(robot, q, packed = False):
+    # composite rigid body algorithm for a (B, n) batch of configurations (ordered by id) -> H (B, n, n)
+    # note: only joint/ancestor pairs are computed, every other entry of H is structurally zero
+    # if packed, returns (values (B, nnz), (rows, cols)) holding the lower triangle of mass_matrix_sparsity
+    single, (q,) = as_batch(q)
+    arrays = robot.to_arrays()
+    parent, S = arrays.parent, arrays.S
+    batch, n = q.shape
+    Xs = robot.eval_transforms(q)
+    # backward pass: composite inertias
+    Ic = np.repeat(arrays.I[None, 1:], batch, axis=0)
+    for jid in range(n - 1, -1, -1):
+        if parent[jid] != -1:
+            Ic[:,parent[jid]] += Xs[:,jid].transform_inertia(Ic[:,jid])
+    # walk each joint's ancestors transforming its composite force
+    rows, cols = mass_matrix_sparsity(robot)
+    values = np.empty((batch, len(rows)))
+    ind = 0
+    for jid in range(n):
+        F = np.matmul(Ic[:,jid], S[jid])
+        values[:,ind] = np.matmul(F, S[jid])
+        ind += 1
+        curr_id = jid
+        while parent[curr_id] != -1:
+            F = Xs[:,curr_id].transpose_apply(F)
+            curr_id = parent[curr_id]
+            values[:,ind] = np.matmul(F, S[curr_id])
+            ind += 1
+    if packed:
+        return (values[0] if single else values), (rows, cols)
+    H = np.zeros((batch, n, n))
+    H[:, rows, cols] = values
+    H[:, cols, rows] = values
+    return H[0] if single else H
+
+##########################
+#    Forward Dynamics    #
+##########################
+
+def forward_dynamics(robot, q, qd, tau, gravity = 9.81):
+    # articulated body algorithm for a (B, n) batch of states (ordered by id) -> qdd (B, n)
+    # note: O(n) per sample with every step vectorized across the batch
+    single, (q, qd, tau) = as_batch(q, qd, tau)
+    arrays = robot.to_arrays()
+    parent, S = arrays.parent, arrays.S
+    batch, n = q.shape
+    Xs = robot.eval_transforms(q)
+    tau = tau - arrays.damping * qd
+    # forward pass: velocities, bias accelerations, and articulated inertias/bias forces
+    v = np.empty((batch,n,6))
+    c = np.empty((batch,n,6))
+    IA = np.repeat(arrays.I[None, 1:], batch, axis=0)
+    pA = np.empty((batch,n,6))
+    for jid in range(n):
+        vJ = qd[:,jid,None] * S[jid]
+        if parent[jid] == -1:
+            v[:,jid] = vJ
+            c[:,jid] = 0
+        else:
+            v[:,jid] = Xs[:,jid].apply_motion(v[:,parent[jid]]) + vJ
+            c[:,jid] = motion_cross(v[:,jid], vJ)
+        pA[:,jid] = force_cross(v[:,jid], matvec(IA[:,jid], v[:,jid]))
+    # backward pass: articulated inertias and bias forces
+    U = np.empty((batch,n,6))
+    D = np.empty((batch,n))
+    u = np.empty((batch,n))
+    for jid in range(n - 1, -1, -1):
+        U[:,jid] = np.matmul(IA[:,jid], S[jid])
+        D[:,jid] = np.matmul(U[:,jid], S[jid])
+        u[:,jid] = tau[:,jid] - np.matmul(pA[:,jid], S[jid])
+        if parent[jid] != -1:
+            Ia = IA[:,jid] - U[:,jid,:,None] * U[:,jid,None,:] / D[:,jid,None,None]
+            pa = pA[:,jid] + matvec(Ia, c[:,jid]) + U[:,jid] * (u[:,jid] / D[:,jid])[:,None]
+            IA[:,parent[jid]] += Xs[:,jid].transform_inertia(Ia)
+            pA[:,parent[jid]] += Xs[:,jid].transpose_apply(pa)
+    # forward pass: accelerations
+    a_base = get_base_acceleration(gravity)
+    a = np.empty((batch,n,6))
+    qdd = np.empty((batch,n))
+    for jid in range(n):
+        if parent[jid] == -1:
+            a[:,jid] = Xs[:,jid].apply_motion(a_base) + c[:,jid]
+        else:
+            a[:,jid] = Xs[:,jid].apply_motion(a[:,parent[jid]]) + c[:,jid]
+        qdd[:,jid] = (u[:,jid] - np.sum(U[:,jid] * a[:,jid], axis=-1)) / D[:,jid]
+        a[:,jid] += qdd[:,jid,None] * S[jid]
+    return qdd[0] if single else qdd
+
+#####################################
+#    Inverse Dynamics Derivatives    #
+#####################################
+
+def motion_cross_matrix(v):
+    # crm(v) such that crm(v) m = v x m
+    matrix = np.zeros(v.shape[:-1] + (6,6))
+    matrix[..., :3, :3] = skew(v[..., :3])
+    matrix[..., 3:, 3:] = matrix[..., :3, :3]
+    matrix[..., 3:, :3] = skew(v[..., 3:])
+    return matrix
+
+def force_cross_matrix(f):
+    # the matrix such that force_cross_matrix(f) v = v x* f
+    matrix = np.zeros(f.shape[:-1] + (6,6))
+    matrix[..., :3, :3] = -skew(f[..., :3])
+    matrix[..., :3, 3:] = -skew(f[..., 3:])
+    matrix[..., 3:, :3] = matrix[..., :3, 3:]
+    return matrix
+
+def inverse_dynamics_derivatives(robot, q, qd, qdd, gravity = 9.81):
+    # analytical partial derivatives of RNEA for a (B, n) batch of states (ordered by id)
+    # returns (dtau_dq, dtau_dqd) each (B, n, n) with [b, i, j] = dtau_i / dq_j (or dqd_j)
+    # note: the RNEA derivative recursion (Carpentier and Mansard) in world coordinates where moving q_j screws the
+    #       subtree of j along its Jacobian column J_j, so each link only carries 6 vectors (J_j and the partials of
+    #       the subtree velocities/accelerations w.r.t. q_j and qd_j that are not that rigid motion) and composite 6x6
+    #       matrices, and every entry between a joint i and an ancestor (or itself) j is a single product:
+    #         dtau_i/dq_j  = J_i^T (Ic_i dAdq_j + Bc_i dVdq_j)   dtau_j/dq_i  = J_j^T (J_i x* F_i + Ic_i dAdq_i + Bc_i dVdq_i)
+    #         dtau_i/dqd_j = J_i^T (Ic_i dAdv_j + Bc_i J_j)      dtau_j/dqd_i = J_j^T (Ic_i dAdv_i + Bc_i J_i)
+    #       with Ic and F the composite inertias and forces and Bc the composite of v x* I - I v x + (I v) x*
+    single, (q, qd, qdd) = as_batch(q, qd, qdd)
+    arrays = robot.to_arrays()
+    parent, S, I = arrays.parent, arrays.S, arrays.I
+    batch, n = q.shape
+    Xs = robot.eval_transforms(q)
+    a_base = np.broadcast_to(get_base_acceleration(gravity), (batch,6))
+    J = np.empty((batch,n,6))
+    v = np.empty((batch,n,6))
+    a = np.empty((batch,n,6))
+    dVdq = np.empty((batch,n,6))
+    dAdq = np.empty((batch,n,6))
+    Ic = np.empty((batch,n,6,6))
+    Bc = np.empty((batch,n,6,6))
+    F = np.empty((batch,n,6))
+    # forward pass: world frame Jacobian columns, velocities, accelerations, and body inertias/forces
+    X0s = [None] * n
+    for jid in range(n):
+        if parent[jid] == -1:
+            X0s[jid] = Xs[:,jid]
+            v_parent = np.zeros((batch,6))
+            a_parent = a_base
+        else:
+            X0s[jid] = Xs[:,jid].compose(X0s[parent[jid]])
+            v_parent = v[:,parent[jid]]
+            a_parent = a[:,parent[jid]]
+        J[:,jid] = X0s[jid].inverse_apply_motion(S[jid])
+        # note: v_parent x J_j is also the time derivative of J_j
+        dVdq[:,jid] = motion_cross(v_parent, J[:,jid])
+        dAdq[:,jid] = motion_cross(a_parent, J[:,jid]) + motion_cross(v_parent, dVdq[:,jid])
+        v[:,jid] = v_parent + qd[:,jid,None] * J[:,jid]
+        a[:,jid] = a_parent + qdd[:,jid,None] * J[:,jid] + qd[:,jid,None] * dVdq[:,jid]
+        Ic[:,jid] = X0s[jid].transform_inertia(I[jid+1])
+        Iv = matvec(Ic[:,jid], v[:,jid])
+        F[:,jid] = matvec(Ic[:,jid], a[:,jid]) + force_cross(v[:,jid], Iv)
+        crm = motion_cross_matrix(v[:,jid])
+        Bc[:,jid] = force_cross_matrix(Iv) - np.matmul(np.swapaxes(crm, -1, -2), Ic[:,jid]) - np.matmul(Ic[:,jid], crm)
+    dAdv = 2 * dVdq
+    # backward pass: composite inertias, forces, and velocity variations
+    for jid in range(n - 1, -1, -1):
+        if parent[jid] != -1:
+            Ic[:,parent[jid]] += Ic[:,jid]
+            Bc[:,parent[jid]] += Bc[:,jid]
+            F[:,parent[jid]] += F[:,jid]
+    # every joint (rows) with each of its ancestors (cols), both as the differentiated torque and as the variable
+    rows, cols = mass_matrix_sparsity(robot)
+    IcJ = matvec(Ic, J)
+    BcJ = matTvec(Bc, J)
+    P = force_cross(J, F) + matvec(Ic, dAdq) + matvec(Bc, dVdq)
+    Q = matvec(Ic, dAdv) + matvec(Bc, J)
+    dtau_dq = np.zeros((batch,n,n))
+    dtau_dqd = np.zeros((batch,n,n))
+    dtau_dq[:, cols, rows] = np.sum(J[:,cols] * P[:,rows], axis=-1)
+    dtau_dqd[:, cols, rows] = np.sum(J[:,cols] * Q[:,rows], axis=-1)
+    dtau_dq[:, rows, cols] = np.sum(IcJ[:,rows] * dAdq[:,cols] + BcJ[:,rows] * dVdq[:,cols], axis=-1)
+    dtau_dqd[:, rows, cols] = np.sum(IcJ[:,rows] * dAdv[:,cols] + BcJ[:,rows] * J[:,cols], axis=-1)
+    # joint damping
+    dtau_dqd[:,np.arange(n),np.arange(n)] += arrays.damping
+    if single:
+        return dtau_dq[0], dtau_dqd[0]
+    return dtau_dq, dtau_dqd
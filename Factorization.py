@@ -0,0 +1,70 @@
+import numpy as np
+from .Dynamics import mass_matrix_sparsity
+
+# H = L^T L factorization of the joint space mass matrix exploiting the branch induced sparsity of trees
+# note: with joints in dfs (id) order every ancestor of a joint has a smaller id so the factorization has no
+#       fill-in and L has the same sparsity as the lower triangle of H (see mass_matrix_sparsity)
+# L is either dense (B, n, n) or packed (B, nnz) in the mass_matrix(robot, q, packed = True) order where
+# each row is stored contiguously as [jid, parent, grandparent, ...] and so the diagonal comes first
+
+def get_ltl_pattern(robot):
+    # packed offsets of each row, the ancestors of each joint, and the packed entries (i, j) updated by each
+    # row k during the factorization (j an ancestor or self of i, both ancestors of k) -> (targets, a, b)
+    # with H[i, j] -= L[k, i] * L[k, j] for i = ancestors[k][a] and j = ancestors[k][b]
+    if "ltl_pattern" not in robot.cache:
+        rows, cols = mass_matrix_sparsity(robot)
+        n = robot.get_num_joints()
+        offsets = np.searchsorted(rows, np.arange(n + 1))
+        ancestors = [cols[offsets[jid] + 1:offsets[jid + 1]] for jid in range(n)]
+        updates = []
+        for jid in range(n):
+            a, b = np.triu_indices(len(ancestors[jid]))
+            updates.append((offsets[ancestors[jid][a]] + b - a, a, b))
+        robot.cache["ltl_pattern"] = (rows, cols, offsets, ancestors, updates)
+    return robot.cache["ltl_pattern"]
+
+def ltl_factor(robot, H, packed = False):
+    # L^T L factorization of a (B, n, n) batch of mass matrices (or (B, nnz) if packed) -> L in the same format
+    # note: O(n * depth^2) per sample with one vectorized step per joint
+    rows, cols, offsets, ancestors, updates = get_ltl_pattern(robot)
+    H = np.asarray(H, dtype=float)
+    single = H.ndim == (1 if packed else 2)
+    H = H[None] if single else H
+    # work on (nnz, B) so that each entry is a contiguous batch
+    L = np.array((H if packed else H[:, rows, cols]).T, order="C")
+    for jid in range(robot.get_num_joints() - 1, -1, -1):
+        start, end = offsets[jid], offsets[jid + 1]
+        L[start] = np.sqrt(L[start])
+        L[start+1:end] /= L[start]
+        targets, a, b = updates[jid]
+        L[targets] -= L[start+1:end][a] * L[start+1:end][b]
+    L = np.ascontiguousarray(L.T)
+    if not packed:
+        L_dense = np.zeros(H.shape)
+        L_dense[:, rows, cols] = L
+        L = L_dense
+    return L[0] if single else L
+
+def ltl_solve(robot, L, b, packed = False):
+    # solves H x = b for a (B, n) batch of b given the L^T L factorization (dense or packed) of H -> x (B, n)
+    # note: O(n * depth) per sample (x = L^-1 L^-T b with both solves walking only ancestors)
+    rows, cols, offsets, ancestors, _ = get_ltl_pattern(robot)
+    L = np.asarray(L, dtype=float)
+    x = np.asarray(b, dtype=float)
+    single = x.ndim == 1
+    L, x = (L[None], x[None]) if single else (L, x)
+    # work on (nnz, B) and (n, B) so that each entry is a contiguous batch
+    L = np.array((L if packed else L[:, rows, cols]).T, order="C")
+    x = np.array(x.T, order="C")
+    # L^T y = b (descendants first)
+    for jid in range(robot.get_num_joints() - 1, -1, -1):
+        start, end = offsets[jid], offsets[jid + 1]
+        x[jid] /= L[start]
+        x[ancestors[jid]] -= L[start+1:end] * x[jid]
+    # L x = y (ancestors first)
+    for jid in range(robot.get_num_joints()):
+        start, end = offsets[jid], offsets[jid + 1]
+        x[jid] -= np.sum(L[start+1:end] * x[ancestors[jid]], axis=0)
+        x[jid] /= L[start]
+    x = np.ascontiguousarray(x.T)
+    return x[0] if single else x
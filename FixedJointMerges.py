@@ -0,0 +1,71 @@
+import numpy as np
+
+class FixedJointMerges:
+    # the ordered steps remove_fixed_joints used to fold each fixed joint (and its child link) into its neighbours:
+    #   "transform": X_target = X_target * X_source    (for each grandchild joint of a fixed joint)
+    #   "inertia":   I_target = I_target + X^T I_source X  (the child link into the parent link through the fixed joint X)
+    # each step keeps the values it read so that when a link/joint is updated by URDF name only the steps that
+    # depend on it are replayed (in the same order as parsing so results match reparsing the updated URDF)
+    def __init__(self):
+        self.steps = []
+        self.link_names = set()   # names of links read or written by any step
+        self.joint_names = set()  # names of joints read or written by any step
+        self.removed_links = {}   # name: Link removed by the merge
+        self.removed_joints = {}  # name: Joint removed by the merge
+
+    def clone(self):
+        # a copy whose removed links/joints are clones (steps refer to links/joints by name and are shared as they are
+        # replaced, not modified, on replay)
+        merges = FixedJointMerges()
+        merges.steps = list(self.steps)
+        merges.link_names = set(self.link_names)
+        merges.joint_names = set(self.joint_names)
+        merges.removed_links = {name: link.clone() for name, link in self.removed_links.items()}
+        merges.removed_joints = {name: joint.clone() for name, joint in self.removed_joints.items()}
+        return merges
+
+    def record_transform(self, target_joint, source_joint, before, operand):
+        self.joint_names.update([target_joint.get_name(), source_joint.get_name()])
+        self.steps.append({"kind": "transform", "target": target_joint.get_name(), "source": source_joint.get_name(), \
+                           "before": before, "operand": operand})
+
+    def record_inertia(self, target_link, source_link, fixed_joint, before, Xmat, Imat):
+        self.link_names.update([target_link.get_name(), source_link.get_name()])
+        self.joint_names.add(fixed_joint.get_name())
+        self.steps.append({"kind": "inertia", "target": target_link.get_name(), "source": source_link.get_name(), \
+                           "joint": fixed_joint.get_name(), "before": before, "Xmat": Xmat, "Imat": Imat})
+
+    def record_removed(self, link, joint):
+        self.removed_links[link.get_name()] = link
+        self.removed_joints[joint.get_name()] = joint
+
+    def compose(self, Xmat, Xmat_source):
+        if isinstance(Xmat, np.ndarray):
+            return np.matmul(Xmat, Xmat_source)
+        return Xmat * Xmat_source
+
+    def to_float(self, Xmat):
+        if isinstance(Xmat, np.ndarray):
+            return Xmat
+        return np.reshape(np.array(Xmat).astype(float),(6,6))
+
+    def replay(self, Xmats, Imats):
+        # Xmats/Imats map the names of updated joints/links to their new own (unmerged) values and are updated in
+        # place to hold the final value of everything affected by them
+        for ind, step in enumerate(self.steps):
+            if step["kind"] == "transform":
+                if step["target"] not in Xmats and step["source"] not in Xmats:
+                    continue
+                before = Xmats.get(step["target"], step["before"])
+                operand = Xmats.get(step["source"], step["operand"])
+                self.steps[ind] = dict(step, before = before, operand = operand)
+                Xmats[step["target"]] = self.compose(before, operand)
+            else:
+                if step["target"] not in Imats and step["source"] not in Imats and step["joint"] not in Xmats:
+                    continue
+                before = Imats.get(step["target"], step["before"])
+                Imat = Imats.get(step["source"], step["Imat"])
+                Xmat = self.to_float(Xmats[step["joint"]]) if step["joint"] in Xmats else step["Xmat"]
+                self.steps[ind] = dict(step, before = before, Xmat = Xmat, Imat = Imat)
+                Imats[step["target"]] = before + np.matmul(np.matmul(np.transpose(Xmat),Imat),Xmat)
+        return Xmats, Imats
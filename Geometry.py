@@ -0,0 +1,237 @@
+import copy
+import os
+import re
+import numpy as np
+from .SpatialAlgebra import Rotation, SpatialTransform
+
+# binary STL: 80 byte header, uint32 triangle count, then per triangle a normal, 3 vertices, and a uint16 attribute
+STL_HEADER_BYTES = 84
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3,3)), ("attribute", "<u2")])
+
+class Geometry:
+    # a visual or collision geometry of a link: a box, cylinder, sphere, or mesh (file + scale) at pose in the link frame
+    # note: mesh data is only read on request (get_mesh) and it and the bounding primitives are cached in self.cache
+    #       which copies share (they only differ in pose) so each mesh file is read at most once per parse
+    def __init__(self, kind, gtype, name = None, link = None):
+        self.kind = kind        # "visual" or "collision"
+        self.gtype = gtype      # "box", "cylinder", "sphere", or "mesh"
+        self.name = name        # optional URDF name
+        self.link = link        # name of the URDF link it was declared in (merged links move it to their parent)
+        self.size = None        # box side lengths
+        self.radius = None      # cylinder/sphere
+        self.length = None      # cylinder (along z)
+        self.filename = None    # mesh filename as given in the URDF (e.g., package://name/meshes/part.stl)
+        self.scale = np.ones(3) # mesh
+        self.base_dir = None    # directory relative mesh filenames are resolved against
+        self.pose = np.eye(4)   # homogeneous pose of the geometry in the link frame
+        self.cache = {}
+
+    def set_origin(self, xyz, rpy):
+        self.pose = SpatialTransform(Rotation(rpy, symbolic = False).E, np.array(xyz, dtype = float)).to_pose()
+
+    def transformed(self, pose):
+        # a copy at pose * self.pose (e.g., moved into the parent link of a merged fixed joint)
+        geometry = copy.copy(self)
+        geometry.pose = np.matmul(pose, self.pose)
+        return geometry
+
+    def get_pose(self):
+        return self.pose
+
+    ################
+    #    Meshes    #
+    ################
+
+    def get_mesh_path(self, package_dirs = None):
+        # resolve package:// (with package_dirs {name: directory}, ROS_PACKAGE_PATH, or a parent directory of the
+        # URDF with the package name), file://, and relative (to base_dir) filenames
+        if self.filename.startswith("package://"):
+            package, _, relative_path = self.filename[len("package://"):].partition("/")
+            package_dirs = {} if package_dirs is None else package_dirs
+            candidates = [package_dirs[package]] if package in package_dirs else []
+            candidates += [os.path.join(root, package) for root in os.environ.get("ROS_PACKAGE_PATH", "").split(os.pathsep) if root]
+            directory = self.base_dir
+            while directory and os.path.dirname(directory) != directory:
+                if os.path.basename(directory) == package:
+                    candidates.append(directory)
+                directory = os.path.dirname(directory)
+            for candidate in candidates:
+                if os.path.isfile(os.path.join(candidate, relative_path)):
+                    return os.path.join(candidate, relative_path)
+            raise FileNotFoundError("[!Error] Could not resolve " + self.filename + " (pass package_dirs = {name: directory})")
+        path = self.filename[len("file://"):] if self.filename.startswith("file://") else self.filename
+        if not os.path.isabs(path) and self.base_dir is not None:
+            path = os.path.join(self.base_dir, path)
+        return os.path.normpath(path)
+
+    def get_mesh(self, package_dirs = None):
+        # the (lazily loaded and cached) Mesh of a mesh geometry with the geometry's scale
+        if self.gtype != "mesh":
+            raise ValueError("[!Error] Only mesh geometries have a mesh (this is a " + str(self.gtype) + ")!")
+        if "mesh" not in self.cache:
+            self.cache["mesh"] = load_mesh(self.get_mesh_path(package_dirs), self.scale)
+        return self.cache["mesh"]
+
+    #############################
+    #    Bounding Primitives    #
+    #############################
+
+    def get_bounding_box(self, package_dirs = None):
+        # axis aligned (lower (3,), upper (3,)) corners in the geometry frame (apply get_pose for the link frame)
+        if "bounding_box" not in self.cache:
+            if self.gtype == "box":
+                upper = np.array(self.size, dtype = float) / 2
+            elif self.gtype == "cylinder":
+                upper = np.array([self.radius, self.radius, self.length / 2])
+            elif self.gtype == "sphere":
+                upper = np.full(3, self.radius, dtype = float)
+            elif self.gtype == "mesh":
+                self.cache["bounding_box"] = self.get_mesh(package_dirs).get_bounding_box()
+                return self.cache["bounding_box"]
+            else:
+                raise ValueError("[!Error] Unsupported geometry type " + str(self.gtype) + "!")
+            self.cache["bounding_box"] = (-upper, upper)
+        return self.cache["bounding_box"]
+
+    def get_bounding_sphere(self, package_dirs = None):
+        # (center (3,), radius) in the geometry frame (exact for spheres, about the box center otherwise)
+        if "bounding_sphere" not in self.cache:
+            if self.gtype == "sphere":
+                self.cache["bounding_sphere"] = (np.zeros(3), float(self.radius))
+            elif self.gtype == "mesh":
+                self.cache["bounding_sphere"] = self.get_mesh(package_dirs).get_bounding_sphere()
+            else:
+                lower, upper = self.get_bounding_box()
+                self.cache["bounding_sphere"] = ((lower + upper) / 2, float(np.linalg.norm(upper - lower) / 2))
+        return self.cache["bounding_sphere"]
+
+    def get_decimated_mesh(self, cell_size, package_dirs = None):
+        # a (cached) vertex clustered simplification of the mesh for broad-phase use (see Mesh.decimate)
+        key = ("decimated", cell_size)
+        if key not in self.cache:
+            self.cache[key] = self.get_mesh(package_dirs).decimate(cell_size)
+        return self.cache[key]
+
+    #######################
+    #    Serialization    #
+    #######################
+
+    def to_dict(self):
+        return {"kind": self.kind, "gtype": self.gtype, "name": self.name, "link": self.link, \
+                "size": None if self.size is None else [float(value) for value in self.size], \
+                "radius": self.radius, "length": self.length, "filename": self.filename, \
+                "scale": [float(value) for value in self.scale], "base_dir": self.base_dir, \
+                "pose": self.pose.tolist()}
+
+    @classmethod
+    def from_dict(cls, values):
+        geometry = cls(values["kind"], values["gtype"], values["name"], values["link"])
+        geometry.size = values["size"]
+        geometry.radius = values["radius"]
+        geometry.length = values["length"]
+        geometry.filename = values["filename"]
+        geometry.scale = np.array(values["scale"], dtype = float)
+        geometry.base_dir = values["base_dir"]
+        geometry.pose = np.array(values["pose"], dtype = float)
+        return geometry
+
+class Mesh:
+    # a triangle mesh stored as its (F, 3, 3) float32 triangle corners (a read-only memory map for binary STL files
+    # so only the pages touched are read) and the scale applied on access
+    def __init__(self, triangles, scale = None):
+        self.triangles = triangles
+        self.scale = np.ones(3) if scale is None else np.asarray(scale, dtype = float)
+        self.vertices = None
+        self.faces = None
+
+    def get_num_faces(self):
+        return len(self.triangles)
+
+    def get_triangles(self):
+        # scaled (F, 3, 3) corners (the unscaled memory map itself when the scale is 1)
+        if np.all(self.scale == 1):
+            return self.triangles
+        return self.triangles * self.scale
+
+    def get_vertices_faces(self):
+        # shared (V, 3) vertices and (F, 3) vertex indices of each face (computed once on request)
+        if self.vertices is None:
+            corners = np.ascontiguousarray(self.triangles).reshape(-1, 3)
+            vertices, inverse = np.unique(corners, axis = 0, return_inverse = True)
+            self.vertices = vertices * self.scale
+            self.faces = inverse.reshape(-1, 3)
+        return self.vertices, self.faces
+
+    def get_bounding_box(self):
+        # (lower (3,), upper (3,)) of the scaled corners
+        if len(self.triangles) == 0:
+            return np.zeros(3), np.zeros(3)
+        lower = np.min(self.triangles, axis = (0,1)) * self.scale
+        upper = np.max(self.triangles, axis = (0,1)) * self.scale
+        return np.minimum(lower, upper), np.maximum(lower, upper)
+
+    def get_bounding_sphere(self):
+        # (center (3,), radius) about the bounding box center
+        lower, upper = self.get_bounding_box()
+        center = (lower + upper) / 2
+        if len(self.triangles) == 0:
+            return center, 0.0
+        radius = np.max(np.linalg.norm(self.get_triangles() - center, axis = -1))
+        return center, float(radius)
+
+    def decimate(self, cell_size):
+        # vertex clustering: merge all (scaled) vertices in each cell_size grid cell into their mean and drop the
+        # faces that collapse -> a new (in memory) Mesh
+        vertices, faces = self.get_vertices_faces()
+        cells, cell_ids = np.unique(np.floor(vertices / cell_size).astype(np.int64), axis = 0, return_inverse = True)
+        cell_ids = cell_ids.reshape(-1)
+        counts = np.bincount(cell_ids, minlength = len(cells)).astype(float)
+        means = np.stack([np.bincount(cell_ids, vertices[:, axis], len(cells)) for axis in range(3)], axis = -1) / counts[:, None]
+        faces = cell_ids[faces]
+        keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+        return Mesh(means[faces[keep]])
+
+def load_mesh(path, scale = None):
+    # a Mesh from a binary (memory-mapped) or ASCII STL or an OBJ file
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".stl":
+        return Mesh(load_stl(path), scale)
+    if extension == ".obj":
+        return Mesh(load_obj(path), scale)
+    raise ValueError("[!Error] Only STL and OBJ meshes are currently supported! Got: " + path)
+
+def load_stl(path):
+    # (F, 3, 3) float32 triangle corners (a read-only memory map of a binary STL file)
+    file_bytes = os.path.getsize(path)
+    with open(path, "rb") as stl_file:
+        header = stl_file.read(STL_HEADER_BYTES)
+    num_triangles = int(np.frombuffer(header[80:84], dtype = "<u4")[0]) if len(header) == STL_HEADER_BYTES else -1
+    if file_bytes == STL_HEADER_BYTES + num_triangles * STL_TRIANGLE.itemsize:
+        if num_triangles == 0:
+            return np.zeros((0,3,3), dtype = np.float32)
+        records = np.memmap(path, dtype = STL_TRIANGLE, mode = "r", offset = STL_HEADER_BYTES, shape = (num_triangles,))
+        return records["vertices"]
+    # ASCII STL (read fully as it is text)
+    with open(path, "r", errors = "replace") as stl_file:
+        values = re.findall(r"vertex\s+(\S+)\s+(\S+)\s+(\S+)", stl_file.read())
+    return np.array(values, dtype = np.float32).reshape(-1, 3, 3)
+
+def load_obj(path):
+    # (F, 3, 3) float32 triangle corners of an OBJ file (polygons are fan triangulated)
+    vertices = []
+    faces = []
+    with open(path, "r", errors = "replace") as obj_file:
+        for line in obj_file:
+            values = line.split()
+            if not values:
+                continue
+            if values[0] == "v":
+                vertices.append([float(value) for value in values[1:4]])
+            elif values[0] == "f":
+                # v, v/vt, v/vt/vn, or v//vn with 1-based (or negative, relative to the end) vertex indices
+                ids = [int(value.split("/")[0]) for value in values[1:]]
+                ids = [vid - 1 if vid > 0 else len(vertices) + vid for vid in ids]
+                for ind in range(1, len(ids) - 1):
+                    faces.append([ids[0], ids[ind], ids[ind + 1]])
+    vertices = np.array(vertices, dtype = np.float32).reshape(-1, 3)
+    return vertices[np.array(faces, dtype = np.int64).reshape(-1, 3)]
@@ -1,91 +1,285 @@
 # import numpy as np
+import copy
 import numpy as np
 import sympy as sp
-from .SpatialAlgebra import Origin, Translation, Rotation
+from .SpatialAlgebra import Origin, Translation, Rotation, snap_to_rational, snap_to_nsimplify, snap_rigid_transform, \
+                            parse_srepr
+from .ParseStats import count
 
 class Joint:
-    def __init__(self, name, jid, parent, child):
+    def __init__(self, name, jid, parent, child, symbolic = True, rigid = False):
         self.name = name         # name
         self.jid = jid           # temporary ID (replaced by standard DFS parse ordering)
         self.urdf_jid = jid      # URDF ordered ID
         self.bfs_jid = jid       # temporary ID (replaced by BFS parse ordering)
         self.bfs_level = 0       # temporary level (replaced by BFS parse ordering)
-        self.origin = Origin()   # Fixed origin location
+        self.symbolic = symbolic # Sympy transforms (else numpy only)
+        self.rigid = rigid       # snap the origin rotation/translation (else each Xmat entry) so X stays rigid
+        self.origin = Origin(symbolic) # Fixed origin location
         self.jtype = None        # type of joint
+        self.axis = None         # axis of motion
         self.parent = parent     # parent link name
         self.child = child       # child link name
-        self.theta = sp.symbols("theta") # Free joint variable
+        self.theta = sp.symbols("theta") if symbolic else None # Free joint variable
         self.Xmat_sp = None      # Sympy X matrix placeholder
+        self.Xmat_fixed = None   # Numpy fixed X matrix placeholder (numeric mode only)
+        self.Xmat_coefficients = None # cached numeric (A, B, K) closed form of the X matrix
+        self.Xmat_func = None    # cached lambdified X matrix function
         self.Xmat_sp_free = None # Sympy X_free matrix placeholder
+        self.Xmat_sp_srepr = None # sp.srepr of Xmat_sp restored from a cache (parsed when first requested)
         self.Smat_sp = None      # Sympy S matrix placeholder (usually a vector)
         self.damping = 0         # damping placeholder
+        self.robot = None        # owning robot (keeps its lookup indices in sync on updates)
+        self.insertion_order = None # order added to the owning robot
+
+    def update_robot_index(self, attribute, value):
+        if self.robot is not None:
+            self.robot.reindex_joint(self, attribute, value)
+
+    def clear_robot_cache(self, keep_structure = False):
+        # keep_structure for value only changes (leaves the robot's cached topology tables)
+        if self.robot is not None:
+            self.robot.clear_cache(keep_structure)
+
+    def check_writable(self):
+        # raise if owned by a shared read-only robot (e.g., from a RobotRegistry)
+        if self.robot is not None:
+            self.robot.check_writable()
+
+    def clone(self):
+        # a copy (not yet added to any robot) sharing all numeric/sympy data (and cached functions) with this joint
+        # note: setters replace values rather than modifying them in place so sharing is safe
+        joint = copy.copy(self)
+        joint.origin = copy.copy(self.origin)
+        joint.robot = None
+        joint.insertion_order = None
+        return joint
 
     def set_id(self, id_in):
+        self.check_writable()
+        self.update_robot_index("jid", id_in)
         self.jid = id_in
 
     def set_parent(self, parent_name):
+        self.check_writable()
+        self.update_robot_index("parent", parent_name)
         self.parent = parent_name
 
     def set_child(self, child_name):
+        self.check_writable()
+        self.update_robot_index("child", child_name)
         self.child = child_name
 
     def set_bfs_id(self, id_in):
+        self.check_writable()
+        self.clear_robot_cache()
         self.bfs_id = id_in
 
     def set_bfs_level(self, level_in):
+        self.check_writable()
+        self.update_robot_index("bfs_level", level_in)
         self.bfs_level = level_in
 
     def set_origin_xyz(self, x, y = None, z = None):
+        self.check_writable()
         self.origin.set_translation(x,y,z)
 
     def set_origin_rpy(self, r, p = None, y = None):
+        self.check_writable()
         self.origin.set_rotation(r,p,y)
 
     def set_damping(self, damping):
+        self.check_writable()
+        self.clear_robot_cache(keep_structure = True)
         self.damping = damping
 
     def set_transformation_matrix(self, matrix_in):
+        self.check_writable()
         self.Xmat_sp = matrix_in
+        self.clear_transformation_cache()
+
+    def set_fixed_transformation_matrix(self, matrix_in):
+        self.check_writable()
+        self.Xmat_fixed = matrix_in
+        self.clear_transformation_cache()
+
+    def set_transformation_matrix_coefficients(self, A, B, K, Xmat_sp_srepr = None):
+        # restore the joint from its closed form (e.g., from a cache) without rebuilding it from the origin
+        # note: in symbolic mode Xmat_sp is parsed from Xmat_sp_srepr (or if None rebuilt from the coefficients)
+        #       when first requested
+        self.check_writable()
+        self.Xmat_sp = None
+        self.Xmat_sp_srepr = Xmat_sp_srepr
+        self.Xmat_fixed = A + K if self.jtype == 'revolute' else K
+        self.clear_transformation_cache()
+        self.Xmat_coefficients = (A, B, K)
+
+    def clear_transformation_cache(self):
+        self.Xmat_coefficients = None
+        self.Xmat_func = None
+        self.clear_robot_cache(keep_structure = True)
 
     def set_type(self, jtype, axis = None):
+        self.check_writable()
         self.jtype = jtype
+        self.axis = axis
+        self.clear_transformation_cache()
         self.origin.build_fixed_transform()
         if self.jtype == 'revolute':
             if axis[2] == 1:
-                self.Xmat_sp_free = self.origin.rotation.rot(self.origin.rotation.rz(self.theta))
                 self.S = np.array([0,0,1,0,0,0])
             elif axis[1] == 1:
-                self.Xmat_sp_free = self.origin.rotation.rot(self.origin.rotation.ry(self.theta))
                 self.S = np.array([0,1,0,0,0,0])
             elif axis[0] == 1:
-                self.Xmat_sp_free = self.origin.rotation.rot(self.origin.rotation.rx(self.theta))
                 self.S = np.array([1,0,0,0,0,0])
         elif self.jtype == 'prismatic':
             if axis[2] == 1:
-                self.Xmat_sp_free = self.origin.translation.xlt(self.origin.translation.skew(0,0,self.theta))
                 self.S = np.array([0,0,0,0,0,1])
             elif axis[1] == 1:
-                self.Xmat_sp_free = self.origin.translation.xlt(self.origin.translation.skew(0,self.theta,0))
                 self.S = np.array([0,0,0,0,1,0])
             elif axis[0] == 1:
-                self.Xmat_sp_free = self.origin.translation.xlt(self.origin.translation.skew(self.theta,0,0))
                 self.S = np.array([0,0,0,1,0,0])
         elif self.jtype == 'fixed':
-            self.Xmat_sp_free = sp.eye(6)
             self.S = np.array([0,0,0,0,0,0])
         else:
-            print('Only revolute and fixed joints currently supported!')
-            exit()
-        self.Xmat_sp = self.Xmat_sp_free * self.origin.Xmat_sp_fixed
+            raise ValueError("[!Error] Only revolute, prismatic, and fixed joints are currently supported! Got: " + str(self.jtype))
         # remove numerical noise (e.g., URDF's often specify angles as 3.14 or 3.14159 but that isn't exactly PI)
-        self.Xmat_sp = sp.nsimplify(self.Xmat_sp, tolerance=1e-6, rational=True).evalf()
+        # note: the free transform is a pure rotation/translation so snapping the fixed part snaps every coefficient
+        # note: by default every entry of X is snapped on its own which leaves X slightly non-rigid (so its compact
+        #       (E, r) form only matches it to ~1e-6) while rigid snaps the rotation and translation separately and
+        #       rebuilds X from them (see snap_rigid_transform)
+        if self.symbolic:
+            self.Xmat_sp_free = self.build_free_transformation_matrix(self.theta)
+            if self.rigid:
+                Xmat_fixed = snap_rigid_transform(np.array(self.origin.rotation.E, dtype=float), self.get_origin_position(), \
+                                                  lambda values: snap_to_nsimplify(values, 1e-6))
+                self.Xmat_sp = (self.Xmat_sp_free * sp.Matrix(Xmat_fixed)).evalf()
+            else:
+                self.Xmat_sp = self.Xmat_sp_free * self.origin.Xmat_sp_fixed
+                self.Xmat_sp = sp.nsimplify(self.Xmat_sp, tolerance=1e-6, rational=True).evalf()
+            count("sympy_simplifications")
+        else:
+            if self.rigid:
+                self.Xmat_fixed = snap_rigid_transform(self.origin.rotation.E, self.get_origin_position(), \
+                                                       lambda values: snap_to_rational(values, 1000000))
+            else:
+                self.Xmat_fixed = snap_to_rational(self.origin.Xmat_sp_fixed, 1000000)
+            count("rational_snaps")
+
+    def get_origin_position(self):
+        translation = self.origin.translation
+        return np.array([translation.x, translation.y, translation.z], dtype=float)
+
+    def build_free_transformation_matrix(self, theta):
+        # X_free(theta) as a sympy matrix or numpy array depending on the origin type
+        rotation = self.origin.rotation
+        translation = self.origin.translation
+        if self.jtype == 'revolute':
+            if self.axis[2] == 1:
+                return rotation.rot(rotation.rz(theta))
+            elif self.axis[1] == 1:
+                return rotation.rot(rotation.ry(theta))
+            elif self.axis[0] == 1:
+                return rotation.rot(rotation.rx(theta))
+        elif self.jtype == 'prismatic':
+            if self.axis[2] == 1:
+                return translation.xlt(translation.skew(0,0,theta))
+            elif self.axis[1] == 1:
+                return translation.xlt(translation.skew(0,theta,0))
+            elif self.axis[0] == 1:
+                return translation.xlt(translation.skew(theta,0,0))
+        return sp.eye(6) if self.symbolic else np.eye(6)
+
+    def evaluate_transformation_matrix(self, theta):
+        # X(theta) = X_free(theta) * X_fixed evaluated through its closed form
+        # note: theta can be a scalar or an array of shape (B,) in which case the result is (B, 6, 6)
+        A, B, K = self.get_transformation_matrix_coefficients()
+        theta = np.asarray(theta, dtype=float)[..., None, None]
+        if self.jtype == 'revolute':
+            return np.cos(theta)*A + np.sin(theta)*B + K
+        elif self.jtype == 'prismatic':
+            return theta*A + K
+        return K + np.zeros_like(theta)
 
     def get_transformation_matrix_function(self):
-        return sp.utilities.lambdify(self.theta, self.Xmat_sp, 'numpy')
+        if not self.symbolic:
+            return self.evaluate_transformation_matrix
+        if self.Xmat_func is None:
+            self.Xmat_func = sp.utilities.lambdify(self.theta, self.get_transformation_matrix(), 'numpy')
+        return self.Xmat_func
+
+    def get_fixed_transformation_matrix(self):
+        return self.Xmat_fixed
+
+    def get_transformation_matrix_coefficients(self):
+        # closed form X(theta) = cos(theta)*A + sin(theta)*B + K (revolute) or theta*A + K (prismatic)
+        # note: in symbolic mode the coefficients are read from Xmat_sp so evaluation is bit-identical to lambdify
+        if self.Xmat_coefficients is None:
+            if self.symbolic:
+                self.Xmat_coefficients = self.extract_transformation_matrix_coefficients()
+            else:
+                self.Xmat_coefficients = self.build_transformation_matrix_coefficients()
+        return self.Xmat_coefficients
+
+    def extract_transformation_matrix_coefficients(self):
+        A = np.zeros((6,6))
+        B = np.zeros((6,6))
+        K = np.zeros((6,6))
+        if self.jtype == 'revolute':
+            variables = (sp.cos(self.theta), sp.sin(self.theta))
+        else:
+            variables = (self.theta, None)
+        for row in range(6):
+            for col in range(6):
+                expr = self.Xmat_sp[row,col]
+                K[row,col] = self.printed_float(expr.as_independent(self.theta, as_Add=True)[0])
+                A[row,col] = self.printed_float(expr.coeff(variables[0]))
+                if variables[1] is not None:
+                    B[row,col] = self.printed_float(expr.coeff(variables[1]))
+        return A, B, K
+
+    def printed_float(self, expr):
+        # lambdify prints floats at their sympy precision (15 digits) so round trip through the printed value
+        return float(str(sp.Float(expr)))
+
+    def build_transformation_matrix_coefficients(self):
+        zero = np.zeros((3,3))
+        axis = np.array(self.axis if self.axis is not None else [0,0,0], dtype=float)
+        axis_outer = np.outer(axis, axis)
+        axis_skew = self.origin.translation.skew(axis[0],axis[1],axis[2])
+        if self.jtype == 'revolute':
+            # E(theta) = cos(theta)*(I - aa^T) - sin(theta)*skew(a) + aa^T
+            free_A = np.block([[np.eye(3) - axis_outer, zero], [zero, np.eye(3) - axis_outer]])
+            free_B = np.block([[-axis_skew, zero], [zero, -axis_skew]])
+            free_K = np.block([[axis_outer, zero], [zero, axis_outer]])
+        elif self.jtype == 'prismatic':
+            # xlt(skew(theta*a)) = theta*[0 0; -skew(a) 0] + I
+            free_A = np.block([[zero, zero], [-axis_skew, zero]])
+            free_B = np.zeros((6,6))
+            free_K = np.eye(6)
+        else:
+            free_A = np.zeros((6,6))
+            free_B = np.zeros((6,6))
+            free_K = np.eye(6)
+        return np.matmul(free_A, self.Xmat_fixed), np.matmul(free_B, self.Xmat_fixed), np.matmul(free_K, self.Xmat_fixed)
 
     def get_transformation_matrix(self):
+        if self.Xmat_sp is None and self.symbolic and self.Xmat_sp_srepr is not None:
+            self.Xmat_sp = sp.Matrix(parse_srepr(self.Xmat_sp_srepr))
+        elif self.Xmat_sp is None and self.symbolic and self.Xmat_coefficients is not None:
+            self.Xmat_sp = self.build_transformation_matrix_from_coefficients()
         return self.Xmat_sp
 
+    def build_transformation_matrix_from_coefficients(self):
+        A, B, K = self.Xmat_coefficients
+        if self.jtype == 'revolute':
+            variables = (sp.cos(self.theta), sp.sin(self.theta))
+        else:
+            variables = (self.theta, 0)
+        return sp.Matrix(6, 6, lambda row, col: sp.Float(A[row,col])*variables[0] + \
+                                                sp.Float(B[row,col])*variables[1] + \
+                                                sp.Float(K[row,col]))
+
     def get_joint_subspace(self):
         return self.S
 
@@ -0,0 +1,131 @@
+import numpy as np
+from .SpatialAlgebra import SpatialTransform, cross
+
+def Xmat_to_pose(Xmat):
+    # X = [E 0; -E skew(p) E] (parent to child) -> homogeneous pose of the child in the parent [E^T p; 0 1]
+    R = np.swapaxes(Xmat[..., :3, :3], -1, -2)
+    skew_p = -np.matmul(R, Xmat[..., 3:, :3])
+    pose = np.zeros(Xmat.shape[:-2] + (4,4))
+    pose[..., :3, :3] = R
+    pose[..., 0, 3] = skew_p[..., 2, 1]
+    pose[..., 1, 3] = skew_p[..., 0, 2]
+    pose[..., 2, 3] = skew_p[..., 1, 0]
+    pose[..., 3, 3] = 1
+    return pose
+
+def forward_kinematics(robot, q, links = None):
+    # world frame poses of the links for a (B, n) batch of joint configurations ordered by id
+    # returns (B, n+1, 4, 4) with the base link (id -1) at index 0 and link lid at lid + 1
+    # or, if a list of link ids is given, (B, len(links), 4, 4) with only those frames
+    # note: joints are visited in the standard DFS (id) order so parents are always computed first
+    q = np.asarray(q, dtype=float)
+    single = q.ndim == 1
+    q = np.atleast_2d(q)
+    batch = q.shape[0]
+    parent = robot.to_arrays().parent
+    n = len(parent)
+    identity = np.broadcast_to(np.eye(4), (batch,4,4))
+    Xs = robot.eval_transforms(q)
+    if links is None:
+        poses = np.empty((batch,n+1,4,4))
+        poses[:,0] = identity
+        local_poses = Xs.to_pose()
+        for jid in range(n):
+            np.matmul(poses[:,parent[jid]+1], local_poses[:,jid], out = poses[:,jid+1])
+    else:
+        # only walk the ancestors of the requested frames and free each pose once its last child is done
+        needed = np.zeros(n, dtype=bool)
+        for lid in links:
+            while lid != -1 and not needed[lid]:
+                needed[lid] = True
+                lid = parent[lid]
+        last_child = {}
+        for jid in np.flatnonzero(needed):
+            last_child[parent[jid]] = jid
+        requested = set(links)
+        computed = {-1: identity}
+        selected = {}
+        for jid in np.flatnonzero(needed):
+            computed[jid] = np.matmul(computed[parent[jid]], Xs[:,jid].to_pose())
+            if jid in requested:
+                selected[jid] = computed[jid]
+            if last_child[parent[jid]] == jid and parent[jid] not in requested:
+                del computed[parent[jid]]
+            if jid not in last_child and jid not in requested:
+                del computed[jid]
+        poses = np.empty((batch,len(links),4,4))
+        for ind, lid in enumerate(links):
+            poses[:,ind] = identity if lid == -1 else selected[lid]
+    return poses[0] if single else poses
+
+###################
+#    Jacobians    #
+###################
+
+def jacobian_sparsity(robot, links = None):
+    # (rows, cols) of the structurally non-zero columns of the Jacobians of the given link ids (all if None):
+    # row ind (the index into links) with the link itself and its ancestors (nearest first)
+    # note: the parent walk is vectorized across the links so this is O(max depth) numpy calls
+    parent = robot.to_arrays().parent
+    curr_ids = np.arange(len(parent)) if links is None else np.asarray(links, dtype=np.int64)
+    rows = []
+    cols = []
+    ids = np.arange(len(curr_ids))
+    while len(ids) > 0:
+        valid = curr_ids != -1
+        ids, curr_ids = ids[valid], curr_ids[valid]
+        rows.append(ids)
+        cols.append(curr_ids)
+        curr_ids = parent[curr_ids]
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    return rows[order], cols[order]
+
+def jacobians(robot, q, links = None, kind = "geometric", packed = False):
+    # Jacobians of the given link ids (all if None) for a (B, n) batch of joint configurations (ordered by id)
+    # -> J (B, len(links), 6, n) with [b, k, :, j] the [angular; linear] velocity of link links[k] per unit qd_j:
+    #   kind = "geometric": of the link origin in world (base) coordinates
+    #   kind = "spatial": the spatial (Plucker) velocity in world coordinates, i.e., of the point at the world origin
+    #   kind = "body": in the link's own coordinates (as used by the dynamics)
+    # if packed, returns (values (B, nnz, 6), (rows, cols)) holding only the columns of jacobian_sparsity
+    # note: column j of the spatial Jacobian (X0_j^-1 S_j) is shared by every link in the subtree of j so it is
+    #       computed once per joint and every Jacobian entry is then a vectorized gather/transform
+    if kind not in ("geometric", "spatial", "body"):
+        raise ValueError("[!Error] Jacobian kind must be geometric, spatial, or body!")
+    q = np.asarray(q, dtype=float)
+    single = q.ndim == 1
+    q = np.atleast_2d(q)
+    batch = q.shape[0]
+    arrays = robot.to_arrays()
+    parent, S = arrays.parent, arrays.S
+    n = len(parent)
+    # world to link transforms X0_i = X_i X0_parent
+    Xs = robot.eval_transforms(q)
+    E = np.empty((batch,n,3,3))
+    r = np.empty((batch,n,3))
+    for jid in range(n):
+        if parent[jid] == -1:
+            E[:,jid] = Xs.E[:,jid]
+            r[:,jid] = Xs.r[:,jid]
+        else:
+            X0 = Xs[:,jid].compose(SpatialTransform(E[:,parent[jid]], r[:,parent[jid]]))
+            E[:,jid] = X0.E
+            r[:,jid] = X0.r
+    X0s = SpatialTransform(E, r)
+    columns = X0s.inverse_apply_motion(S)
+    rows, cols = jacobian_sparsity(robot, links)
+    values = columns[:, cols]
+    if kind != "spatial" and len(rows) > 0:
+        link_ids = (np.arange(n) if links is None else np.asarray(links, dtype=np.int64))[rows]
+        if kind == "geometric":
+            # velocity of the link origin p_i = v_0 + w x p_i (r of X0_i is p_i in world coordinates)
+            values[..., 3:] += cross(values[..., :3], r[:, link_ids])
+        else:
+            values = X0s[:, link_ids].apply_motion(values)
+    if packed:
+        return (values[0] if single else values), (rows, cols)
+    num_links = n if links is None else len(links)
+    J = np.zeros((batch, num_links, 6, n))
+    J[:, rows, :, cols] = np.swapaxes(values, 0, 1)
+    return J[0] if single else J
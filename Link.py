@@ -1,72 +1,137 @@
+import copy
 import numpy as np
 import sympy as sp
 from .InertiaSet import InertiaSet
-from .SpatialAlgebra import Origin, Translation, Rotation
+from .SpatialAlgebra import Origin, Translation, Rotation, snap_to_rational
+from .ParseStats import count
 
 class Link:
-    def __init__(self, name, lid):
+    def __init__(self, name, lid, symbolic = True):
         self.name = name        # name
         self.lid = lid          # temporary ID (replaced by standard DFS parse ordering)
         self.urdf_lid = lid     # URDF ordered ID
         self.bfs_lid = lid      # temporary ID (replaced by BFS parse ordering)
         self.bfs_level = 0      # temporary level (replaced by BFS parse ordering)
         self.parent_id = None   # temporary ID (replaced later)
-        self.origin = Origin()  # Fixed origin location
+        self.origin = Origin(symbolic) # Fixed origin location
         self.mass = None
         self.inertia = None
         self.spatial_ineratia = None
+        self.visuals = []       # Geometry descriptors (meshes are loaded lazily)
+        self.collisions = []
+        self.robot = None       # owning robot (keeps its lookup indices in sync on updates)
+        self.insertion_order = None # order added to the owning robot
+
+    def update_robot_index(self, attribute, value):
+        if self.robot is not None:
+            self.robot.reindex_link(self, attribute, value)
+
+    def clear_robot_cache(self, keep_structure = False):
+        # keep_structure for value only changes (leaves the robot's cached topology tables)
+        if self.robot is not None:
+            self.robot.clear_cache(keep_structure)
+
+    def check_writable(self):
+        # raise if owned by a shared read-only robot (e.g., from a RobotRegistry)
+        if self.robot is not None:
+            self.robot.check_writable()
+
+    def clone(self):
+        # a copy (not yet added to any robot) sharing all numeric/sympy data with this link
+        # note: setters replace values rather than modifying them in place so sharing is safe
+        link = copy.copy(self)
+        link.origin = copy.copy(self.origin)
+        link.visuals = list(self.visuals)
+        link.collisions = list(self.collisions)
+        link.robot = None
+        link.insertion_order = None
+        return link
 
     def set_id(self, id_in):
+        self.check_writable()
+        self.update_robot_index("lid", id_in)
         self.lid = id_in
 
     def set_parent_id(self, id_in):
+        self.check_writable()
+        self.clear_robot_cache()
         self.parent_id = id_in    
 
     def set_bfs_id(self, id_in):
+        self.check_writable()
+        self.clear_robot_cache()
         self.bfs_id = id_in
 
     def set_bfs_level(self, level_in):
+        self.check_writable()
+        self.update_robot_index("bfs_level", level_in)
         self.bfs_level = level_in
 
     def set_subtree(self, subtree_in):
+        self.check_writable()
+        self.clear_robot_cache()
         self.subtree = subtree_in
 
     def set_origin_xyz(self, x, y = None, z = None):
+        self.check_writable()
         self.origin.set_translation(x,y,z)
 
     def set_origin_rpy(self, r, p = None, y = None):
+        self.check_writable()
         self.origin.set_rotation(r,p,y)
 
     def set_inertia(self, mass, ixx, ixy, ixz, iyy, iyz, izz):
+        self.check_writable()
         self.mass = mass
         self.inertia = InertiaSet(ixx,ixy,ixz,iyy,iyz,izz)
         self.build_spatial_inertia()
 
     def set_spatial_inertia(self, inertia_in):
+        self.check_writable()
+        self.clear_robot_cache(keep_structure = True)
         self.spatial_ineratia = inertia_in
 
     def build_spatial_inertia(self):
+        self.check_writable()
         if self.inertia is None or self.origin.translation is None:
             print("[!Error] Set origin and inertia first!")
         # I6x6 = I3x3 + mccT   mc    I3x3 = Ixx   Ixy   Ixz    c =   0 -cz  cy
         #         mcT          mI           Ixy   Iyy   Iyz         cz   0 -cx
         #                                   Ixz   Iyz   Izz        -cy  cx  0
-        rx = sp.nsimplify(self.origin.translation.rx, tolerance=1e-12, rational=True)
-        com_trans = np.reshape(np.array([expr.evalf() for expr in rx]),(3,3))
+        if self.origin.symbolic:
+            rx = sp.nsimplify(self.origin.translation.rx, tolerance=1e-12, rational=True)
+            com_trans = np.reshape(np.array([expr.evalf() for expr in rx]),(3,3))
+            count("sympy_simplifications")
+        else:
+            com_trans = snap_to_rational(self.origin.translation.rx, 1000000000000)
+            count("rational_snaps")
         
         mc = self.mass*com_trans
         mccT = np.matmul(mc,com_trans.transpose())
         
-        topLeft = self.inertia.to_matrix() + mccT
-        top = np.hstack((topLeft,mc))
-        bottom = np.hstack((mc.transpose(),self.mass*np.eye(3)))
-        self.spatial_ineratia = np.vstack((top,bottom)).astype(float)
+        spatial_inertia = np.empty((6,6))
+        spatial_inertia[:3,:3] = self.inertia.to_matrix() + mccT
+        spatial_inertia[:3,3:] = mc
+        spatial_inertia[3:,:3] = mc.transpose()
+        spatial_inertia[3:,3:] = self.mass*np.eye(3)
+        self.clear_robot_cache(keep_structure = True)
+        self.spatial_ineratia = spatial_inertia
         # remove numerical noise (e.g., URDF's often specify angles as 3.14 or 3.14159 but that isn't exactly PI)
-        self.spatial_ineratia[np.isclose(self.spatial_ineratia, np.zeros((6,6)), 1e-10, 1e-10)] = 0
+        self.spatial_ineratia[np.abs(self.spatial_ineratia) <= 1e-10] = 0
 
     def get_spatial_inertia(self):
         return self.spatial_ineratia
 
+    def add_geometry(self, geometry):
+        self.check_writable()
+        (self.visuals if geometry.kind == "visual" else self.collisions).append(geometry)
+
+    def get_visuals(self):
+        return self.visuals
+
+    def get_collisions(self):
+        return self.collisions
+
     def get_name(self):
         return self.name
 
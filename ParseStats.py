@@ -0,0 +1,66 @@
+import functools
+import threading
+import time
+
+# the stats being collected by the parse running on this thread (if any)
+active = threading.local()
+
+class ParseStats:
+    # wall time and call counts of each parse stage plus counters of expensive operations for one parse
+    # note: returned as parser.stats and robot.parse_stats (error holds the exception of a failed parse)
+    def __init__(self):
+        self.times = {}    # stage: total seconds
+        self.calls = {}    # stage: number of calls
+        self.counters = {} # name: count (e.g., sympy_simplifications, fixed_joints_removed)
+        self.total_time = 0.0
+        self.cache_hit = False
+        self.error = None
+
+    def record(self, stage, seconds):
+        self.times[stage] = self.times.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, name, amount = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def __enter__(self):
+        # collect counters from this thread until exit
+        self.previous = getattr(active, "stats", None)
+        active.stats = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.total_time += time.perf_counter() - self.start
+        active.stats = self.previous
+        if error is not None:
+            self.error = error
+        return False
+
+    def to_dict(self):
+        return {"times": dict(self.times), "calls": dict(self.calls), "counters": dict(self.counters), \
+                "total_time": self.total_time, "cache_hit": self.cache_hit, \
+                "error": None if self.error is None else repr(self.error)}
+
+    def __repr__(self):
+        stages = ", ".join([stage + ": %.4fs x%d" % (seconds, self.calls[stage]) for stage, seconds in self.times.items()])
+        return "ParseStats(total: %.4fs, %s, %s)" % (self.total_time, stages, self.counters)
+
+def count(name, amount = 1):
+    # count an operation against the parse running on this thread (a single attribute lookup otherwise)
+    stats = getattr(active, "stats", None)
+    if stats is not None:
+        stats.count(name, amount)
+
+def timed_stage(function):
+    # decorator recording the wall time and calls of a URDFParser method in its stats (if collecting)
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        if self.stats is None:
+            return function(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            self.stats.record(function.__name__, time.perf_counter() - start)
+    return wrapper
@@ -1,12 +1,49 @@
+import numpy as np
+import sympy as sp
 from .Link import Link
 from .Joint import Joint
+from .RobotArrays import RobotArrays
+from .Topology import Topology
+from .SpatialAlgebra import SpatialTransform
 
 class Robot:
+    # cache entries that only depend on the tree structure (kept when only link/joint values change)
+    STRUCTURE_CACHE_KEYS = ("topology", "mass_matrix_sparsity", "ltl_pattern")
+
     # initialization
     def __init__(self, name):
         self.name = name
         self.links = []
         self.joints = []
+        # hash indices of the form {key: {insertion order: object}} so lookups are O(1)
+        # note: the Link and Joint setters keep these in sync once the object is added
+        self.next_insertion_order = 0
+        self.joint_indices = {"jid": {}, "name": {}, "parent": {}, "child": {}, "bfs_level": {}}
+        self.link_indices = {"lid": {}, "name": {}, "bfs_level": {}}
+        # values derived from many links/joints (cleared whenever any of them change)
+        self.cache = {}
+        # record of the fixed joint merges done while parsing (None if unknown, see FixedJointMerges)
+        self.fixed_joint_merges = None
+        # timing and counters of the parse that built this robot (None if not parsed, see ParseStats)
+        self.parse_stats = None
+        # directory of the URDF it was parsed from (None if unknown, e.g., parsed from bytes without a base_dir)
+        self.base_dir = None
+        # shared robots (e.g., from a RobotRegistry) refuse parameter updates (clones are writable)
+        self.read_only = False
+
+    def clone(self):
+        # an independent robot (e.g., for payload or parameter variants) built from clones of every link and joint
+        # note: numeric data is shared with this robot until replaced through a setter on either one
+        robot = Robot(self.name)
+        for link in self.links:
+            robot.add_link(link.clone())
+        for joint in self.joints:
+            robot.add_joint(joint.clone())
+        if self.fixed_joint_merges is not None:
+            robot.fixed_joint_merges = self.fixed_joint_merges.clone()
+        robot.parse_stats = self.parse_stats
+        robot.base_dir = self.base_dir
+        return robot
 
     def next_none(self, iterable):
         try:
@@ -14,21 +51,175 @@ class Robot:
         except:
             return None
 
+    #################
+    #    Indices    #
+    #################
+
+    def index_add(self, index, key, obj):
+        index.setdefault(key, {})[obj.insertion_order] = obj
+
+    def index_remove(self, index, key, obj):
+        bucket = index[key]
+        del bucket[obj.insertion_order]
+        if len(bucket) == 0:
+            del index[key]
+
+    def index_first(self, index, key):
+        # objects sharing a key (e.g., temporary ids during renumbering) resolve in insertion order
+        bucket = index.get(key)
+        if bucket is None:
+            return None
+        return bucket[min(bucket)]
+
+    def index_list(self, index, key):
+        bucket = index.get(key)
+        if bucket is None:
+            return []
+        return [bucket[order] for order in sorted(bucket)]
+
+    def clear_cache(self, keep_structure = False):
+        if keep_structure:
+            self.cache = {key: value for key, value in self.cache.items() if key in self.STRUCTURE_CACHE_KEYS}
+        else:
+            self.cache = {}
+
+    def check_writable(self):
+        if self.read_only:
+            raise RuntimeError("[!Error] This robot is shared read-only (e.g., from a RobotRegistry), update a robot.clone() instead!")
+
+    def reindex(self, indices, obj, attribute, value):
+        self.clear_cache()
+        self.index_remove(indices[attribute], getattr(obj, attribute), obj)
+        self.index_add(indices[attribute], value, obj)
+
+    def reindex_joint(self, joint, attribute, value):
+        self.reindex(self.joint_indices, joint, attribute, value)
+
+    def reindex_link(self, link, attribute, value):
+        self.reindex(self.link_indices, link, attribute, value)
+
     #################
     #    Setters    #
     #################
 
     def add_joint(self, joint):
+        self.check_writable()
+        joint.robot = self
+        joint.insertion_order = self.next_insertion_order
+        self.next_insertion_order += 1
+        self.clear_cache()
+        for attribute, index in self.joint_indices.items():
+            self.index_add(index, getattr(joint, attribute), joint)
         self.joints.append(joint)
 
     def add_link(self, link):
+        self.check_writable()
+        link.robot = self
+        link.insertion_order = self.next_insertion_order
+        self.next_insertion_order += 1
+        self.clear_cache()
+        for attribute, index in self.link_indices.items():
+            self.index_add(index, getattr(link, attribute), link)
         self.links.append(link)
 
     def remove_joint(self, joint):
-        self.joints.remove(joint)
+        self.remove_joints([joint])
 
     def remove_link(self, link):
-        self.links.remove(link)
+        self.remove_links([link])
+
+    def remove_joints(self, joints):
+        # removes all of the joints in one pass over the joint list
+        self.check_writable()
+        self.clear_cache()
+        removed = set()
+        for joint in joints:
+            for attribute, index in self.joint_indices.items():
+                self.index_remove(index, getattr(joint, attribute), joint)
+            joint.robot = None
+            removed.add(joint.insertion_order)
+        self.joints = [joint for joint in self.joints if joint.insertion_order not in removed]
+
+    def remove_links(self, links):
+        # removes all of the links in one pass over the link list
+        self.check_writable()
+        self.clear_cache()
+        removed = set()
+        for link in links:
+            for attribute, index in self.link_indices.items():
+                self.index_remove(index, getattr(link, attribute), link)
+            link.robot = None
+            removed.add(link.insertion_order)
+        self.links = [link for link in self.links if link.insertion_order not in removed]
+
+    ##########################
+    #    Parameter Updates   #
+    ##########################
+
+    # update parameters by URDF name (including links/joints merged away by fixed joints) without reparsing
+    # note: only the merged inertias/transforms that depend on the update are recomputed (in the same order as
+    #       parsing so the result matches reparsing the updated URDF) and ids and topology are unchanged
+
+    def get_urdf_link_by_name(self, name):
+        link = self.get_link_by_name(name)
+        if link is None and self.fixed_joint_merges is not None:
+            link = self.fixed_joint_merges.removed_links.get(name)
+        return link
+
+    def get_urdf_joint_by_name(self, name):
+        joint = self.get_joint_by_name(name)
+        if joint is None and self.fixed_joint_merges is not None:
+            joint = self.fixed_joint_merges.removed_joints.get(name)
+        return joint
+
+    def set_link_inertial_by_name(self, name, mass, ixx, ixy, ixz, iyy, iyz, izz, com = None):
+        # com is the inertial origin xyz (unchanged if None)
+        link = self.get_urdf_link_by_name(name)
+        self.check_update_parameters(link, name, com = com)
+        if com is not None:
+            link.set_origin_xyz(com)
+        link.set_inertia(mass, ixx, ixy, ixz, iyy, iyz, izz)
+        self.update_merged_parameters({}, {name: link.get_spatial_inertia()})
+
+    def set_joint_origin_by_name(self, name, xyz = None, rpy = None):
+        # xyz and/or rpy of the joint origin (each unchanged if None)
+        joint = self.get_urdf_joint_by_name(name)
+        self.check_update_parameters(joint, name, xyz = xyz, rpy = rpy)
+        if xyz is not None:
+            joint.set_origin_xyz(xyz)
+        if rpy is not None:
+            joint.set_origin_rpy(rpy)
+        joint.set_type(joint.jtype, joint.axis)
+        Xmat = joint.get_transformation_matrix() if joint.symbolic else joint.get_fixed_transformation_matrix()
+        self.update_merged_parameters({name: Xmat}, {})
+
+    def check_update_parameters(self, obj, name, **vectors):
+        # raise (before anything is changed) if the update cannot be applied
+        self.check_writable()
+        if self.fixed_joint_merges is None:
+            raise RuntimeError("[!Error] Parameters can only be updated on robots returned by URDFParser.parse (which record the fixed joint merges)!")
+        if obj is None:
+            raise KeyError("[!Error] No link or joint named " + str(name) + "!")
+        for key, vector in vectors.items():
+            if vector is not None and np.shape(vector) != (3,):
+                raise ValueError("[!Error] " + key + " must have 3 values! Got: " + str(vector))
+
+    def update_merged_parameters(self, Xmats, Imats):
+        # replay the fixed joint merges depending on the updated (unmerged) values and store the results
+        merges = self.fixed_joint_merges
+        Xmats = {name: Xmat for name, Xmat in Xmats.items() if name in merges.joint_names}
+        Imats = {name: Imat for name, Imat in Imats.items() if name in merges.link_names}
+        if len(Xmats) == 0 and len(Imats) == 0:
+            return
+        merges.replay(Xmats, Imats)
+        for name, Xmat in Xmats.items():
+            joint = self.get_urdf_joint_by_name(name)
+            if joint.symbolic:
+                joint.set_transformation_matrix(Xmat)
+            else:
+                joint.set_fixed_transformation_matrix(Xmat)
+        for name, Imat in Imats.items():
+            self.get_urdf_link_by_name(name).set_spatial_inertia(Imat)
 
     #########################
     #    Generic Getters    #
@@ -65,42 +256,48 @@ class Robot:
         return len(self.get_parent_ids(jids)) != len(self.get_unique_parent_ids(jids))
 
     def get_subtree_by_id(self, lid):
-        return sorted(self.get_link_by_id(lid).get_subtree())
+        return self.get_topology().get_subtree(lid)
 
     def get_total_subtree_count(self):
-        return sum([len(self.get_subtree_by_id(lid)) for lid in range(self.get_num_joints())])
+        return self.get_topology().get_total_subtree_count()
 
     def get_ancestors_by_id(self, jid):
-        ancestors = []
-        curr_id = jid
-        while True:
-            curr_id = self.get_parent_id(curr_id)
-            if curr_id == -1:
-                break
-            else:
-                ancestors.append(curr_id)
-        return ancestors
+        return self.get_topology().get_ancestors(jid)
 
     def get_total_ancestor_count(self):
-        return sum([len(self.get_ancestors_by_id(jid)) for jid in range(self.get_num_joints())])
+        return self.get_topology().get_total_ancestor_count()
 
     def get_is_ancestor_of(self, jid, jid_of):
-        return jid in self.get_ancestors_by_id(jid_of)
+        return self.get_topology().is_ancestor_of(jid, jid_of)
 
     def get_is_in_subtree_of(self, jid, jid_of):
-        return jid in self.get_subtree_by_id(jid_of)
+        return self.get_topology().is_in_subtree_of(jid, jid_of)
 
     def get_max_bfs_level(self):
-        return sorted(self.joints, key=lambda joint: joint.bfs_level, reverse = True)[0].bfs_level
+        return max(self.joint_indices["bfs_level"].keys())
 
     def get_ids_by_bfs_level(self, level):
-        return [joint.jid for joint in self.get_joints_by_bfs_level(level)]
+        return self.get_topology().get_ids_by_level(level).tolist()
 
     def get_bfs_level_by_id(self, jid):
         return(self.get_joint_by_id(jid).get_bfs_level())
 
     def get_max_bfs_width(self):
-        return max([len(self.get_ids_by_bfs_level(level)) for level in range(self.get_max_bfs_level() + 1)])
+        return self.get_topology().get_max_width()
+
+    def get_topology(self):
+        # precomputed ancestor/subtree/level tables (computed once and cached, see Topology)
+        if "topology" not in self.cache:
+            levels = range(self.get_max_bfs_level() + 1) if self.get_num_joints() > 0 else []
+            level_ids = [[joint.jid for joint in self.get_joints_by_bfs_level(level)] for level in levels]
+            self.cache["topology"] = Topology(self.get_parent_id_array(), level_ids)
+        return self.cache["topology"]
+
+    def to_arrays(self):
+        # a read-only structure of arrays export of the model (computed once and cached, see RobotArrays)
+        if "arrays" not in self.cache:
+            self.cache["arrays"] = RobotArrays.from_robot(self)
+        return self.cache["arrays"]
 
 
     ###############
@@ -111,13 +308,13 @@ class Robot:
         return len(self.joints)
 
     def get_joint_by_id(self, jid):
-        return self.next_none(filter(lambda fjoint: fjoint.jid == jid, self.joints))
+        return self.index_first(self.joint_indices["jid"], jid)
 
     def get_joint_by_name(self, name):
-        return self.next_none(filter(lambda fjoint: fjoint.name == name, self.joints))
+        return self.index_first(self.joint_indices["name"], name)
 
     def get_joints_by_bfs_level(self, level):
-        return list(filter(lambda fjoint: fjoint.bfs_level == level, self.joints))
+        return self.index_list(self.joint_indices["bfs_level"], level)
 
     def get_joints_ordered_by_id(self, reverse = False):
         return sorted(self.joints, key=lambda item: item.jid, reverse = reverse)
@@ -132,13 +329,13 @@ class Robot:
         return {joint.name:joint for joint in self.joints}
 
     def get_joints_by_parent_name(self, parent_name):
-        return list(filter(lambda fjoint: fjoint.parent == parent_name, self.joints))
+        return self.index_list(self.joint_indices["parent"], parent_name)
 
     def get_joints_by_child_name(self, child_name):
-        return list(filter(lambda fjoint: fjoint.child == child_name, self.joints))
+        return self.index_list(self.joint_indices["child"], child_name)
 
     def get_joint_by_parent_child_name(self, parent_name, child_name):
-        return self.next_none(filter(lambda fjoint: fjoint.parent == parent_name and fjoint.child == child_name, self.joints))
+        return self.next_none(filter(lambda fjoint: fjoint.child == child_name, self.get_joints_by_parent_name(parent_name)))
 
     def get_damping_by_id(self, jid):
         return self.get_joint_by_id(jid).get_damping()
@@ -155,13 +352,13 @@ class Robot:
         return get_num_links() - 1
 
     def get_link_by_id(self, lid):
-        return self.next_none(filter(lambda flink: flink.lid == lid, self.links))
+        return self.index_first(self.link_indices["lid"], lid)
 
     def get_link_by_name(self, name):
-        return self.next_none(filter(lambda flink: flink.name == name, self.links))
+        return self.index_first(self.link_indices["name"], name)
 
     def get_links_by_bfs_level(self, level):
-        return list(filter(lambda flink: flink.bfs_level == level, self.links))
+        return self.index_list(self.link_indices["bfs_level"], level)
 
     def get_links_ordered_by_id(self, reverse = False):
         return sorted(self.links, key=lambda item: item.lid, reverse = reverse)
@@ -225,6 +422,69 @@ class Robot:
     def get_Xmat_Funcs_dict_by_name(self):
         return {joint.name:joint.get_transformation_matrix_function() for joint in self.joints}
 
+    def get_Xmat_Func_all(self):
+        # a single function mapping the full q vector (ordered by id) to all n Xmats as an (n, 6, 6) array
+        if "Xmat_Func_all" not in self.cache:
+            joints = self.get_joints_ordered_by_id()
+            n = len(joints)
+            if n == 0 or not joints[0].symbolic:
+                self.cache["Xmat_Func_all"] = self.eval_Xmats
+            else:
+                q = sp.symbols("q0:" + str(n))
+                Xmats = [joint.get_transformation_matrix().xreplace({joint.theta: q[jid]}) for jid, joint in enumerate(joints)]
+                Xmat_Func_stacked = sp.utilities.lambdify([q], sp.Matrix.vstack(*Xmats), 'numpy')
+                self.cache["Xmat_Func_all"] = lambda q_in: np.reshape(Xmat_Func_stacked(q_in), (n,6,6))
+        return self.cache["Xmat_Func_all"]
+
+    def eval_Xmats(self, q):
+        # evaluate every Xmat for a (B, n) batch of joint configurations ordered by id -> (B, n, 6, 6)
+        # note: uses the per joint closed form X = cos(q)*A + sin(q)*B + K (revolute) or q*A + K (prismatic)
+        q = np.asarray(q, dtype=float)
+        single = q.ndim == 1
+        q = np.atleast_2d(q)
+        joints = self.get_joints_ordered_by_id()
+        coefficients = [joint.get_transformation_matrix_coefficients() for joint in joints]
+        A = np.array([coefficient[0] for coefficient in coefficients])
+        B = np.array([coefficient[1] for coefficient in coefficients])
+        K = np.array([coefficient[2] for coefficient in coefficients])
+        revolute = np.array([joint.jtype == 'revolute' for joint in joints])
+        prismatic = np.array([joint.jtype == 'prismatic' for joint in joints])
+        u = np.where(revolute, np.cos(q), np.where(prismatic, q, 0.0))
+        v = np.where(revolute, np.sin(q), 0.0)
+        Xmats = u[:,:,None,None] * A + v[:,:,None,None] * B + K
+        return Xmats[0] if single else Xmats
+
+    def get_transform_coefficients(self):
+        # per joint closed form of the compact transforms (ordered by id) read from the Xmat coefficients:
+        #   E = cos(q)*Ea + sin(q)*Eb + Ek (revolute) or Ek (prismatic) and r = r0 + q*rq (rq is zero unless prismatic)
+        if "transform_coefficients" not in self.cache:
+            joints = self.get_joints_ordered_by_id()
+            coefficients = [joint.get_transformation_matrix_coefficients() for joint in joints]
+            A = np.array([coefficient[0] for coefficient in coefficients]).reshape((-1,6,6))
+            B = np.array([coefficient[1] for coefficient in coefficients]).reshape((-1,6,6))
+            K = np.array([coefficient[2] for coefficient in coefficients]).reshape((-1,6,6))
+            revolute = np.array([joint.jtype == 'revolute' for joint in joints], dtype=bool)
+            prismatic = np.array([joint.jtype == 'prismatic' for joint in joints], dtype=bool)
+            Ea = np.where(revolute[:,None,None], A[:,:3,:3], 0.0)
+            Eb = np.where(revolute[:,None,None], B[:,:3,:3], 0.0)
+            # r from X(0) and, for prismatic joints, X(1) - X(0)
+            r0 = SpatialTransform.from_matrix(np.where(revolute[:,None,None], A + K, K)).r
+            rq = np.where(prismatic[:,None], SpatialTransform.from_matrix(A + K).r - r0, 0.0)
+            self.cache["transform_coefficients"] = (Ea, Eb, K[:,:3,:3].copy(), r0, rq, revolute)
+        return self.cache["transform_coefficients"]
+
+    def eval_transforms(self, q):
+        # evaluate every joint transform for a (B, n) batch of joint configurations ordered by id as a compact
+        # SpatialTransform of shape (B, n) (rotations (B, n, 3, 3) and translations (B, n, 3))
+        q = np.asarray(q, dtype=float)
+        single = q.ndim == 1
+        q = np.atleast_2d(q)
+        Ea, Eb, Ek, r0, rq, revolute = self.get_transform_coefficients()
+        E = np.where(revolute, np.cos(q), 0.0)[:,:,None,None] * Ea + np.where(revolute, np.sin(q), 0.0)[:,:,None,None] * Eb + Ek
+        r = r0 + q[:,:,None] * rq
+        transforms = SpatialTransform(E, r)
+        return transforms[0] if single else transforms
+
     ##############
     #    IMAT    #
     ##############
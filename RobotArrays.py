@@ -0,0 +1,109 @@
+import json
+import numpy as np
+
+class RobotArrays:
+    # structure of arrays view of a parsed robot packed into one contiguous read-only buffer
+    # fields (n = number of joints, joints/links ordered by id, link -1 is the base at index 0 of I):
+    #   parent    int32[n]         parent id of each joint (-1 for the base)
+    #   S         float64[n,6]     motion subspace
+    #   I         float64[n+1,6,6] spatial inertia of the base followed by each link
+    #   Xfixed    float64[n,6,6]   fixed part of each Xmat (Xmat = X_free(q) * Xfixed)
+    #   jtype     int8[n]          joint type code (see JOINT_TYPES)
+    #   axis      int8[n]          axis of motion code 0/1/2 for x/y/z (-1 if none)
+    #   damping   float64[n]       velocity damping coefficient
+    #   bfs_level int32[n]         bfs level of each joint
+    #   bfs_id    int32[n]         bfs id of each joint (the bfs permutation)
+    #   bfs_order int32[n]         joint ids in bfs order (the inverse bfs permutation)
+    #   urdf_id   int32[n]         URDF joint index of each joint (the dfs permutation)
+    JOINT_TYPES = ("fixed", "revolute", "prismatic")
+    FIELDS = (("parent", np.int32, (0,)), ("S", np.float64, (0,6)), ("I", np.float64, (1,6,6)), \
+              ("Xfixed", np.float64, (0,6,6)), ("jtype", np.int8, (0,)), ("axis", np.int8, (0,)), \
+              ("damping", np.float64, (0,)), ("bfs_level", np.int32, (0,)), ("bfs_id", np.int32, (0,)), \
+              ("bfs_order", np.int32, (0,)), ("urdf_id", np.int32, (0,)))
+    MAGIC = b"URDFARR1"
+    ALIGNMENT = 64
+
+    def __init__(self, name, n, buffer):
+        self.name = name
+        self.n = n
+        self.buffer = buffer
+        for field, dtype, shape, offset in self.get_layout(n):
+            array = np.ndarray(shape, dtype = dtype, buffer = buffer, offset = offset)
+            array.flags.writeable = False
+            setattr(self, field, array)
+
+    @classmethod
+    def align(cls, nbytes):
+        return -(-nbytes // cls.ALIGNMENT) * cls.ALIGNMENT
+
+    @classmethod
+    def get_layout(cls, n):
+        # (field, dtype, shape, byte offset) for every field with each field aligned in the buffer
+        layout = []
+        offset = 0
+        for field, dtype, shape in cls.FIELDS:
+            shape = (n + shape[0],) + shape[1:]
+            layout.append((field, dtype, shape, offset))
+            offset += cls.align(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        return layout
+
+    @classmethod
+    def get_nbytes(cls, n):
+        return sum([cls.align(int(np.prod(shape)) * np.dtype(dtype).itemsize) for _, dtype, shape, _ in cls.get_layout(n)])
+
+    @classmethod
+    def from_robot(cls, robot):
+        joints = robot.get_joints_ordered_by_id()
+        n = len(joints)
+        buffer = np.zeros(cls.get_nbytes(n), dtype = np.uint8)
+        arrays = {field: np.ndarray(shape, dtype = dtype, buffer = buffer, offset = offset) \
+                  for field, dtype, shape, offset in cls.get_layout(n)}
+        arrays["parent"][:] = robot.get_parent_id_array()
+        arrays["I"][:] = robot.get_Imats_ordered_by_id()
+        for jid, joint in enumerate(joints):
+            A, B, K = joint.get_transformation_matrix_coefficients()
+            arrays["S"][jid] = joint.get_joint_subspace()
+            arrays["Xfixed"][jid] = A + K if joint.jtype == 'revolute' else K
+            arrays["jtype"][jid] = cls.JOINT_TYPES.index(joint.jtype)
+            arrays["axis"][jid] = -1 if joint.axis is None else int(np.argmax(np.abs(joint.axis)))
+            arrays["damping"][jid] = joint.get_damping()
+            arrays["bfs_level"][jid] = joint.get_bfs_level()
+            arrays["bfs_id"][jid] = joint.get_bfs_id()
+            arrays["urdf_id"][jid] = joint.urdf_jid
+        arrays["bfs_order"][arrays["bfs_id"]] = np.arange(n, dtype = np.int32)
+        buffer.flags.writeable = False
+        return cls(robot.get_name(), n, buffer)
+
+    def save(self, path):
+        # file layout: magic, uint64 header length, json header, padding to ALIGNMENT, buffer
+        header = json.dumps({"name": self.name, "n": self.n}).encode()
+        data_offset = self.align(len(self.MAGIC) + 8 + len(header))
+        with open(path, "wb") as arrays_file:
+            arrays_file.write(self.MAGIC)
+            arrays_file.write(np.uint64(len(header)).tobytes())
+            arrays_file.write(header)
+            arrays_file.write(b"\0" * (data_offset - len(self.MAGIC) - 8 - len(header)))
+            arrays_file.write(self.buffer.tobytes())
+
+    @classmethod
+    def load(cls, path, mmap = True):
+        # with mmap the arrays are read-only views of the file shared by every process that maps it
+        with open(path, "rb") as arrays_file:
+            if arrays_file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("[!Error] " + str(path) + " is not a robot arrays file!")
+            header_length = int(np.frombuffer(arrays_file.read(8), dtype = np.uint64)[0])
+            header = json.loads(arrays_file.read(header_length).decode())
+        data_offset = cls.align(len(cls.MAGIC) + 8 + header_length)
+        nbytes = cls.get_nbytes(header["n"])
+        if mmap:
+            buffer = np.memmap(path, dtype = np.uint8, mode = "r", offset = data_offset, shape = (nbytes,))
+        else:
+            buffer = np.fromfile(path, dtype = np.uint8, count = nbytes, offset = data_offset)
+            buffer.flags.writeable = False
+        return cls(header["name"], header["n"], buffer)
+
+    def get_num_joints(self):
+        return self.n
+
+    def get_field_names(self):
+        return [field[0] for field in self.FIELDS]
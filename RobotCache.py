@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import sympy as sp
+from .Robot import Robot
+from .Link import Link
+from .Joint import Joint
+from .InertiaSet import InertiaSet
+from .Geometry import Geometry
+from .FixedJointMerges import FixedJointMerges
+from .SpatialAlgebra import parse_srepr
+from .version import __version__
+
+class RobotCache:
+    # on disk cache of fully processed robots stored as .npz files (a json header plus numpy arrays)
+    # note: bump FORMAT_VERSION whenever the stored arrays change
+    FORMAT_VERSION = 7
+    NO_PARENT = -2 # stored parent id of the root link (whose parent id is None)
+
+    def __init__(self, cache_dir, max_bytes = 256*1024*1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok = True)
+
+    def make_key(self, contents, alpha_tie_breaker = False, symbolic = True, rigid = False):
+        hasher = hashlib.sha256(contents)
+        hasher.update(json.dumps([alpha_tie_breaker, symbolic, rigid, __version__, self.FORMAT_VERSION]).encode())
+        return hasher.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    #################
+    #    Loading    #
+    #################
+
+    def load(self, key):
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            # note: the zip CRC of every member is checked as it is read
+            with np.load(path, allow_pickle = False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            header = json.loads(arrays.pop("header").tobytes().decode())
+            if header["format"] != self.FORMAT_VERSION or header["version"] != __version__ or header["key"] != key:
+                raise ValueError("stale cache entry")
+            robot = self.robot_from_arrays(header, arrays)
+        except Exception:
+            # corrupted or stale so drop it and reparse
+            self.remove(path)
+            return None
+        # mark as recently used for eviction
+        os.utime(path)
+        return robot
+
+    @classmethod
+    def robot_from_arrays(cls, header, arrays):
+        symbolic = header["symbolic"]
+        rigid = header.get("rigid", False)
+        robot = Robot(header["name"])
+        robot.base_dir = header.get("base_dir")
+        geometries = json.loads(arrays["link_geometries"].tobytes().decode())
+        for ind, name in enumerate(arrays["link_names"]):
+            link = Link(str(name), int(arrays["link_urdf_ids"][ind]), symbolic)
+            link.set_id(int(arrays["link_ids"][ind]))
+            parent_id = int(arrays["link_parent_ids"][ind])
+            link.set_parent_id(None if parent_id == cls.NO_PARENT else parent_id)
+            link.set_bfs_id(int(arrays["link_bfs_ids"][ind]))
+            link.set_bfs_level(int(arrays["link_bfs_levels"][ind]))
+            link.set_subtree(range(*[int(lid) for lid in arrays["link_subtree_ranges"][ind]]))
+            link.mass = float(arrays["link_masses"][ind])
+            link.inertia = InertiaSet(*[float(value) for value in arrays["link_inertias"][ind]])
+            link.set_spatial_inertia(arrays["link_Imats"][ind])
+            cls.set_origin(link, arrays["link_origins"][ind])
+            for values in geometries[ind]:
+                link.add_geometry(Geometry.from_dict(values))
+            robot.add_link(link)
+        for ind, name in enumerate(arrays["joint_names"]):
+            joint = Joint(str(name), int(arrays["joint_urdf_ids"][ind]), \
+                          str(arrays["joint_parents"][ind]), str(arrays["joint_children"][ind]), symbolic, rigid)
+            joint.set_id(int(arrays["joint_ids"][ind]))
+            joint.set_bfs_id(int(arrays["joint_bfs_ids"][ind]))
+            joint.set_bfs_level(int(arrays["joint_bfs_levels"][ind]))
+            joint.jtype = str(arrays["joint_types"][ind])
+            axis = arrays["joint_axes"][ind]
+            joint.axis = None if np.isnan(axis).any() else [float(value) for value in axis]
+            joint.S = arrays["joint_Ss"][ind]
+            joint.set_damping(float(arrays["joint_dampings"][ind]))
+            cls.set_origin(joint, arrays["joint_origins"][ind])
+            joint.set_transformation_matrix_coefficients(arrays["joint_As"][ind], arrays["joint_Bs"][ind], arrays["joint_Ks"][ind], \
+                                                         str(arrays["joint_Xmat_sreprs"][ind]) if symbolic else None)
+            robot.add_joint(joint)
+        robot.fixed_joint_merges = cls.merges_from_dict(json.loads(arrays["fixed_joint_merges"].tobytes().decode()), \
+                                                    symbolic, rigid)
+        return robot
+
+    @classmethod
+    def set_origin(cls, obj, values):
+        # restore a link/joint origin from its [x, y, z, roll, pitch, yaw] (NaN if it was never set)
+        if np.isnan(values).any():
+            return
+        # note: joints also have their fixed transform built (by set_type when parsed)
+        obj.origin.restore([float(value) for value in values[:3]], [float(value) for value in values[3:]], isinstance(obj, Joint))
+
+    #################
+    #    Storing    #
+    #################
+
+    def store(self, key, robot, symbolic = True, rigid = False):
+        header = {"format": self.FORMAT_VERSION, "version": __version__, "key": key, \
+                  "name": robot.get_name(), "symbolic": symbolic, "rigid": rigid}
+        arrays = self.robot_to_arrays(robot)
+        arrays["header"] = np.frombuffer(json.dumps(header).encode(), dtype = np.uint8)
+        # write atomically so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir = self.cache_dir, suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                np.savez(tmp_file, **arrays)
+            os.replace(tmp_path, self.get_path(key))
+        except Exception:
+            self.remove(tmp_path)
+            raise
+        self.evict(keep = self.get_path(key))
+
+    @classmethod
+    def robot_to_arrays(cls, robot):
+        links = robot.links
+        joints = robot.joints
+        coefficients = [joint.get_transformation_matrix_coefficients() for joint in joints]
+        geometries = [[geometry.to_dict() for geometry in link.get_visuals() + link.get_collisions()] for link in links]
+        return {
+            "link_names": np.array([link.get_name() for link in links], dtype = str),
+            "link_urdf_ids": np.array([link.urdf_lid for link in links], dtype = np.int64),
+            "link_ids": np.array([link.get_id() for link in links], dtype = np.int64),
+            "link_parent_ids": np.array([cls.NO_PARENT if link.get_parent_id() is None else link.get_parent_id() \
+                                         for link in links], dtype = np.int64),
+            "link_bfs_ids": np.array([link.get_bfs_id() for link in links], dtype = np.int64),
+            "link_bfs_levels": np.array([link.get_bfs_level() for link in links], dtype = np.int64),
+            "link_subtree_ranges": np.array([(link.get_subtree().start, link.get_subtree().stop) for link in links], \
+                                            dtype = np.int64).reshape(len(links),2),
+            "link_masses": np.array([link.mass for link in links], dtype = float),
+            "link_inertias": np.array([link.inertia.to_vector() for link in links], dtype = float).reshape(len(links),6),
+            "link_Imats": np.array([link.get_spatial_inertia() for link in links], dtype = float).reshape(len(links),6,6),
+            "link_geometries": np.frombuffer(json.dumps(geometries).encode(), dtype = np.uint8),
+            "joint_names": np.array([joint.get_name() for joint in joints], dtype = str),
+            "joint_types": np.array([joint.jtype for joint in joints], dtype = str),
+            "joint_parents": np.array([joint.get_parent() for joint in joints], dtype = str),
+            "joint_children": np.array([joint.get_child() for joint in joints], dtype = str),
+            "joint_urdf_ids": np.array([joint.urdf_jid for joint in joints], dtype = np.int64),
+            "joint_ids": np.array([joint.get_id() for joint in joints], dtype = np.int64),
+            "joint_bfs_ids": np.array([joint.get_bfs_id() for joint in joints], dtype = np.int64),
+            "joint_bfs_levels": np.array([joint.get_bfs_level() for joint in joints], dtype = np.int64),
+            "joint_axes": np.array([[np.nan]*3 if joint.axis is None else joint.axis for joint in joints], dtype = float).reshape(len(joints),3),
+            "joint_Ss": np.array([joint.get_joint_subspace() for joint in joints]).reshape(len(joints),6),
+            "joint_dampings": np.array([joint.get_damping() for joint in joints], dtype = float),
+            "joint_As": np.array([coefficient[0] for coefficient in coefficients], dtype = float).reshape(len(joints),6,6),
+            "joint_Bs": np.array([coefficient[1] for coefficient in coefficients], dtype = float).reshape(len(joints),6,6),
+            "joint_Ks": np.array([coefficient[2] for coefficient in coefficients], dtype = float).reshape(len(joints),6,6),
+            "joint_Xmat_sreprs": np.array([sp.srepr(joint.get_transformation_matrix()) if joint.symbolic else "" \
+                                           for joint in joints], dtype = str),
+            "link_origins": np.array([cls.get_origin(link) for link in links], dtype = float).reshape(len(links),6),
+            "joint_origins": np.array([cls.get_origin(joint) for joint in joints], dtype = float).reshape(len(joints),6),
+            "fixed_joint_merges": np.frombuffer(json.dumps(cls.merges_to_dict(robot.fixed_joint_merges)).encode(), dtype = np.uint8),
+        }
+
+    @classmethod
+    def get_origin(cls, obj):
+        translation = obj.origin.translation
+        rotation = obj.origin.rotation
+        if translation is None or rotation is None:
+            return [np.nan]*6
+        return [float(translation.x), float(translation.y), float(translation.z), \
+                float(rotation.r), float(rotation.p), float(rotation.y)]
+
+    ############################
+    #    Fixed Joint Merges    #
+    ############################
+
+    # the merge record (see FixedJointMerges) is stored as json with numpy matrices as nested lists and sympy
+    # matrices as their sp.srepr (both round trip exactly) so parameters of restored robots can be updated by name
+
+    @classmethod
+    def matrix_to_dict(cls, matrix):
+        if isinstance(matrix, np.ndarray):
+            return {"array": matrix.tolist()}
+        return {"srepr": sp.srepr(matrix)}
+
+    @classmethod
+    def matrix_from_dict(cls, values):
+        if "array" in values:
+            return np.array(values["array"], dtype = float)
+        return sp.Matrix(parse_srepr(values["srepr"]))
+
+    @classmethod
+    def merges_to_dict(cls, merges):
+        if merges is None:
+            return None
+        matrix_keys = ("before", "operand", "Xmat", "Imat")
+        steps = [{key: cls.matrix_to_dict(value) if key in matrix_keys else value for key, value in step.items()} \
+                 for step in merges.steps]
+        links = [{"name": link.get_name(), "urdf_id": link.urdf_lid, "id": link.get_id(), "mass": link.mass, \
+                  "inertia": list(link.inertia.to_vector()), "Imat": link.get_spatial_inertia().tolist(), \
+                  "origin": cls.get_origin(link), \
+                  "geometries": [geometry.to_dict() for geometry in link.get_visuals() + link.get_collisions()]} \
+                 for link in merges.removed_links.values()]
+        joints = [{"name": joint.get_name(), "urdf_id": joint.urdf_jid, "id": joint.get_id(), \
+                   "parent": joint.get_parent(), "child": joint.get_child(), "type": joint.jtype, "axis": joint.axis, \
+                   "damping": joint.get_damping(), "origin": cls.get_origin(joint), \
+                   "Xmat": cls.matrix_to_dict(joint.get_transformation_matrix() if joint.symbolic else joint.get_fixed_transformation_matrix())} \
+                  for joint in merges.removed_joints.values()]
+        return {"steps": steps, "link_names": sorted(merges.link_names), "joint_names": sorted(merges.joint_names), \
+                "removed_links": links, "removed_joints": joints}
+
+    @classmethod
+    def merges_from_dict(cls, values, symbolic, rigid = False):
+        if values is None:
+            return None
+        merges = FixedJointMerges()
+        matrix_keys = ("before", "operand", "Xmat", "Imat")
+        merges.steps = [{key: cls.matrix_from_dict(value) if key in matrix_keys else value for key, value in step.items()} \
+                        for step in values["steps"]]
+        merges.link_names = set(values["link_names"])
+        merges.joint_names = set(values["joint_names"])
+        for link_values in values["removed_links"]:
+            link = Link(link_values["name"], link_values["urdf_id"], symbolic)
+            link.set_id(link_values["id"])
+            link.mass = link_values["mass"]
+            link.inertia = InertiaSet(*link_values["inertia"])
+            link.set_spatial_inertia(np.array(link_values["Imat"], dtype = float))
+            cls.set_origin(link, np.array(link_values["origin"], dtype = float))
+            for geometry_values in link_values["geometries"]:
+                link.add_geometry(Geometry.from_dict(geometry_values))
+            merges.removed_links[link.get_name()] = link
+        for joint_values in values["removed_joints"]:
+            joint = Joint(joint_values["name"], joint_values["urdf_id"], joint_values["parent"], joint_values["child"], \
+                          symbolic, rigid)
+            joint.set_id(joint_values["id"])
+            joint.jtype = joint_values["type"]
+            joint.axis = joint_values["axis"]
+            joint.S = np.array([0,0,0,0,0,0])
+            joint.set_damping(joint_values["damping"])
+            cls.set_origin(joint, np.array(joint_values["origin"], dtype = float))
+            if symbolic:
+                joint.set_transformation_matrix(cls.matrix_from_dict(joint_values["Xmat"]))
+            else:
+                joint.set_fixed_transformation_matrix(cls.matrix_from_dict(joint_values["Xmat"]))
+            merges.removed_joints[joint.get_name()] = joint
+        return merges
+
+    ##################
+    #    Eviction    #
+    ##################
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_entries(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".npz"):
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get_total_bytes(self):
+        return sum([entry[1] for entry in self.get_entries()])
+
+    def evict(self, keep = None):
+        # drop the least recently used entries until the cache fits in max_bytes
+        entries = sorted(self.get_entries())
+        total_bytes = sum([entry[1] for entry in entries])
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if path != keep:
+                self.remove(path)
+                total_bytes -= size
+
+    def clear(self):
+        for entry in self.get_entries():
+            self.remove(entry[2])
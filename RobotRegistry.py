@@ -0,0 +1,224 @@
+import gc
+import hashlib
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from .URDFParser import URDFParser
+
+class RegistryEntry:
+    # a parsed robot and the file state it was parsed from
+    def __init__(self, robot, stamp, digest):
+        self.robot = robot
+        self.stamp = stamp   # (mtime_ns, size, inode) of the file when it was read
+        self.digest = digest # sha256 of the file contents
+        self.nbytes, self.cache_keys = measure_robot(robot) # estimated memory and the robot cache keys it includes
+
+class RobotRegistry:
+    # thread-safe in-memory registry of shared parsed robots keyed by (path, alpha_tie_breaker, symbolic, rigid)
+    # note: entries are checked against the file's mtime/size/inode on every get (and its content hash if those
+    #       changed) so edited files are reparsed, concurrent gets of the same model share a single parse, and the
+    #       least recently used entries are evicted once the estimated memory of all robots exceeds max_bytes
+    # note: robots are remeasured on gets, parses, and stats once their lazily filled caches (e.g., Xmats, topology,
+    #       or arrays) have changed since they were measured so memory filled in after the parse is counted too
+    # note: returned robots are shared read-only (every link/joint/robot setter raises a RuntimeError) so use
+    #       robot.clone() for variants
+    def __init__(self, max_bytes = 1024*1024*1024, cache_dir = None, cache_max_bytes = 256*1024*1024):
+        self.max_bytes = max_bytes
+        # optional on disk cache used by every parse (see RobotCache)
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # key: RegistryEntry in least to most recently used order
+        self.pending = {}            # key: Future of the parse in flight
+        self.total_bytes = 0
+        self.hits = 0        # served from memory
+        self.misses = 0      # parsed (including reparses of changed files)
+        self.coalesced = 0   # waited on a parse already in flight for the same model
+        self.invalidations = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def make_key(self, path, alpha_tie_breaker = False, symbolic = True, rigid = False):
+        return (os.path.realpath(path), bool(alpha_tie_breaker), bool(symbolic), bool(rigid))
+
+    def get_stamp(self, path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    #################
+    #    Lookups    #
+    #################
+
+    def get(self, path, alpha_tie_breaker = False, symbolic = True, rigid = False):
+        # the shared robot parsed from path (parsing at most once across threads), raises if it cannot be parsed
+        key = self.make_key(path, alpha_tie_breaker, symbolic, rigid)
+        stamp = self.get_stamp(key[0])
+        with self.lock:
+            entry = self.entries.get(key)
+            is_hit = entry is not None and entry.stamp == stamp
+            if is_hit:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                future = self.pending.get(key)
+                is_owner = future is None
+                if is_owner:
+                    future = Future()
+                    self.pending[key] = future
+                else:
+                    self.coalesced += 1
+        if is_hit:
+            self.update_sizes(keep = key)
+            return entry.robot
+        if not is_owner:
+            return future.result()
+        try:
+            robot = self.load_entry(key, entry)
+            future.set_result(robot)
+            return robot
+        except Exception as error:
+            with self.lock:
+                self.errors += 1
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+
+    def load_entry(self, key, entry):
+        # reparse key unless the file contents are unchanged (e.g., only touched) -> robot
+        # note: the stamp is taken before reading so a write during the read is caught by the next get
+        path, alpha_tie_breaker, symbolic, rigid = key
+        stamp = self.get_stamp(path)
+        with open(path, "rb") as urdf_file:
+            contents = urdf_file.read()
+        digest = hashlib.sha256(contents).hexdigest()
+        if entry is not None and entry.digest == digest:
+            with self.lock:
+                entry.stamp = stamp
+                if self.entries.get(key) is entry:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.robot
+        robot = self.parse(contents, alpha_tie_breaker, symbolic, rigid, os.path.dirname(path))
+        new_entry = RegistryEntry(robot, stamp, digest)
+        with self.lock:
+            old_entry = self.entries.pop(key, None)
+            if old_entry is not None:
+                self.total_bytes -= old_entry.nbytes
+                self.invalidations += 1
+            self.entries[key] = new_entry
+            self.total_bytes += new_entry.nbytes
+            self.misses += 1
+            self.evict(keep = key)
+        self.update_sizes(keep = key)
+        return robot
+
+    def parse(self, contents, alpha_tie_breaker, symbolic, rigid, base_dir):
+        # parse with a parser of its own (URDFParser keeps per parse state) and build the lazily cached structures
+        # that reads would otherwise fill in concurrently before sharing
+        parser = URDFParser(self.cache_dir, self.cache_max_bytes)
+        robot = parser.parse_or_raise(contents, alpha_tie_breaker, symbolic, verbose = False, base_dir = base_dir, rigid = rigid)
+        robot.get_topology()
+        robot.read_only = True
+        return robot
+
+    ##################
+    #    Eviction    #
+    ##################
+
+    def evict(self, keep = None):
+        # drop least recently used entries until the registry fits in max_bytes (call holding the lock)
+        for key in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key != keep:
+                self.total_bytes -= self.entries.pop(key).nbytes
+                self.evictions += 1
+
+    def update_sizes(self, keep = None):
+        # remeasure the robots whose cache changed since they were last measured and evict if they no longer fit
+        # note: measured outside the lock (it walks every object of the robot) so gets are not blocked
+        with self.lock:
+            changed = [(key, entry) for key, entry in self.entries.items() if frozenset(entry.robot.cache) != entry.cache_keys]
+        sizes = [(key, entry) + measure_robot(entry.robot) for key, entry in changed]
+        with self.lock:
+            for key, entry, nbytes, cache_keys in sizes:
+                if self.entries.get(key) is entry:
+                    self.total_bytes += nbytes - entry.nbytes
+                    entry.nbytes = nbytes
+                    entry.cache_keys = cache_keys
+            self.evict(keep = keep)
+
+    def invalidate(self, path = None):
+        # drop every entry of path (or all entries if None) so the next get reparses
+        realpath = None if path is None else os.path.realpath(path)
+        with self.lock:
+            for key in list(self.entries):
+                if realpath is None or key[0] == realpath:
+                    self.total_bytes -= self.entries.pop(key).nbytes
+                    self.invalidations += 1
+
+    def clear(self):
+        self.invalidate()
+
+    ###############
+    #    Stats    #
+    ###############
+
+    def get_stats(self):
+        self.update_sizes()
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, \
+                    "invalidations": self.invalidations, "evictions": self.evictions, "errors": self.errors, \
+                    "entries": len(self.entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+# types never counted towards a robot's memory (shared with the rest of the process)
+SHARED_TYPES = (type, types.ModuleType, types.BuiltinFunctionType, np.ufunc)
+
+def get_shared_ids():
+    # ids of the module namespaces and the functions/classes (and their methods) defined in them, i.e., the code shared
+    # process wide (e.g., the numpy functions in the namespace of a lambdified function)
+    # note: functions made per robot (lambdified Xmat functions and closures over them) are in no module namespace so
+    #       they are counted with their code objects, namespaces, and captured values
+    shared = set()
+    for module in list(sys.modules.values()):
+        if not isinstance(module, types.ModuleType):
+            continue
+        namespace = vars(module)
+        shared.add(id(namespace))
+        for value in list(namespace.values()):
+            # note: only those defined in a module as, e.g., a module global bound to a robot's closure is not shared
+            if callable(value) and getattr(value, "__module__", None) == module.__name__:
+                shared.add(id(value))
+                if isinstance(value, type):
+                    shared.update(id(attribute) for attribute in list(vars(value).values()) if callable(attribute))
+    return shared
+
+def measure_robot(robot):
+    # (estimated memory, robot cache keys included in it) (the keys are read first so later fills are remeasured)
+    cache_keys = frozenset(robot.cache)
+    return get_robot_bytes(robot), cache_keys
+
+def get_robot_bytes(robot):
+    # estimated memory held by a robot (every object reachable from it that is not shared process wide)
+    seen = get_shared_ids()
+    seen.discard(id(robot))
+    total = 0
+    stack = [robot]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
@@ -1,8 +1,55 @@
+import ast
+import functools
+import numpy as np
 import sympy as sp
-import copy
+from fractions import Fraction
+
+def snap_to_rational(values, max_denominator):
+    # numeric equivalent of sp.nsimplify(values, tolerance = 1/max_denominator, rational = True).evalf()
+    # (removes numerical noise, e.g., URDF's often specify angles as 3.14 or 3.14159 but that isn't exactly PI)
+    # note: a float is a fraction with a power of two denominator so values that are multiples of the largest such
+    #       denominator allowed (e.g., 0, +-1, and 0.5) are returned as is by limit_denominator and only the rest
+    #       (typically the few sines/cosines of an origin, which repeat across joints) are snapped one at a time
+    values = np.asarray(values, dtype = float)
+    # note: fmod is exact (and NaN for infinite values, which are left to raise as before)
+    inexact = np.fmod(values, 2.0**(1 - int(max_denominator).bit_length())) != 0
+    # note: + 0.0 as float(Fraction(-0.0)) is 0.0
+    snapped = np.add(values, 0.0, out = np.empty_like(values))
+    if inexact.any():
+        snapped[inexact] = [snap_value(value, max_denominator) for value in values[inexact].tolist()]
+    return snapped
+
+@functools.lru_cache(maxsize = 65536)
+def snap_value(value, max_denominator):
+    return float(Fraction(value).limit_denominator(max_denominator))
+
+def snap_to_nsimplify(values, tolerance):
+    # float(sp.nsimplify(value, tolerance = tolerance, rational = True)) of every value
+    snap = lambda value: float(sp.nsimplify(float(value), tolerance = tolerance, rational = True))
+    return np.vectorize(snap, otypes = [float])(values)
+
+def snap_rigid_transform(E, p, snap):
+    # X = [E 0; -E skew(p) E] with the noise removed from E and p separately by snap (e.g., snap_to_rational)
+    # note: snapping X itself perturbs its lower left block independently of E so the result is no longer a rigid
+    #       transform (and its compact (E, r) form would not match it) so instead E is snapped and projected back
+    #       onto a rotation and X is rebuilt from E and p
+    E = orthonormalize(snap(np.asarray(E, dtype = float)))
+    p = snap(np.asarray(p, dtype = float))
+    return SpatialTransform(E, p).to_matrix()
+
+def orthonormalize(E):
+    # the nearest rotation to an almost orthonormal E (Newton iterations of its polar decomposition)
+    # note: exactly orthonormal matrices (e.g., with only 0 and +-1 entries) are returned unchanged
+    for _ in range(10):
+        error = np.matmul(E.T, E) - np.eye(3)
+        if np.max(np.abs(error)) < 1e-15:
+            break
+        E = E - 0.5*np.matmul(E, error)
+    return E
 
 class Translation:
-    def __init__(self, x, y = None, z = None):
+    def __init__(self, x, y = None, z = None, symbolic = True):
+        self.symbolic = symbolic
         if y == None: # passed in as tuple
             self.y = x[1]
             self.z = x[2]
@@ -13,19 +60,30 @@ class Translation:
             self.z = z
         self.rx = self.skew(self.x,self.y,self.z)
         self.Xmat_sp_fixed = self.xlt(self.rx)
-        self.tx_hom = sp.Matrix([[1,0,0,self.x],[0,1,0,self.y],[0,0,1,self.z],[0,0,0,1]])
-        self.tx_hom_inv = sp.Matrix([[1,0,0,-self.x],[0,1,0,-self.y],[0,0,1,-self.z],[0,0,0,1]])
+        if self.symbolic:
+            self.tx_hom = sp.Matrix([[1,0,0,self.x],[0,1,0,self.y],[0,0,1,self.z],[0,0,0,1]])
+            self.tx_hom_inv = sp.Matrix([[1,0,0,-self.x],[0,1,0,-self.y],[0,0,1,-self.z],[0,0,0,1]])
+        else:
+            self.tx_hom = np.array([[1,0,0,self.x],[0,1,0,self.y],[0,0,1,self.z],[0,0,0,1]], dtype = float)
+            self.tx_hom_inv = np.array([[1,0,0,-self.x],[0,1,0,-self.y],[0,0,1,-self.z],[0,0,0,1]], dtype = float)
 
     def skew(self, x, y, z):
-        return sp.Matrix([[0,-z,y],[z,0,-x],[-y,x,0]])
+        if self.symbolic:
+            return sp.Matrix([[0,-z,y],[z,0,-x],[-y,x,0]])
+        return np.array([[0,-z,y],[z,0,-x],[-y,x,0]], dtype = float)
 
     def xlt(self, rx):
-        col1 = sp.Matrix.vstack(sp.eye(3), -rx)
-        col2 = sp.Matrix.vstack(sp.zeros(3, 3), sp.eye(3))
-        return sp.Matrix.hstack(col1, col2)
+        if self.symbolic:
+            col1 = sp.Matrix.vstack(sp.eye(3), -rx)
+            col2 = sp.Matrix.vstack(sp.zeros(3, 3), sp.eye(3))
+            return sp.Matrix.hstack(col1, col2)
+        Xmat = np.eye(6)
+        Xmat[3:, :3] = -rx
+        return Xmat
 
 class Rotation:
-    def __init__(self, r, p = None, y = None):
+    def __init__(self, r, p = None, y = None, symbolic = True):
+        self.symbolic = symbolic
         if p == None: # passed in as tuple
             self.p = r[1]
             self.y = r[2]
@@ -38,54 +96,258 @@ class Rotation:
         roll_mat = self.rx(self.r)
         pitch_mat = self.ry(self.p)
         yaw_mat = self.rz(self.y)
-        self.E = roll_mat * pitch_mat * yaw_mat
+        self.E = roll_mat @ pitch_mat @ yaw_mat
         self.Xmat_sp_fixed = self.rot(self.E)
-        self.E_hom = sp.Matrix.vstack(copy.deepcopy(self.E),sp.Matrix([[0,0,0]]))
-        self.E_hom = sp.Matrix.hstack(self.E_hom,sp.Matrix([[0],[0],[0],[1]]))
+        if self.symbolic:
+            self.E_hom = sp.Matrix.vstack(self.E,sp.Matrix([[0,0,0]]))
+            self.E_hom = sp.Matrix.hstack(self.E_hom,sp.Matrix([[0],[0],[0],[1]]))
+        else:
+            self.E_hom = np.eye(4)
+            self.E_hom[:3,:3] = self.E
         self.E_hom_inv = self.E_hom.transpose()
 
+    def cos_sin(self, theta):
+        if self.symbolic:
+            return sp.cos(theta), sp.sin(theta)
+        return np.cos(theta), np.sin(theta)
+
     def rx(self, theta):
-        c = sp.cos(theta)
-        s = sp.sin(theta)
-        E = sp.Matrix([[1, 0, 0], [0, c, s], [0, -s, c]])
-        return E
+        c, s = self.cos_sin(theta)
+        return self.matrix([[1, 0, 0], [0, c, s], [0, -s, c]])
 
     def ry(self, theta):
-        c = sp.cos(theta)
-        s = sp.sin(theta)
-        E = sp.Matrix([[c, 0, -s], [0, 1, 0], [s, 0, c]])
-        return E
+        c, s = self.cos_sin(theta)
+        return self.matrix([[c, 0, -s], [0, 1, 0], [s, 0, c]])
 
     def rz(self, theta):
-        c = sp.cos(theta)
-        s = sp.sin(theta)
-        E = sp.Matrix([[c, s, 0], [-s, c, 0], [0, 0, 1]])
-        return E
+        c, s = self.cos_sin(theta)
+        return self.matrix([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+
+    def matrix(self, rows):
+        if self.symbolic:
+            return sp.Matrix(rows)
+        return np.array(rows, dtype = float)
 
     def rot(self, E):
-        z = sp.zeros(3, 3)
-        col1 = sp.Matrix.vstack(E, z)
-        col2 = sp.Matrix.vstack(z, E)
-        return sp.Matrix.hstack(col1, col2)
+        if self.symbolic:
+            z = sp.zeros(3, 3)
+            col1 = sp.Matrix.vstack(E, z)
+            col2 = sp.Matrix.vstack(z, E)
+            return sp.Matrix.hstack(col1, col2)
+        Xmat = np.zeros((6,6))
+        Xmat[:3, :3] = E
+        Xmat[3:, 3:] = E
+        return Xmat
 
 class Origin:
-    def __init__(self):
+    # note: when symbolic is False all matrices are numpy float64 arrays instead of sympy matrices
+    # attributes built on first access after restore (e.g., from a cache)
+    RESTORED_ATTRIBUTES = ("translation", "rotation", "Xmat_sp_fixed", "Xmat_sp_fixed_hom", "Xmat_sp_fixed_hom_inv")
+
+    def __init__(self, symbolic = True):
+        self.symbolic = symbolic
         self.translation = None
         self.rotation = None
         self.Xmat_sp_fixed = None
         self.Xmat_sp_fixed_hom = None
+        self.restored = None # (xyz, rpy, build_fixed) pending from restore
+
+    def restore(self, xyz, rpy, build_fixed = False):
+        # set the translation and rotation (and the fixed transform if build_fixed) when first accessed as building
+        # them (sympy matrices in particular) costs far more than restoring the rest of a robot
+        for attribute in self.RESTORED_ATTRIBUTES:
+            self.__dict__.pop(attribute, None)
+        self.restored = (xyz, rpy, build_fixed)
+
+    def __getattr__(self, attribute):
+        # only called for attributes not set (i.e., RESTORED_ATTRIBUTES after restore)
+        # note: read back from __dict__ as another thread may have published it since the normal lookup failed
+        if attribute in self.RESTORED_ATTRIBUTES:
+            self.build_restored()
+            if attribute in self.__dict__:
+                return self.__dict__[attribute]
+        raise AttributeError(attribute)
+
+    def build_restored(self):
+        # note: built into locals and published before restored is cleared so concurrent first reads (e.g., of a shared
+        #       registry robot) either build it as well or see every attribute, never a partially restored origin
+        restored = self.__dict__.get("restored")
+        if restored is None:
+            return
+        xyz, rpy, build_fixed = restored
+        translation = Translation(xyz[0],xyz[1],xyz[2],self.symbolic)
+        rotation = Rotation(rpy[0],rpy[1],rpy[2],self.symbolic)
+        fixed = get_fixed_transforms(rotation, translation) if build_fixed else (None, None, None)
+        self.translation = translation
+        self.rotation = rotation
+        self.Xmat_sp_fixed, self.Xmat_sp_fixed_hom = fixed[:2]
+        if build_fixed:
+            self.Xmat_sp_fixed_hom_inv = fixed[2]
+        self.restored = None
 
     def set_translation(self, x, y = None, z = None):
-        self.translation = Translation(x,y,z)
+        self.build_restored()
+        self.translation = Translation(x,y,z,self.symbolic)
 
     def set_rotation(self, r, p = None, y = None):
-        self.rotation = Rotation(r,p,y)
+        self.build_restored()
+        self.rotation = Rotation(r,p,y,self.symbolic)
 
     def build_fixed_transform(self):
         if self.translation is None or self.rotation is None:
             print("[!Error] First set the origin translation and rotation!")
         else:
-            self.Xmat_sp_fixed =  self.rotation.Xmat_sp_fixed * self.translation.Xmat_sp_fixed
-            self.Xmat_sp_fixed_hom = self.rotation.E_hom * self.translation.tx_hom
-            self.Xmat_sp_fixed_hom_inv = self.rotation.E_hom_inv * self.translation.tx_hom_inv
+            self.Xmat_sp_fixed, self.Xmat_sp_fixed_hom, self.Xmat_sp_fixed_hom_inv = \
+                get_fixed_transforms(self.rotation, self.translation)
+
+def get_fixed_transforms(rotation, translation):
+    # (Xmat_sp_fixed, Xmat_sp_fixed_hom, Xmat_sp_fixed_hom_inv) of an origin
+    return rotation.Xmat_sp_fixed @ translation.Xmat_sp_fixed, rotation.E_hom @ translation.tx_hom, \
+           rotation.E_hom_inv @ translation.tx_hom_inv
+
+class SpatialTransform:
+    # batched numeric spatial transform X = [E 0; -E skew(r) E] (parent to child) stored as its rotation E (..., 3, 3)
+    # and the child origin in parent coordinates r (..., 3), i.e., 12 numbers instead of the 36 of the 6x6 matrix
+    # note: spatial vectors are (..., 6) arrays [angular; linear] and every operation broadcasts over the leading axes
+    #       so, e.g., X[:,None].apply_motion(M) applies a (B,) batch of transforms to the (B, k, 6) rows of M
+    def __init__(self, E, r):
+        self.E = E
+        self.r = r
+
+    @classmethod
+    def identity(cls, shape = ()):
+        return cls(np.broadcast_to(np.eye(3), shape + (3,3)).copy(), np.zeros(shape + (3,)))
+
+    @classmethod
+    def from_matrix(cls, Xmat):
+        # skew(r) = -E^T X[3:,:3] (as in Kinematics.Xmat_to_pose)
+        Xmat = np.asarray(Xmat, dtype=float)
+        E = Xmat[..., :3, :3]
+        skew_r = -np.matmul(np.swapaxes(E, -1, -2), Xmat[..., 3:, :3])
+        return cls(E.copy(), np.stack((skew_r[..., 2, 1], skew_r[..., 0, 2], skew_r[..., 1, 0]), axis=-1))
+
+    @property
+    def shape(self):
+        return self.r.shape[:-1]
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        return SpatialTransform(self.E[index], self.r[index])
+
+    def to_matrix(self):
+        Xmat = np.zeros(self.shape + (6,6))
+        Xmat[..., :3, :3] = self.E
+        Xmat[..., 3:, 3:] = self.E
+        # -E skew(r) has rows r x E[i,:]
+        E0, E1, E2 = self.E[..., 0], self.E[..., 1], self.E[..., 2]
+        r0, r1, r2 = self.r[..., 0, None], self.r[..., 1, None], self.r[..., 2, None]
+        Xmat[..., 3:, 0] = r1*E2 - r2*E1
+        Xmat[..., 3:, 1] = r2*E0 - r0*E2
+        Xmat[..., 3:, 2] = r0*E1 - r1*E0
+        return Xmat
+
+    def to_pose(self):
+        # homogeneous pose of the child in the parent [E^T r; 0 1]
+        pose = np.zeros(self.shape + (4,4))
+        pose[..., :3, :3] = np.swapaxes(self.E, -1, -2)
+        pose[..., :3, 3] = self.r
+        pose[..., 3, 3] = 1
+        return pose
+
+    def rotate(self, vectors):
+        # E v for (..., 3) vectors
+        return np.einsum('...ij,...j->...i', self.E, vectors)
+
+    def rotate_transpose(self, vectors):
+        # E^T v for (..., 3) vectors
+        return np.einsum('...ji,...j->...i', self.E, vectors)
+
+    def apply_motion(self, m):
+        # X m = [E w; E (v - r x w)]
+        w = m[..., :3]
+        return np.concatenate((self.rotate(w), self.rotate(m[..., 3:] - cross(self.r, w))), axis=-1)
+
+    def apply_force(self, f):
+        # X* f = X^-T f = [E (n - r x l); E l]
+        l = f[..., 3:]
+        return np.concatenate((self.rotate(f[..., :3] - cross(self.r, l)), self.rotate(l)), axis=-1)
+
+    def inverse_apply_motion(self, m):
+        # X^-1 m = [E^T w; E^T v + r x E^T w]
+        w = self.rotate_transpose(m[..., :3])
+        return np.concatenate((w, self.rotate_transpose(m[..., 3:]) + cross(self.r, w)), axis=-1)
+
+    def transpose_apply(self, f):
+        # X^T f = [E^T n + r x E^T l; E^T l] (a force from the child to the parent)
+        l = self.rotate_transpose(f[..., 3:])
+        return np.concatenate((self.rotate_transpose(f[..., :3]) + cross(self.r, l), l), axis=-1)
+
+    def compose(self, other):
+        # self * other (other applied first) = (E1 E2, r2 + E2^T r1)
+        return SpatialTransform(np.matmul(self.E, other.E), other.r + other.rotate_transpose(self.r))
+
+    def inverse(self):
+        return SpatialTransform(np.swapaxes(self.E, -1, -2), -self.rotate(self.r))
+
+    def transform_inertia(self, I):
+        # congruence X^T I X of (..., 6, 6) symmetric spatial inertias (a child inertia in parent coordinates)
+        # with J = rot(E)^T I rot(E): [J11 + r x J21 - Y12 skew(r), Y12; Y12^T, J22] where Y12 = J12 + r x J22
+        # note: Y12 skew(r) = -(r x Y12^T)^T
+        ET = np.swapaxes(self.E, -1, -2)
+        J11 = np.matmul(ET, np.matmul(I[..., :3, :3], self.E))
+        J12 = np.matmul(ET, np.matmul(I[..., :3, 3:], self.E))
+        J22 = np.matmul(ET, np.matmul(I[..., 3:, 3:], self.E))
+        Y = np.empty(np.broadcast_shapes(self.shape + (6,6), I.shape))
+        Y[..., :3, 3:] = J12 + cross_columns(self.r, J22)
+        Y[..., :3, :3] = J11 + cross_columns(self.r, np.swapaxes(J12, -1, -2)) + \
+                         np.swapaxes(cross_columns(self.r, np.swapaxes(Y[..., :3, 3:], -1, -2)), -1, -2)
+        Y[..., 3:, :3] = np.swapaxes(Y[..., :3, 3:], -1, -2)
+        Y[..., 3:, 3:] = J22
+        return Y
+
+def skew(w):
+    # (..., 3) vectors -> (..., 3, 3) cross product matrices
+    skew_w = np.zeros(w.shape[:-1] + (3,3))
+    skew_w[..., 0, 1] = -w[..., 2]
+    skew_w[..., 0, 2] = w[..., 1]
+    skew_w[..., 1, 0] = w[..., 2]
+    skew_w[..., 1, 2] = -w[..., 0]
+    skew_w[..., 2, 0] = -w[..., 1]
+    skew_w[..., 2, 1] = w[..., 0]
+    return skew_w
+
+def cross(a, b):
+    # a x b for (..., 3) vectors (lower overhead than np.cross for small vectors)
+    a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+    b0, b1, b2 = b[..., 0], b[..., 1], b[..., 2]
+    return np.stack((a1*b2 - a2*b1, a2*b0 - a0*b2, a0*b1 - a1*b0), axis=-1)
+
+def cross_columns(r, M):
+    # skew(r) M for (..., 3) vectors and (..., 3, k) matrices (the cross product of r with each column)
+    return np.swapaxes(cross(r[..., None, :], np.swapaxes(M, -1, -2)), -1, -2)
+
+# the sympy constructors and constants sp.srepr emits for the (matrices of) expressions of a robot
+SREPR_FUNCTIONS = {name: getattr(sp, name) for name in ("ImmutableDenseMatrix", "MutableDenseMatrix", "Integer", "Rational", \
+                                                        "Float", "Symbol", "Add", "Mul", "Pow", "cos", "sin")}
+SREPR_CONSTANTS = {"pi": sp.pi, "E": sp.E, "oo": sp.oo, "zoo": sp.zoo, "nan": sp.nan}
 
+def parse_srepr(string):
+    # inverse of sp.srepr without sp.sympify (which evaluates the string as arbitrary python), e.g., for cache files
+    # note: walks the python syntax tree only calling SREPR_FUNCTIONS on literals so anything else raises a ValueError
+    def build(node):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in SREPR_FUNCTIONS and \
+           all([keyword.arg is not None for keyword in node.keywords]):
+            return SREPR_FUNCTIONS[node.func.id](*[build(arg) for arg in node.args], \
+                                                 **{keyword.arg: build(keyword.value) for keyword in node.keywords})
+        if isinstance(node, ast.Name) and node.id in SREPR_CONSTANTS:
+            return SREPR_CONSTANTS[node.id]
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [build(element) for element in node.elts]
+        if isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float)):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant) and \
+           isinstance(node.operand.value, (int, float)):
+            return -node.operand.value
+        raise ValueError("[!Error] Unsupported expression in srepr: " + ast.dump(node))
+    return build(ast.parse(string, mode = "eval").body)
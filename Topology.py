@@ -0,0 +1,77 @@
+import numpy as np
+
+class Topology:
+    # precomputed tree structure of a robot with joints in dfs (id) order (link lid is the child link of joint lid)
+    # note: in dfs order the subtree of a joint is the contiguous id range [jid, subtree_end[jid]) and every
+    #       ancestor has a smaller id so ancestor/subtree queries are O(1) comparisons (the base link is -1)
+    def __init__(self, parent_ids, level_ids):
+        self.n = len(parent_ids)
+        self.parent = [int(parent_id) for parent_id in parent_ids]
+        self.depth = np.zeros(self.n, dtype=np.int64)
+        for jid, parent_id in enumerate(self.parent):
+            if parent_id != -1:
+                self.depth[jid] = self.depth[parent_id] + 1
+        self.subtree_size = np.ones(self.n, dtype=np.int64)
+        for jid in range(self.n - 1, -1, -1):
+            if self.parent[jid] != -1:
+                self.subtree_size[self.parent[jid]] += self.subtree_size[jid]
+        self.subtree_end = np.arange(self.n) + self.subtree_size
+        self.subtree_end_list = self.subtree_end.tolist()
+        self.levels = [np.array(ids, dtype=np.int64) for ids in level_ids]
+        self.ancestor_matrix = None
+
+    def get_parent(self, jid):
+        return self.parent[jid]
+
+    def get_depth(self, jid):
+        return int(self.depth[jid])
+
+    def get_ancestors(self, jid):
+        # nearest first (O(depth))
+        ancestors = []
+        curr_id = self.parent[jid]
+        while curr_id != -1:
+            ancestors.append(curr_id)
+            curr_id = self.parent[curr_id]
+        return ancestors
+
+    def get_subtree_range(self, lid):
+        # [start, end) ids of the subtree of a link (including itself)
+        if lid == -1:
+            return -1, self.n
+        return lid, self.subtree_end_list[lid]
+
+    def get_subtree(self, lid):
+        return list(range(*self.get_subtree_range(lid)))
+
+    def is_ancestor_of(self, jid, jid_of):
+        return jid != -1 and jid < jid_of < self.subtree_end_list[jid]
+
+    def is_in_subtree_of(self, lid, lid_of):
+        start, end = self.get_subtree_range(lid_of)
+        return start <= lid < end
+
+    def get_ancestor_matrix(self):
+        # dense (n, n) boolean matrix with [i, j] = joint i is an ancestor of joint j (computed once on request)
+        if self.ancestor_matrix is None:
+            ids = np.arange(self.n)
+            self.ancestor_matrix = (ids[None,:] > ids[:,None]) & (ids[None,:] < self.subtree_end[:,None])
+            self.ancestor_matrix.flags.writeable = False
+        return self.ancestor_matrix
+
+    def get_total_ancestor_count(self):
+        return int(np.sum(self.depth))
+
+    def get_total_subtree_count(self):
+        return int(np.sum(self.subtree_size))
+
+    def get_ids_by_level(self, level):
+        if level < 0 or level >= len(self.levels):
+            return np.zeros(0, dtype=np.int64)
+        return self.levels[level]
+
+    def get_max_level(self):
+        return len(self.levels) - 1
+
+    def get_max_width(self):
+        return max([len(ids) for ids in self.levels])
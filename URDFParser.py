@@ -1,100 +1,328 @@
-from bs4 import BeautifulSoup
+from lxml import etree
+import io
+import os
+import pickle
+import time
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import sympy as sp
-import copy
+from collections import deque
 from .Robot import Robot
 from .Link import Link
 from .Joint import Joint
+from .RobotCache import RobotCache
+from .FixedJointMerges import FixedJointMerges
+from .ParseStats import ParseStats, timed_stage, count
+from .Geometry import Geometry
+from .Kinematics import Xmat_to_pose
+
+logger = logging.getLogger(__name__)
+
+class WorkerTraceback(Exception):
+    # the formatted traceback of an error raised in a parse_many worker (set as the error's __cause__ as tracebacks
+    # are lost when errors are sent back from worker processes)
+    def __init__(self, text):
+        super().__init__(text)
+        self.text = text
+
+    def __str__(self):
+        return self.text
 
 class URDFParser:
-    def __init__(self):
-        pass
+    # the (descendant) elements whose attributes are kept for each top level link and joint
+    RAW_TAGS = {"link": ("origin", "inertial", "mass", "inertia"), \
+                "joint": ("parent", "child", "origin", "axis", "dynamics")}
+    # the link children kept as geometry and the shape elements read from them
+    GEOMETRY_TAGS = ("visual", "collision")
+    SHAPE_TAGS = ("box", "cylinder", "sphere", "mesh")
+
+    def __init__(self, cache_dir = None, cache_max_bytes = 256*1024*1024):
+        self.symbolic = True
+        self.rigid = False
+        self.base_dir = None
+        # optional on disk cache of parsed robots (keyed by file contents, options, and library version)
+        self.cache = None if cache_dir is None else RobotCache(cache_dir, cache_max_bytes)
+        # timing and counters of the last parse (see ParseStats)
+        self.stats = None
     
-    def parse(self, filename, alpha_tie_breaker = False):
+    def parse(self, source, alpha_tie_breaker = False, symbolic = True, verbose = True, base_dir = None, rigid = False):
+        # symbolic = False skips sympy and computes all transforms and inertias directly in numpy
+        # verbose = False skips printing the joint ordering
+        # base_dir is the directory relative mesh filenames are resolved against (the URDF's directory by default)
+        # rigid = True snaps each joint origin's rotation and translation (instead of each Xmat entry) so every
+        # Xmat is exactly rigid and matches its compact (E, r) form (see Joint.set_type)
+        # note: returns None if the URDF could not be parsed (the error is logged and kept in parser.stats.error)
         try:
-            # parse the file
-            urdf_file = open(filename, "r")
-            self.soup = BeautifulSoup(urdf_file.read(),"xml").find("robot")
-            # set up the robot object
-            self.robot = Robot(self.soup["name"])
-            # collect links
-            self.parse_links()
-            # collect joints
-            self.parse_joints()
-            # remove all fixed joints, renumber links and joints, and build parent and subtree lists
-            self.renumber_linksJoints(alpha_tie_breaker)
-            # report joint ordering to user
-            self.print_joint_order()
-            # return the robot object
-            return copy.deepcopy(self.robot)
-        except:
+            return self.parse_or_raise(source, alpha_tie_breaker, symbolic, verbose, base_dir, rigid)
+        except Exception as error:
+            logger.error("Could not parse %s (%s: %s)", source if isinstance(source, str) else "URDF", \
+                         type(error).__name__, error)
             return None
 
+    def parse_or_raise(self, source, alpha_tie_breaker = False, symbolic = True, verbose = True, base_dir = None, rigid = False):
+        # parse but raise any error instead of returning None
+        self.symbolic = symbolic
+        self.rigid = rigid
+        if base_dir is None and isinstance(source, str):
+            base_dir = os.path.dirname(os.path.abspath(source))
+        self.base_dir = base_dir
+        self.robot = None
+        self.stats = ParseStats()
+        with self.stats:
+            # check the cache first if applicable
+            if self.cache is not None:
+                source = self.read_source(source)
+                cache_key = self.cache.make_key(source, alpha_tie_breaker, symbolic, rigid)
+                self.load_cached(cache_key)
+            if self.robot is None:
+                # parse the file and set up the robot object
+                self.load(source)
+                # collect links
+                self.parse_links()
+                # collect joints
+                self.parse_joints()
+                # remove all fixed joints, renumber links and joints, and build parent and subtree lists
+                self.renumber_linksJoints(alpha_tie_breaker)
+                # save to the cache if applicable
+                if self.cache is not None:
+                    self.store_cached(cache_key)
+            self.robot.parse_stats = self.stats
+            self.robot.base_dir = self.base_dir
+        # report joint ordering to user
+        if verbose:
+            self.print_joint_order()
+        # return the robot object (use robot.clone() for independent variants)
+        return self.robot
+
+    @timed_stage
+    def load_cached(self, cache_key):
+        self.robot = self.cache.load(cache_key)
+        self.stats.cache_hit = self.robot is not None
+        # the entry is keyed by contents so may have been stored from another directory
+        if self.robot is not None:
+            for link in self.robot.links:
+                for geometry in link.get_visuals() + link.get_collisions():
+                    geometry.base_dir = self.base_dir
+
+    @timed_stage
+    def store_cached(self, cache_key):
+        self.cache.store(cache_key, self.robot, self.symbolic, self.rigid)
+
+    def parse_many(self, sources, workers = None, alpha_tie_breaker = False, symbolic = True, verbose = True, rigid = False):
+        # parse many URDFs across a pool of worker processes (workers = None uses every cpu, 1 parses in this process)
+        # returns a list in input order of the robots (or the error raised for each source that failed with its
+        # worker traceback as its __cause__, see WorkerTraceback)
+        # note: workers send back the compact numpy array form of each robot (see RobotCache.robot_to_arrays) so
+        #       no sympy objects are pickled and symbolic transforms are rebuilt lazily as with a cache hit
+        workers = os.cpu_count() if workers is None else workers
+        cache_dir = None if self.cache is None else self.cache.cache_dir
+        cache_max_bytes = None if self.cache is None else self.cache.max_bytes
+        tasks = [(index, source, alpha_tie_breaker, symbolic, rigid, cache_dir, cache_max_bytes) for index, source in enumerate(sources)]
+        results = [None] * len(tasks)
+        self.parse_times = [None] * len(tasks)
+        if workers <= 1 or len(tasks) <= 1:
+            self.collect_parse_many(map(lambda task: parse_many_worker(*task), tasks), sources, results, verbose)
+        else:
+            with ProcessPoolExecutor(max_workers = min(workers, len(tasks))) as executor:
+                futures = [executor.submit(parse_many_worker, *task) for task in tasks]
+                self.collect_parse_many(map(lambda future: future.result(), as_completed(futures)), sources, results, verbose)
+        return results
+
+    def collect_parse_many(self, outputs, sources, results, verbose):
+        # place each worker output at its input index as it completes and report progress
+        for done, (index, header, arrays, error, seconds) in enumerate(outputs):
+            label = sources[index] if isinstance(sources[index], str) else "source " + str(index)
+            if error is None:
+                results[index] = RobotCache.robot_from_arrays(header, arrays)
+                status = str(results[index].get_num_joints()) + " joints"
+            else:
+                error, text = error
+                error = rebuild_error(error)
+                error.__cause__ = WorkerTraceback(text)
+                results[index] = error
+                status = "[!Error] " + type(error).__name__ + ": " + str(error)
+            self.parse_times[index] = seconds
+            if verbose:
+                print("[" + str(done + 1) + "/" + str(len(results)) + "] " + label + ": " + status + " in " + "%.3fs" % seconds)
+
+    def read_source(self, source):
+        # read a filename, file-like object, or bytes into bytes
+        if isinstance(source, (bytes, bytearray)):
+            return bytes(source)
+        if hasattr(source, "read"):
+            contents = source.read()
+            return contents.encode() if isinstance(contents, str) else contents
+        with open(source, "rb") as urdf_file:
+            return urdf_file.read()
+
+    @timed_stage
+    def load(self, source):
+        # stream the URDF (a filename, file-like object in binary or text mode, or bytes) keeping only the attributes
+        # of the elements the parser needs from each top level link and joint and freeing elements as we go
+        # note: as before, origin/axis/etc. are the first such element anywhere inside the link/joint
+        # note: every source is read into bytes first (see read_source) as iterparse only accepts binary input
+        source = io.BytesIO(self.read_source(source))
+        self.robot = None
+        self.raw_links = []
+        self.raw_joints = []
+        depth = 0
+        robot_depth = None
+        curr_raw = None
+        curr_geometry = None
+        inertial_depth = None
+        for event, element in etree.iterparse(source, events = ("start", "end")):
+            # the local name of "{namespace}tag" (or "tag") (cheaper than etree.QName for every element)
+            tag = element.tag.rpartition("}")[2]
+            if event == "start":
+                depth += 1
+                if self.robot is None and tag == "robot":
+                    robot_depth = depth
+                    self.robot = Robot(element.attrib["name"])
+                elif curr_raw is None:
+                    if robot_depth is not None and depth == robot_depth + 1 and tag in self.RAW_TAGS:
+                        curr_raw = {"element": dict(element.attrib), "tag": tag, "depth": depth}
+                else:
+                    if tag in self.RAW_TAGS[curr_raw["tag"]]:
+                        if tag in ("mass", "inertia"):
+                            # only read from inside the first inertial block
+                            if inertial_depth is not None and tag not in curr_raw:
+                                curr_raw[tag] = dict(element.attrib)
+                        elif tag not in curr_raw:
+                            curr_raw[tag] = dict(element.attrib)
+                            if tag == "inertial":
+                                inertial_depth = depth
+                    # visual/collision blocks of links (their own origin and the first shape element)
+                    if curr_raw["tag"] == "link" and tag in self.GEOMETRY_TAGS and depth == curr_raw["depth"] + 1:
+                        curr_geometry = {"tag": tag, "name": element.attrib.get("name"), "depth": depth}
+                        curr_raw.setdefault("geometries", []).append(curr_geometry)
+                    elif curr_geometry is not None:
+                        if tag == "origin" and depth == curr_geometry["depth"] + 1:
+                            curr_geometry["origin"] = dict(element.attrib)
+                        elif tag in self.SHAPE_TAGS and "shape" not in curr_geometry:
+                            curr_geometry["shape"] = tag
+                            curr_geometry["attrib"] = dict(element.attrib)
+            else:
+                if curr_geometry is not None and depth == curr_geometry["depth"]:
+                    curr_geometry = None
+                elif curr_raw is not None and depth == curr_raw["depth"]:
+                    (self.raw_links if curr_raw["tag"] == "link" else self.raw_joints).append(curr_raw)
+                    curr_raw = None
+                elif depth == inertial_depth:
+                    inertial_depth = None
+                elif depth == robot_depth:
+                    robot_depth = None
+                depth -= 1
+                # free the element and any already processed siblings
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
     def to_float(self, string_arr):
         try:
             return [float(value) for value in string_arr]
         except:
             return string_arr
 
+    @timed_stage
     def parse_links(self):
         lid = 0
-        for raw_link in self.soup.find_all('link', recursive=False):
+        for raw_link in self.raw_links:
             # construct link object
-            curr_link = Link(raw_link["name"],lid)
+            curr_link = Link(raw_link["element"]["name"],lid,self.symbolic)
             lid = lid + 1
             # parse origin
-            raw_origin = raw_link.find("origin")
+            raw_origin = raw_link.get("origin")
             if raw_origin == None:
-                print("Link [" + curr_link.name + "] does not have an origin. Assuming this is the fixed world base frame. Else there is an error with your URDF file.")
+                logger.warning("Link [%s] does not have an origin. Assuming this is the fixed world base frame. Else there is an error with your URDF file.", curr_link.name)
                 curr_link.set_origin_xyz([0, 0, 0])
                 curr_link.set_origin_rpy([0, 0, 0])
             else:
                 curr_link.set_origin_xyz(self.to_float(raw_origin["xyz"].split(" ")))
                 curr_link.set_origin_rpy(self.to_float(raw_origin["rpy"].split(" ")))
             # parse inertial properties
-            raw_inertial = raw_link.find("inertial")
+            raw_inertial = raw_link.get("inertial")
             if raw_inertial == None:
-                print("Link [" + curr_link.name + "] does not have inertial properties. Assuming this is the fixed world base frame. Else there is an error with your URDF file.")
+                logger.warning("Link [%s] does not have inertial properties. Assuming this is the fixed world base frame. Else there is an error with your URDF file.", curr_link.name)
                 curr_link.set_inertia(0, 0, 0, 0, 0, 0, 0)
             else:
                 # get mass and inertia values
-                raw_inertia = raw_inertial.find("inertia")
-                curr_link.set_inertia(float(raw_inertial.find("mass")["value"]), \
+                raw_inertia = raw_link.get("inertia")
+                curr_link.set_inertia(float(raw_link.get("mass")["value"]), \
                                       float(raw_inertia["ixx"]), \
                                       float(raw_inertia["ixy"]), \
                                       float(raw_inertia["ixz"]), \
                                       float(raw_inertia["iyy"]), \
                                       float(raw_inertia["iyz"]), \
                                       float(raw_inertia["izz"]))
+            # parse visual and collision geometry (mesh files are only read on request)
+            for raw_geometry in raw_link.get("geometries", []):
+                geometry = self.parse_geometry(raw_geometry, curr_link.name)
+                if geometry is not None:
+                    curr_link.add_geometry(geometry)
             # store
-            self.robot.add_link(copy.deepcopy(curr_link))
+            self.robot.add_link(curr_link)
+
+    def parse_geometry(self, raw_geometry, link_name):
+        shape = raw_geometry.get("shape")
+        if shape is None:
+            logger.warning("A %s of link [%s] has no supported shape (box, cylinder, sphere, or mesh). Skipping it.", \
+                           raw_geometry["tag"], link_name)
+            return None
+        attrib = raw_geometry["attrib"]
+        geometry = Geometry(raw_geometry["tag"], shape, raw_geometry["name"], link_name)
+        if shape == "box":
+            geometry.size = [float(value) for value in attrib["size"].split()]
+        elif shape == "cylinder":
+            geometry.radius = float(attrib["radius"])
+            geometry.length = float(attrib["length"])
+        elif shape == "sphere":
+            geometry.radius = float(attrib["radius"])
+        else:
+            geometry.filename = attrib["filename"]
+            geometry.base_dir = self.base_dir
+            if "scale" in attrib:
+                geometry.scale = np.array([float(value) for value in attrib["scale"].split()], dtype = float)
+        raw_origin = raw_geometry.get("origin", {})
+        geometry.set_origin([float(value) for value in raw_origin.get("xyz", "0 0 0").split()], \
+                            [float(value) for value in raw_origin.get("rpy", "0 0 0").split()])
+        return geometry
 
+    @timed_stage
     def parse_joints(self):
         jid = 0
-        for raw_joint in self.soup.find_all('joint', recursive=False):
+        for raw_joint in self.raw_joints:
             # construct joint object
-            curr_joint = Joint(raw_joint["name"], jid, \
-                               raw_joint.find("parent")["link"], \
-                               raw_joint.find("child")["link"])
+            curr_joint = Joint(raw_joint["element"]["name"], jid, \
+                               raw_joint.get("parent")["link"], \
+                               raw_joint.get("child")["link"], \
+                               self.symbolic, self.rigid)
             jid += 1
             # get origin position and rotation
-            curr_joint.set_origin_xyz(self.to_float(raw_joint.find("origin")["xyz"].split(" ")))
-            curr_joint.set_origin_rpy(self.to_float(raw_joint.find("origin")["rpy"].split(" ")))
+            curr_joint.set_origin_xyz(self.to_float(raw_joint.get("origin")["xyz"].split(" ")))
+            curr_joint.set_origin_rpy(self.to_float(raw_joint.get("origin")["rpy"].split(" ")))
             # set joint type and axis of motion for joints if applicable
-            raw_axis = raw_joint.find("axis")
+            raw_axis = raw_joint.get("axis")
             if raw_axis is None:
-                curr_joint.set_type(raw_joint["type"])
+                curr_joint.set_type(raw_joint["element"]["type"])
             else:
-                curr_joint.set_type(raw_joint["type"],self.to_float(raw_axis["xyz"].split(" ")))
-            raw_dynamics = raw_joint.find("dynamics")
+                curr_joint.set_type(raw_joint["element"]["type"],self.to_float(raw_axis["xyz"].split(" ")))
+            raw_dynamics = raw_joint.get("dynamics")
             if raw_dynamics is None:
                 curr_joint.set_damping(0)
             else:
                 curr_joint.set_damping(float(raw_dynamics["damping"]))
             # store
-            self.robot.add_joint(copy.deepcopy(curr_joint))
+            self.robot.add_joint(curr_joint)
 
+    @timed_stage
     def remove_fixed_joints(self):
+        # note: the bypassed joints and links are removed together at the end (one pass over the robot's lists)
+        # and every step is recorded so link/joint parameters can later be updated by URDF name (see FixedJointMerges)
+        merges = FixedJointMerges()
+        removed_joints = []
+        removed_links = []
         for curr_joint in self.robot.get_joints_ordered_by_id():
             if curr_joint.jtype == "fixed":
                 # updated fixed transforms and parents of grandchild_joints
@@ -102,73 +330,103 @@ class URDFParser:
                 # X_grandchild = X_granchild * X_child
                 for gcjoint in self.robot.get_joints_by_parent_name(curr_joint.child):
                     gcjoint.set_parent(curr_joint.get_parent())
-                    gcjoint.set_transformation_matrix(gcjoint.get_transformation_matrix() * curr_joint.get_transformation_matrix())
+                    if self.symbolic:
+                        gc_Xmat, curr_Xmat = gcjoint.get_transformation_matrix(), curr_joint.get_transformation_matrix()
+                        gcjoint.set_transformation_matrix(gc_Xmat * curr_Xmat)
+                    else:
+                        gc_Xmat, curr_Xmat = gcjoint.get_fixed_transformation_matrix(), curr_joint.get_fixed_transformation_matrix()
+                        gcjoint.set_fixed_transformation_matrix(np.matmul(gc_Xmat,curr_Xmat))
+                    merges.record_transform(gcjoint, curr_joint, gc_Xmat, curr_Xmat)
                 # combine inertia tensors of child and parent at parent
                 # note:  if X is the transform from A to B the I_B = X^T I_A X
                 # note2: inertias in the same from add so I_parent_final = I_parent + X^T I_child X
                 child_link = self.robot.get_link_by_name(curr_joint.child)
                 parent_link = self.robot.get_link_by_name(curr_joint.parent)
                 child_I = child_link.get_spatial_inertia()
-                curr_Xmat = np.reshape(np.array(curr_joint.get_transformation_matrix()).astype(float),(6,6))
+                if self.symbolic:
+                    curr_Xmat = np.reshape(np.array(curr_joint.get_transformation_matrix()).astype(float),(6,6))
+                else:
+                    curr_Xmat = curr_joint.get_fixed_transformation_matrix()
                 transformed_Imat = np.matmul(np.matmul(np.transpose(curr_Xmat),child_I),curr_Xmat)
+                merges.record_inertia(parent_link, child_link, curr_joint, parent_link.get_spatial_inertia(), curr_Xmat, child_I)
                 parent_link.set_spatial_inertia(parent_link.get_spatial_inertia() + transformed_Imat)
+                # move the child's geometry into the parent frame (the child frame is at pose in the parent)
+                if child_link.get_visuals() or child_link.get_collisions():
+                    pose = Xmat_to_pose(curr_Xmat)
+                    for geometry in child_link.get_visuals() + child_link.get_collisions():
+                        parent_link.add_geometry(geometry.transformed(pose))
                 
                 # delete the bypassed fixed joint and link
-                self.robot.remove_joint(curr_joint)
-                self.robot.remove_link(child_link)
+                removed_joints.append(curr_joint)
+                removed_links.append(child_link)
+                merges.record_removed(child_link, curr_joint)
+        self.robot.remove_joints(removed_joints)
+        self.robot.remove_links(removed_links)
+        self.robot.fixed_joint_merges = merges
+        count("fixed_joints_removed", len(removed_joints))
 
+    @timed_stage
     def build_subtree_lists(self):
-        subtree_lid_lists = {}
+        # in dfs order the subtree of a link is the contiguous range of ids [lid, lid + size)
+        subtree_sizes = {}
         # initialize all subtrees to include itself
         for lid in self.robot.get_links_dict_by_id().keys():
-            subtree_lid_lists[lid] = [lid]
+            subtree_sizes[lid] = 1
         # start at the leaves and build up!
         for curr_joint in self.robot.get_joints_ordered_by_id(reverse=True):
             parent_lid = self.robot.get_link_by_name(curr_joint.parent).get_id()
             child_lid = self.robot.get_link_by_name(curr_joint.child).get_id()
-            # add the child's subtree list to the parent (includes the child)
-            if child_lid in subtree_lid_lists.keys():
-                subtree_lid_lists[parent_lid] = list(set(subtree_lid_lists[parent_lid]).union(set(subtree_lid_lists[child_lid])))
+            # add the child's subtree size to the parent (includes the child)
+            subtree_sizes[parent_lid] += subtree_sizes.get(child_lid, 0)
         # save to the links
         for link in self.robot.links:
-            curr_subtree = subtree_lid_lists[link.get_id()]
-            link.set_subtree(copy.deepcopy(curr_subtree))
+            link.set_subtree(range(link.get_id(), link.get_id() + subtree_sizes[link.get_id()]))
 
+    @timed_stage
     def dfs_order_update(self, parent_name, alpha_tie_breaker = False, next_lid = 0, next_jid = 0):
-        while True:
-            child_joints = self.robot.get_joints_by_parent_name(parent_name)
-            parent_id = self.robot.get_link_by_name(parent_name).lid
-            if alpha_tie_breaker:
-                child_joints.sort(key=lambda joint: joint.name)
-            for curr_joint in child_joints:
-                # save the new id
-                curr_joint.set_id(next_jid)
-                # save the next_lid to the child
-                child = self.robot.get_link_by_name(curr_joint.child)
-                child.set_id(next_lid)
-                child.set_parent_id(parent_id)
-                # recurse
-                next_lid, next_jid = self.dfs_order_update(child.name, alpha_tie_breaker, next_lid + 1, next_jid + 1)
-            # return to parent
-            return next_lid, next_jid
+        # iterative depth first traversal (a stack of each open parent's remaining child joints)
+        stack = [(self.get_child_joints(parent_name, alpha_tie_breaker), self.robot.get_link_by_name(parent_name).lid)]
+        while len(stack) != 0:
+            child_joints, parent_id = stack[-1]
+            curr_joint = next(child_joints, None)
+            if curr_joint is None:
+                # return to parent
+                stack.pop()
+                continue
+            # save the new id
+            curr_joint.set_id(next_jid)
+            # save the next_lid to the child
+            child = self.robot.get_link_by_name(curr_joint.child)
+            child.set_id(next_lid)
+            child.set_parent_id(parent_id)
+            next_lid += 1
+            next_jid += 1
+            # then descend into the child
+            stack.append((self.get_child_joints(child.name, alpha_tie_breaker), child.lid))
+        return next_lid, next_jid
 
+    def get_child_joints(self, parent_name, alpha_tie_breaker = False):
+        child_joints = self.robot.get_joints_by_parent_name(parent_name)
+        if alpha_tie_breaker:
+            child_joints.sort(key=lambda joint: joint.name)
+        return iter(child_joints)
+
+    @timed_stage
     def bfs_order(self, root_name):
         # initialize
         next_lid = 0
         next_jid = 0
-        next_parent_names = [(root_name,-1)]
+        next_parent_names = deque([(root_name,-1)])
         self.robot.get_link_by_name(root_name).set_bfs_id(-1)
         self.robot.get_link_by_name(root_name).set_bfs_level(-1)
         # until there are no parent to parse
         while len(next_parent_names) != 0:
             # get the next parent and save its level
-            (parent_name, parent_level) = next_parent_names.pop(0)
+            (parent_name, parent_level) = next_parent_names.popleft()
             next_level = parent_level + 1
-            # then until there are no children to parse (of that parent)
-            child_joints = self.robot.get_joints_by_parent_name(parent_name)
-            while len(child_joints) != 0:
+            # then for each child (of that parent)
+            for curr_joint in self.robot.get_joints_by_parent_name(parent_name):
                 # update the current link
-                curr_joint = child_joints.pop(0)
                 curr_joint.set_bfs_id(next_jid)
                 curr_joint.set_bfs_level(next_level)
                 # append the child to the list of future possible parents
@@ -182,7 +440,6 @@ class URDFParser:
                 next_lid += 1
                 next_jid += 1
 
-
     def renumber_linksJoints(self, alpha_tie_breaker = False):
         # remove all fixed joints where applicable (merge links)
         self.remove_fixed_joints()
@@ -198,6 +455,12 @@ class URDFParser:
         self.bfs_order(root_link_name)
         # build subtree lists
         self.build_subtree_lists()
+        # precompute the ancestor/subtree/level tables
+        self.build_topology()
+
+    @timed_stage
+    def build_topology(self):
+        self.robot.get_topology()
 
     def print_joint_order(self):
         print("------------------------------------------")
@@ -207,4 +470,55 @@ class URDFParser:
             print(curr_joint.get_name())
         print("----------------------------")
         print("Total of n = " + str(self.robot.get_num_pos()) + " joints")
-        print("----------------------------")
\ No newline at end of file
+        print("----------------------------")
+
+def parse_many_worker(index, source, alpha_tie_breaker, symbolic, rigid, cache_dir, cache_max_bytes):
+    # parse one source in a worker process -> (index, header, arrays, (error, formatted traceback) or None, seconds)
+    start = time.perf_counter()
+    try:
+        parser = URDFParser() if cache_dir is None else URDFParser(cache_dir, cache_max_bytes)
+        robot = parser.parse_or_raise(source, alpha_tie_breaker, symbolic, verbose = False, rigid = rigid)
+        header = {"name": robot.get_name(), "symbolic": symbolic, "rigid": rigid, "base_dir": parser.base_dir}
+        return index, header, RobotCache.robot_to_arrays(robot), None, time.perf_counter() - start
+    except Exception as error:
+        return index, None, None, (picklable_error(error), "".join(traceback.format_exception(type(error), error, error.__traceback__))), time.perf_counter() - start
+
+def is_picklable(value):
+    try:
+        pickle.loads(pickle.dumps(value))
+        return True
+    except Exception:
+        return False
+
+def picklable_error(error):
+    # error if it can be sent back from a worker process, else its (type, args, picklable attributes) to rebuild it
+    # with (see rebuild_error) as some errors cannot be pickled (e.g., lxml's hold their error_log and need more
+    # arguments than they pickle) or failing that a RuntimeError with its message
+    if is_picklable(error):
+        return error
+    attributes = {}
+    if isinstance(error, SyntaxError):
+        # not stored in the error's __dict__
+        attributes = {key: getattr(error, key) for key in ("msg", "filename", "lineno", "offset", "text")}
+    attributes.update(vars(error))
+    parts = (type(error), error.args, {key: value for key, value in attributes.items() if is_picklable(value)})
+    if is_picklable(parts):
+        return parts
+    return RuntimeError(type(error).__name__ + ": " + str(error))
+
+def rebuild_error(error):
+    # the error sent back from a worker process (see picklable_error)
+    if isinstance(error, BaseException):
+        return error
+    error_type, args, attributes = error
+    # note: extension types (e.g., lxml's) can refuse their own __new__ without __init__ so use the first base's
+    for base in error_type.__mro__:
+        try:
+            error = base.__new__(error_type, *args)
+            break
+        except TypeError:
+            continue
+    error.args = args
+    for key, value in attributes.items():
+        setattr(error, key, value)
+    return error
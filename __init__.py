@@ -1,6 +1,18 @@
-from .URDFParser import URDFParser
+from .version import __version__
+from .URDFParser import URDFParser, WorkerTraceback
 from .Robot import Robot
 from .Link import Link
 from .Joint import Joint
 from .InertiaSet import InertiaSet
-from .SpatialAlgebra import Origin, Translation, Rotation
\ No newline at end of file
+from .Geometry import Geometry, Mesh, load_mesh
+from .SpatialAlgebra import Origin, Translation, Rotation, SpatialTransform
+from .RobotCache import RobotCache
+from .RobotRegistry import RobotRegistry
+from .ParseStats import ParseStats
+from .RobotArrays import RobotArrays
+from .Topology import Topology
+from .Kinematics import forward_kinematics, jacobians, jacobian_sparsity
+from .Dynamics import inverse_dynamics, mass_matrix, mass_matrix_sparsity, forward_dynamics, \
+                      inverse_dynamics_derivatives
+from .Factorization import ltl_factor, ltl_solve
+from .CodeGenerator import generate_kernels, load_kernels
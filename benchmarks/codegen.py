@@ -0,0 +1,51 @@
+# Times the generated robot specific kernels against the generic batched tree loops, e.g.:
+#   python -m URDFParser.benchmarks.codegen --joints 7 --batch 10000
+#   python -m URDFParser.benchmarks.codegen --limbs 4 --joints 6 --batch 1000 (a 25 DoF limbed tree)
+import argparse
+import tempfile
+import time
+import numpy as np
+from ..URDFParser import URDFParser
+from ..Kinematics import forward_kinematics
+from ..Dynamics import inverse_dynamics
+from ..CodeGenerator import load_kernels
+from .synthetic import serial_chain_urdf, limbed_tree_urdf
+
+def time_call(function, *args, repeats = 5):
+    # best of repeats
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser generated kernels benchmark")
+    arg_parser.add_argument("--joints", type = int, default = 7)
+    arg_parser.add_argument("--batch", type = int, default = 10000)
+    arg_parser.add_argument("--limbs", type = int, default = 0, help = "if > 0 use a tree of limbs each with --joints joints")
+    arg_parser.add_argument("--cache-dir", default = None, help = "kernel cache directory (a temporary one by default)")
+    args = arg_parser.parse_args()
+    urdf = limbed_tree_urdf(args.limbs, args.joints) if args.limbs > 0 else serial_chain_urdf(args.joints)
+    robot = URDFParser().parse(urdf.encode(), symbolic = False, verbose = False)
+    n = robot.get_num_joints()
+    cache_dir = args.cache_dir if args.cache_dir is not None else tempfile.mkdtemp()
+    start = time.perf_counter()
+    kernels = load_kernels(robot, cache_dir)
+    print("generated and loaded the kernels for " + str(n) + " joints in %.2fs" % (time.perf_counter() - start))
+    rng = np.random.default_rng(0)
+    q, qd, qdd = [rng.uniform(-1, 1, (args.batch, n)) for _ in range(3)]
+    print("         algorithm    generic(s)  generated(s)  speedup  max abs error")
+    for name, generic, generated, inputs in \
+        (("forward_kinematics", lambda *inputs: forward_kinematics(robot, *inputs), kernels.forward_kinematics, (q,)), \
+         ("inverse_dynamics", lambda *inputs: inverse_dynamics(robot, *inputs), kernels.inverse_dynamics, (q, qd, qdd))):
+        error = np.max(np.abs(generic(*inputs) - generated(*inputs)))
+        generic_time = time_call(generic, *inputs)
+        generated_time = time_call(generated, *inputs)
+        print("%18s  %12.4f  %12.4f  %6.1fx  %13.2e" % (name, generic_time, generated_time, \
+                                                           generic_time / generated_time, error))
+
+if __name__ == "__main__":
+    main()
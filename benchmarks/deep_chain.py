@@ -0,0 +1,50 @@
+# Parses a very deep serial chain (e.g., a snake, rope, or cable model) and checks its renumbering, e.g.:
+#   python -m URDFParser.benchmarks.deep_chain --links 100000 --fixed-every 10
+# note: exits with status 1 if the ids are wrong or the parse takes longer than --max-seconds
+#       (tests/test_deep_chain.py runs the same id check on a smaller chain)
+import argparse
+import sys
+import time
+from ..URDFParser import URDFParser
+from .synthetic import serial_chain_urdf
+
+def check_chain(robot, num_joints, fixed_every):
+    # in a chain the k-th movable joint (in URDF order) must get id k with joint k - 1 as its parent
+    names = ["joint" + str(ind) for ind in range(num_joints) if fixed_every == 0 or (ind + 1) % fixed_every != 0]
+    n = robot.get_num_joints()
+    if n != len(names):
+        return "expected " + str(len(names)) + " joints but found " + str(n)
+    for jid, name in enumerate(names):
+        joint = robot.get_joint_by_name(name)
+        if joint.get_id() != jid or robot.get_parent_id(jid) != jid - 1 or joint.get_bfs_level() != jid or \
+           robot.get_link_by_id(jid).get_subtree() != range(jid, n):
+            return "unexpected ids for " + name
+    return None
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser deep chain renumbering")
+    arg_parser.add_argument("--links", type = int, default = 100000)
+    arg_parser.add_argument("--fixed-every", type = int, default = 10, help = "every k-th joint is fixed (0 for none)")
+    arg_parser.add_argument("--max-seconds", type = float, default = 60, help = "fail if build + renumber take longer")
+    args = arg_parser.parse_args()
+    parser = URDFParser()
+    parser.symbolic = False
+    start = time.perf_counter()
+    parser.load(serial_chain_urdf(args.links, args.fixed_every).encode())
+    parser.parse_links()
+    parser.parse_joints()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    parser.renumber_linksJoints()
+    renumber = time.perf_counter() - start
+    print("links %d  build %.2fs  renumber %.2fs (%.1fus/link)" % (args.links, build, renumber, 1e6 * renumber / args.links))
+    error = check_chain(parser.robot, args.links, args.fixed_every)
+    if error is None and build + renumber > args.max_seconds:
+        error = "build + renumber took %.2fs (more than %.2fs)" % (build + renumber, args.max_seconds)
+    if error is not None:
+        print("[!Error] " + error)
+        sys.exit(1)
+    print("ids ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Times the batched dynamics against a per-sample Python loop, e.g.:
+#   python -m URDFParser.benchmarks.dynamics --joints 7 --batch 10000
+#   python -m URDFParser.benchmarks.dynamics --limbs 6 --joints 10 --batch 1000 (a 61 DoF limbed tree)
+import argparse
+import time
+import numpy as np
+from ..URDFParser import URDFParser
+from ..Dynamics import inverse_dynamics, mass_matrix, forward_dynamics, inverse_dynamics_derivatives
+from ..Factorization import ltl_factor, ltl_solve
+from .synthetic import serial_chain_urdf, limbed_tree_urdf
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def per_sample_loop(function, robot, *batches):
+    for sample in zip(*batches):
+        function(robot, *sample)
+
+def finite_difference_derivatives(robot, q, qd, qdd, step = 1e-6):
+    # forward differences: 2n + 1 (batched) inverse dynamics calls
+    tau = inverse_dynamics(robot, q, qd, qdd)
+    n = q.shape[1]
+    dtau_dq = np.empty(q.shape + (n,))
+    dtau_dqd = np.empty(q.shape + (n,))
+    for jid in range(n):
+        q_step = q.copy()
+        q_step[:,jid] += step
+        dtau_dq[:,:,jid] = (inverse_dynamics(robot, q_step, qd, qdd) - tau) / step
+        qd_step = qd.copy()
+        qd_step[:,jid] += step
+        dtau_dqd[:,:,jid] = (inverse_dynamics(robot, q, qd_step, qdd) - tau) / step
+    return dtau_dq, dtau_dqd
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser batched dynamics benchmark")
+    arg_parser.add_argument("--joints", type = int, default = 7)
+    arg_parser.add_argument("--batch", type = int, default = 10000)
+    arg_parser.add_argument("--limbs", type = int, default = 0, help = "if > 0 use a tree of limbs each with --joints joints")
+    args = arg_parser.parse_args()
+    urdf = limbed_tree_urdf(args.limbs, args.joints) if args.limbs > 0 else serial_chain_urdf(args.joints)
+    robot = URDFParser().parse(urdf.encode(), symbolic = False, verbose = False)
+    n = robot.get_num_joints()
+    rng = np.random.default_rng(0)
+    q, qd, qdd = [rng.uniform(-1, 1, (args.batch, n)) for _ in range(3)]
+    print("     algorithm     batched(s)  per-sample(s)  speedup")
+    for name, function, inputs in (("inverse_dynamics", inverse_dynamics, (q, qd, qdd)), \
+                                   ("mass_matrix", mass_matrix, (q,)), \
+                                   ("forward_dynamics", forward_dynamics, (q, qd, qdd))):
+        batched = time_call(function, robot, *inputs)
+        looped = time_call(per_sample_loop, function, robot, *inputs)
+        print("%18s  %11.4f  %13.4f  %7.1fx" % (name, batched, looped, looped / batched))
+    # validate the articulated body algorithm against the dense H^-1 (tau - C) reference
+    tau = qdd
+    C = inverse_dynamics(robot, q, qd, np.zeros_like(qd))
+    qdd_dense = np.linalg.solve(mass_matrix(robot, q), (tau - C)[..., None])[..., 0]
+    print("max |forward_dynamics - H^-1 (tau - C)| = %.3e" % np.max(np.abs(forward_dynamics(robot, q, qd, tau) - qdd_dense)))
+    # tree sparse L^T L factorization and solve against the dense solve
+    H = mass_matrix(robot, q)
+    H_packed, _ = mass_matrix(robot, q, packed = True)
+    dense = time_call(np.linalg.solve, H, qdd[..., None])
+    sparse = time_call(lambda: ltl_solve(robot, ltl_factor(robot, H_packed, packed = True), qdd, packed = True))
+    print("H^-1 b: ltl_factor + ltl_solve (packed) %.4fs  np.linalg.solve %.4fs  speedup %.1fx" % (sparse, dense, dense / sparse))
+    error = np.max(np.abs(ltl_solve(robot, ltl_factor(robot, H), qdd) - np.linalg.solve(H, qdd[..., None])[..., 0]))
+    print("max |ltl_solve - np.linalg.solve| = %.3e" % error)
+    # analytical inverse dynamics derivatives against (batched) finite differences
+    analytical = time_call(inverse_dynamics_derivatives, robot, q, qd, qdd)
+    finite_difference = time_call(finite_difference_derivatives, robot, q, qd, qdd)
+    print("inverse_dynamics_derivatives: analytical %.4fs  finite differences %.4fs  speedup %.1fx" % \
+          (analytical, finite_difference, finite_difference / analytical))
+    errors = [np.max(np.abs(exact - approx)) for exact, approx in \
+              zip(inverse_dynamics_derivatives(robot, q, qd, qdd), finite_difference_derivatives(robot, q, qd, qdd))]
+    print("max |analytical - finite differences| = %.3e (dq), %.3e (dqd)" % tuple(errors))
+
+if __name__ == "__main__":
+    main()
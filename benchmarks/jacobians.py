@@ -0,0 +1,54 @@
+# Times the batched link Jacobians against a per-sample ancestor walk over the Xmats, e.g.:
+#   python -m URDFParser.benchmarks.jacobians --joints 7 --batch 1000
+#   python -m URDFParser.benchmarks.jacobians --limbs 6 --joints 10 --batch 100 (a 61 DoF limbed tree)
+import argparse
+import time
+import numpy as np
+from ..URDFParser import URDFParser
+from ..Kinematics import jacobians
+from .synthetic import serial_chain_urdf, limbed_tree_urdf
+
+def per_sample_body_jacobians(robot, q):
+    # body Jacobians of every link one sample at a time: column j of link i is iX_j S_j along the ancestor walk
+    n = robot.get_num_joints()
+    S = robot.to_arrays().S
+    J = np.zeros((q.shape[0], n, 6, n))
+    for b in range(q.shape[0]):
+        Xmats = robot.eval_Xmats(q[b])
+        for jid in range(n):
+            X = np.eye(6)
+            J[b, jid, :, jid] = S[jid]
+            curr_id = jid
+            for ancestor_id in robot.get_ancestors_by_id(jid):
+                X = np.matmul(X, Xmats[curr_id])
+                J[b, jid, :, ancestor_id] = np.matmul(X, S[ancestor_id])
+                curr_id = ancestor_id
+    return J
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser batched Jacobian benchmark")
+    arg_parser.add_argument("--joints", type = int, default = 7)
+    arg_parser.add_argument("--batch", type = int, default = 1000)
+    arg_parser.add_argument("--limbs", type = int, default = 0, help = "if > 0 use a tree of limbs each with --joints joints")
+    args = arg_parser.parse_args()
+    urdf = limbed_tree_urdf(args.limbs, args.joints) if args.limbs > 0 else serial_chain_urdf(args.joints)
+    robot = URDFParser().parse(urdf.encode(), symbolic = False, verbose = False)
+    n = robot.get_num_joints()
+    q = np.random.default_rng(0).uniform(-1, 1, (args.batch, n))
+    print("%d joints, batch %d" % (n, args.batch))
+    for kind in ("geometric", "spatial", "body"):
+        for packed in (False, True):
+            start = time.perf_counter()
+            jacobians(robot, q, kind = kind, packed = packed)
+            print("%10s %-6s %.4fs" % (kind, "packed" if packed else "dense", time.perf_counter() - start))
+    start = time.perf_counter()
+    looped = per_sample_body_jacobians(robot, q)
+    looped_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = jacobians(robot, q, kind = "body")
+    batched_time = time.perf_counter() - start
+    print("body: batched %.4fs  per-sample %.4fs  speedup %.1fx" % (batched_time, looped_time, looped_time / batched_time))
+    print("max |batched - per-sample| = %.3e" % np.max(np.abs(batched - looped)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Times URDFParser stages against the number of links, e.g.:
+#   python -m URDFParser.benchmarks.parse_scaling --sizes 50 100 200 400
+import argparse
+import os
+import tempfile
+import time
+from ..URDFParser import URDFParser
+from .synthetic import serial_chain_urdf, random_tree_urdf
+
+def time_parse(urdf_string, symbolic = True):
+    with tempfile.NamedTemporaryFile("w", suffix = ".urdf", delete = False) as urdf_file:
+        urdf_file.write(urdf_string)
+    try:
+        parser = URDFParser()
+        parser.symbolic = symbolic
+        times = {}
+        start = time.perf_counter()
+        parser.load(urdf_file.name)
+        parser.parse_links()
+        parser.parse_joints()
+        times["build"] = time.perf_counter() - start
+        start = time.perf_counter()
+        parser.renumber_linksJoints()
+        times["renumber"] = time.perf_counter() - start
+        return times
+    finally:
+        os.remove(urdf_file.name)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser parse time scaling")
+    arg_parser.add_argument("--sizes", type = int, nargs = "+", default = [25, 50, 100, 200, 400])
+    arg_parser.add_argument("--numeric", action = "store_true", help = "parse with symbolic = False")
+    args = arg_parser.parse_args()
+    for label, generator in (("chain", serial_chain_urdf), ("tree", random_tree_urdf)):
+        print(label + ":")
+        print("     n     build(s)  renumber(s)  renumber/link(us)")
+        for n in args.sizes:
+            times = time_parse(generator(n), not args.numeric)
+            print("%6d  %11.4f  %11.4f  %17.2f" % (n, times["build"], times["renumber"], 1e6 * times["renumber"] / n))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Scaling benchmark suite: times each parse stage and common Robot query patterns on synthetic URDFs, records the
+# peak memory of each stage, and optionally compares the results against a stored baseline, e.g.:
+#   python -m URDFParser.benchmarks.suite --output baseline.json
+#   python -m URDFParser.benchmarks.suite --output results.json --baseline baseline.json --threshold 0.25
+#   python -m URDFParser.benchmarks.suite --families chain cad --sizes 10 100 1000 10000 --symbolic
+# note: exits with status 1 if any time or peak memory regressed beyond the thresholds (e.g., for CI)
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from ..URDFParser import URDFParser
+from ..version import __version__
+from .synthetic import serial_chain_urdf, balanced_tree_urdf, random_tree_urdf, cad_urdf, mixed_tree_urdf
+
+# name: (generator of a URDF with the given number of joints, description)
+FAMILIES = {"chain": (serial_chain_urdf, "serial chain"), \
+            "balanced": (balanced_tree_urdf, "balanced binary tree"), \
+            "random": (random_tree_urdf, "unbalanced random tree"), \
+            "cad": (cad_urdf, "CAD style tree with 75% fixed joints"), \
+            "mixed": (mixed_tree_urdf, "random tree of mixed revolute/prismatic joints and axes")}
+
+STAGES = ("load", "parse_links", "parse_joints", "renumber") # renumber includes the fixed joint merging
+
+###################
+#    Measuring    #
+###################
+
+def run_stages(path, symbolic, on_stage = None):
+    # parse path stage by stage -> (robot, {stage: seconds}) calling on_stage(stage) before each stage
+    parser = URDFParser()
+    parser.symbolic = symbolic
+    times = {}
+    for stage, function in zip(STAGES, (lambda: parser.load(path), parser.parse_links, parser.parse_joints, \
+                                        parser.renumber_linksJoints)):
+        if on_stage is not None:
+            on_stage(stage)
+        start = time.perf_counter()
+        function()
+        times[stage] = time.perf_counter() - start
+    return parser.robot, times
+
+def get_queries(robot):
+    # common access patterns (each visiting every link/joint once) as name: function
+    n = robot.get_num_joints()
+    names = [joint.get_name() for joint in robot.get_joints_ordered_by_id()]
+    return {"joints_ordered_by_id": lambda: robot.get_joints_ordered_by_id(), \
+            "links_ordered_by_id": lambda: robot.get_links_ordered_by_id(), \
+            "joint_by_name": lambda: [robot.get_joint_by_name(name) for name in names], \
+            "parent_id": lambda: [robot.get_parent_id(jid) for jid in range(n)], \
+            "subtree_by_id": lambda: [robot.get_subtree_by_id(jid) for jid in range(n)], \
+            "ancestors_by_id": lambda: [robot.get_ancestors_by_id(jid) for jid in range(n)], \
+            "ids_by_bfs_level": lambda: [robot.get_ids_by_bfs_level(level) for level in range(robot.get_max_bfs_level() + 1)], \
+            "to_arrays": lambda: robot.to_arrays()}
+
+def time_queries(robot):
+    # {query: seconds} of one call of each query (after a first call so cached structures are already built)
+    times = {}
+    for name, function in get_queries(robot).items():
+        function()
+        start = time.perf_counter()
+        function()
+        times[name] = time.perf_counter() - start
+    return times
+
+def summarize(samples):
+    # ({metric: median}, {metric: min}) of the repeated times of each metric
+    return {metric: float(np.median(values)) for metric, values in samples.items()}, \
+           {metric: float(np.min(values)) for metric, values in samples.items()}
+
+def measure_memory(path, symbolic):
+    # peak traced memory (bytes) of each stage above the memory in use when it started
+    # note: measured in a separate pass as tracing slows down allocation heavy code
+    peaks = {}
+    current = {}
+    def on_stage(stage):
+        # close the previous stage and start tracking the next one
+        if current:
+            peaks[current["stage"]] = tracemalloc.get_traced_memory()[1] - current["start"]
+        tracemalloc.reset_peak()
+        current["stage"] = stage
+        current["start"] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.start()
+    try:
+        run_stages(path, symbolic, on_stage)
+        peaks[current["stage"]] = tracemalloc.get_traced_memory()[1] - current["start"]
+        peaks["retained"] = tracemalloc.get_traced_memory()[0] # held by the parsed robot (and parser)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+def run_models(models, symbolic, repeat):
+    # {model: (family, size)} -> {model: result} with the median and min of repeat runs of every time
+    # note: the runs are interleaved (each round runs every model once) so a slow phase of the machine (e.g., other
+    #       load or frequency scaling) lands on one run of many models instead of every run of one model
+    paths = {}
+    try:
+        for model, (family, size) in models.items():
+            with tempfile.NamedTemporaryFile("w", suffix = ".urdf", delete = False) as urdf_file:
+                urdf_file.write(FAMILIES[family][0](size - 1))
+            paths[model] = urdf_file.name
+        stage_samples = {model: {stage: [] for stage in STAGES + ("total",)} for model in models}
+        query_samples = {model: {} for model in models}
+        joints = {}
+        for round_id in range(repeat):
+            print("round %d/%d" % (round_id + 1, repeat), file = sys.stderr)
+            for model, path in paths.items():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    robot, times = run_stages(path, symbolic)
+                    times["total"] = sum(times.values())
+                    for stage, elapsed in times.items():
+                        stage_samples[model][stage].append(elapsed)
+                    for name, elapsed in time_queries(robot).items():
+                        query_samples[model].setdefault(name, []).append(elapsed)
+                joints[model] = robot.get_num_joints()
+        results = {}
+        for model, (family, size) in models.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                memory = measure_memory(paths[model], symbolic)
+            stages, stages_min = summarize(stage_samples[model])
+            queries, queries_min = summarize(query_samples[model])
+            results[model] = {"family": family, "links": size, "joints": joints[model], "stages": stages, \
+                              "stages_min": stages_min, "queries": queries, "queries_min": queries_min, "peak_memory": memory}
+    finally:
+        for path in paths.values():
+            os.remove(path)
+    return results
+
+####################
+#    Comparison    #
+####################
+
+def is_slower(value, base_value, threshold, min_seconds):
+    return base_value is not None and value > base_value * (1 + threshold) and value - base_value > min_seconds
+
+def compare(results, baseline, threshold = 0.25, min_seconds = 5e-3, memory_threshold = 0.25):
+    # -> list of (model, metric, baseline median, new median) that regressed
+    # a time regresses if both its median and its min over the repeats are more than threshold slower (relative)
+    # and min_seconds slower (absolute, to ignore timer noise on tiny models) so a single noisy run (in either the
+    # baseline or the new results) is not reported, and a peak memory if it is more than memory_threshold larger
+    regressions = []
+    for model, result in results["models"].items():
+        if model not in baseline["models"]:
+            continue
+        base = baseline["models"][model]
+        for group in ("stages", "queries"):
+            for metric, value in result[group].items():
+                base_value = base[group].get(metric)
+                # baselines without mins only compare the median
+                min_value = result[group + "_min"][metric]
+                base_min_value = base.get(group + "_min", base[group]).get(metric)
+                if is_slower(value, base_value, threshold, min_seconds) and \
+                   is_slower(min_value, base_min_value, threshold, min_seconds):
+                    regressions.append((model, group + "." + metric, base_value, value))
+        for metric, value in result["peak_memory"].items():
+            base_value = base["peak_memory"].get(metric)
+            if base_value is not None and value > base_value * (1 + memory_threshold) and value - base_value > 1024*1024:
+                regressions.append((model, "peak_memory." + metric, base_value, value))
+    return regressions
+
+def print_comparison(results, baseline):
+    # total parse time and largest stage peak memory of every model in both
+    print("%-18s %-12s %12s %12s %8s" % ("model", "metric", "baseline", "current", "ratio"))
+    for model, result in results["models"].items():
+        if model not in baseline["models"]:
+            continue
+        base = baseline["models"][model]
+        for metric, value, base_value in (("time(s)", result["stages"]["total"], base["stages"]["total"]), \
+                                          ("peak(MB)", get_peak_memory(result) / 2**20, get_peak_memory(base) / 2**20)):
+            print("%-18s %-12s %12.4g %12.4g %7.2fx" % (model, metric, base_value, value, value / max(base_value, 1e-12)))
+
+def get_peak_memory(result):
+    return max([value for stage, value in result["peak_memory"].items() if stage in STAGES])
+
+##############
+#    Main    #
+##############
+
+def main():
+    arg_parser = argparse.ArgumentParser(description = "URDFParser scaling benchmark suite")
+    arg_parser.add_argument("--families", nargs = "+", default = list(FAMILIES), choices = list(FAMILIES))
+    arg_parser.add_argument("--sizes", type = int, nargs = "+", default = [10, 100, 1000, 10000], help = "numbers of links")
+    arg_parser.add_argument("--symbolic", action = "store_true", help = "parse with symbolic = True (slow for large sizes)")
+    arg_parser.add_argument("--repeat", type = int, default = 5, help = "median and min of this many runs")
+    arg_parser.add_argument("--output", default = None, help = "write the results to this json file")
+    arg_parser.add_argument("--baseline", default = None, help = "compare against this results json file")
+    arg_parser.add_argument("--threshold", type = float, default = 0.25, help = "allowed relative slowdown")
+    arg_parser.add_argument("--min-seconds", type = float, default = 5e-3, help = "ignore slowdowns smaller than this")
+    arg_parser.add_argument("--memory-threshold", type = float, default = 0.25, help = "allowed relative peak memory growth")
+    args = arg_parser.parse_args()
+    results = {"version": __version__, "python": platform.python_version(), "numpy": np.__version__, \
+               "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), \
+               "symbolic": args.symbolic, "repeat": args.repeat, "models": {}}
+    models = {family + "_" + str(size): (family, size) for family in args.families for size in args.sizes}
+    results["models"] = run_models(models, args.symbolic, args.repeat)
+    print("%-18s %7s %9s %9s %9s %9s %9s %12s" % ("model", "joints", "load", "links", "joints", "renumber", "total", "peak(MB)"))
+    for model, result in results["models"].items():
+        stages = result["stages"]
+        print("%-18s %7d %9.4f %9.4f %9.4f %9.4f %9.4f %12.2f" % (model, result["joints"], stages["load"], \
+              stages["parse_links"], stages["parse_joints"], stages["renumber"], stages["total"], \
+              get_peak_memory(result) / 2**20))
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent = 1)
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("symbolic") != results["symbolic"]:
+            print("[!Error] the baseline was run with symbolic = " + str(baseline.get("symbolic")))
+        print_comparison(results, baseline)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds, args.memory_threshold)
+        for model, metric, base_value, value in regressions:
+            print("[!Regression] " + model + " " + metric + ": " + "%.4g -> %.4g" % (base_value, value))
+        if regressions:
+            sys.exit(1)
+        print("no regressions against " + args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import random
+
+def link_xml(name):
+    return '<link name="' + name + '"><inertial><origin xyz="0 0 0.1" rpy="0 0 0"/><mass value="1.0"/>' + \
+           '<inertia ixx="0.01" ixy="0" ixz="0" iyy="0.01" iyz="0" izz="0.01"/></inertial></link>'
+
+AXES = ("0 0 1", "0 1 0", "1 0 0")
+
+def joint_xml(name, jtype, parent, child, axis = "0 0 1"):
+    return '<joint name="' + name + '" type="' + jtype + '"><origin xyz="0.05 0 0.2" rpy="0 0 0"/>' + \
+           '<parent link="' + parent + '"/><child link="' + child + '"/><axis xyz="' + axis + '"/></joint>'
+
+def tree_urdf(parent_ids, name = "synthetic", fixed_every = 0, joint_types = None):
+    # parent_ids[i] is the index of the parent of link i + 1 (link 0 is the base)
+    # if fixed_every > 0 every fixed_every-th joint is fixed (and so merged away when parsed)
+    # or joint_types[i] gives the type of joint i (e.g., to mix in prismatic joints)
+    lines = ['<?xml version="1.0"?>', '<robot name="' + name + '">']
+    lines += [link_xml("link" + str(lid)) for lid in range(len(parent_ids) + 1)]
+    for jid, parent_id in enumerate(parent_ids):
+        if joint_types is not None:
+            jtype = joint_types[jid]
+        else:
+            jtype = "fixed" if fixed_every > 0 and (jid + 1) % fixed_every == 0 else "revolute"
+        lines.append(joint_xml("joint" + str(jid), jtype, "link" + str(parent_id), "link" + str(jid + 1), AXES[jid % 3]))
+    lines.append('</robot>')
+    return "\n".join(lines)
+
+def serial_chain_urdf(num_joints, fixed_every = 0):
+    return tree_urdf(list(range(num_joints)), "chain" + str(num_joints), fixed_every)
+
+def random_tree_urdf(num_joints, seed = 0):
+    rng = random.Random(seed)
+    return tree_urdf([rng.randrange(jid + 1) for jid in range(num_joints)], "tree" + str(num_joints))
+
+def limbed_tree_urdf(num_limbs, limb_length):
+    # a torso joint with num_limbs serial chains of limb_length joints attached (e.g., 6 x 10 ~ a 60 DoF humanoid)
+    parent_ids = [0]
+    for _ in range(num_limbs):
+        parent_ids += [1] + [len(parent_ids) + 1 + lid for lid in range(limb_length - 1)]
+    return tree_urdf(parent_ids, "limbs" + str(num_limbs) + "x" + str(limb_length))
+
+def balanced_tree_urdf(num_joints, branching = 2):
+    # every link has branching children (filled level by level)
+    return tree_urdf([jid // branching for jid in range(num_joints)], "balanced" + str(num_joints))
+
+def cad_urdf(num_joints, fixed_fraction = 0.75, seed = 0):
+    # CAD style exports: most joints rigidly attach parts (brackets, covers, sensors) to a few moving bodies
+    # note: parts attach near recently added links so the moving bodies carry sizable fixed subtrees
+    rng = random.Random(seed)
+    parent_ids = [max(0, jid - rng.randrange(8)) for jid in range(num_joints)]
+    joint_types = ["revolute" if jid == 0 or rng.random() >= fixed_fraction else "fixed" for jid in range(num_joints)]
+    return tree_urdf(parent_ids, "cad" + str(num_joints), joint_types = joint_types)
+
+def mixed_tree_urdf(num_joints, seed = 0):
+    # random tree alternating revolute and prismatic joints (with the axes cycling through z, y, x)
+    rng = random.Random(seed)
+    joint_types = ["revolute" if jid % 2 == 0 else "prismatic" for jid in range(num_joints)]
+    return tree_urdf([rng.randrange(jid + 1) for jid in range(num_joints)], "mixed" + str(num_joints), joint_types = joint_types)
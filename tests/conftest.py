@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from ..URDFParser import URDFParser
+from ..SpatialAlgebra import skew
+from ..benchmarks.synthetic import mixed_tree_urdf
+
+# a small arm with non trivial (and slightly off, e.g., 1.5708 ~ PI/2) joint origins, a prismatic joint, and a fixed
+# joint (merged into its parent)
+ARM_URDF = b"""<?xml version="1.0"?>
+<robot name="arm">
+  <link name="base"/>
+  <link name="l1"><inertial><origin xyz="0.01 0.02 0.1" rpy="0 0 0"/><mass value="2.0"/><inertia ixx="0.05" ixy="0.001" ixz="0" iyy="0.06" iyz="0.001" izz="0.02"/></inertial></link>
+  <link name="l2"><inertial><origin xyz="0.1 0 0.05" rpy="0 0 0"/><mass value="1.5"/><inertia ixx="0.03" ixy="0" ixz="0.001" iyy="0.02" iyz="0" izz="0.01"/></inertial></link>
+  <link name="l3"><inertial><origin xyz="0 0.03 0.07" rpy="0 0 0"/><mass value="0.8"/><inertia ixx="0.004" ixy="0" ixz="0" iyy="0.005" iyz="0" izz="0.002"/></inertial></link>
+  <link name="tool"><inertial><origin xyz="0 0 0.02" rpy="0 0 0"/><mass value="0.2"/><inertia ixx="0.001" ixy="0" ixz="0" iyy="0.001" iyz="0" izz="0.001"/></inertial></link>
+  <joint name="j1" type="revolute"><parent link="base"/><child link="l1"/><origin xyz="0.1 0.2 0.3" rpy="1.5708 0 3.14159"/><axis xyz="0 0 1"/></joint>
+  <joint name="j2" type="revolute"><parent link="l1"/><child link="l2"/><origin xyz="0.3 -0.1 0.25" rpy="0.3 -0.7 1.1"/><axis xyz="0 1 0"/></joint>
+  <joint name="j3" type="prismatic"><parent link="l2"/><child link="l3"/><origin xyz="0.05 0.4 -0.2" rpy="-1.5708 0.5 0"/><axis xyz="1 0 0"/></joint>
+  <joint name="jt" type="fixed"><parent link="l3"/><child link="tool"/><origin xyz="0.02 0.03 0.15" rpy="0.7854 0 1.5708"/></joint>
+</robot>
+"""
+
+@pytest.fixture(params = [True, False], ids = ["symbolic", "numeric"])
+def symbolic(request):
+    return request.param
+
+@pytest.fixture
+def arm(symbolic):
+    return URDFParser().parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False)
+
+@pytest.fixture(params = ["arm_symbolic", "arm_numeric", "tree"])
+def robot(request):
+    # the arm (with a damped joint) in both modes and a random tree of revolute and prismatic joints
+    # note: parsed with rigid transforms so the dense Xmats the references use match the engines to ~1e-14
+    if request.param == "tree":
+        robot = URDFParser().parse_or_raise(mixed_tree_urdf(12).encode(), symbolic = False, verbose = False, rigid = True)
+    else:
+        robot = URDFParser().parse_or_raise(ARM_URDF, symbolic = request.param == "arm_symbolic", verbose = False, rigid = True)
+    robot.get_joint_by_id(1).set_damping(0.3)
+    return robot
+
+def random_state(robot, batch = 4, seed = 0):
+    rng = np.random.default_rng(seed)
+    n = robot.get_num_joints()
+    return rng.uniform(-1, 1, (batch, n)), rng.uniform(-1, 1, (batch, n)), rng.uniform(-1, 1, (batch, n))
+
+######################
+#    Dense Models    #
+######################
+
+# references for the batched engines walking the parents one sample at a time using each joint's own 6x6 Xmat
+# function, motion subspace, and spatial inertia
+
+def dense_model(robot, q):
+    # (parents, Xmats, world Xmats X0, motion subspaces, spatial inertias) of a single configuration
+    n = robot.get_num_joints()
+    parents = [robot.get_parent_id(jid) for jid in range(n)]
+    Xmats = [np.array(robot.get_Xmat_Func_by_id(jid)(q[jid]), dtype = float) for jid in range(n)]
+    X0s = []
+    for jid in range(n):
+        X0s.append(Xmats[jid] if parents[jid] == -1 else np.matmul(Xmats[jid], X0s[parents[jid]]))
+    S = [np.array(robot.get_joint_by_id(jid).S, dtype = float) for jid in range(n)]
+    I = [np.array(robot.get_link_by_id(jid).get_spatial_inertia(), dtype = float) for jid in range(n)]
+    return parents, Xmats, X0s, S, I
+
+def crm(v):
+    # the 6x6 motion cross product matrix of v
+    matrix = np.zeros((6,6))
+    matrix[:3,:3] = skew(v[:3])
+    matrix[3:,3:] = skew(v[:3])
+    matrix[3:,:3] = skew(v[3:])
+    return matrix
+
+def dense_inverse_dynamics(robot, q, qd, qdd, gravity = 9.81):
+    parents, Xmats, _, S, I = dense_model(robot, q)
+    a_base = np.array([0, 0, 0, 0, 0, gravity])
+    v, a, f = [], [], []
+    for jid in range(len(q)):
+        vJ = S[jid] * qd[jid]
+        v_parent = np.zeros(6) if parents[jid] == -1 else v[parents[jid]]
+        a_parent = a_base if parents[jid] == -1 else a[parents[jid]]
+        v.append(np.matmul(Xmats[jid], v_parent) + vJ)
+        a.append(np.matmul(Xmats[jid], a_parent) + S[jid] * qdd[jid] + np.matmul(crm(v[jid]), vJ))
+        f.append(np.matmul(I[jid], a[jid]) - np.matmul(crm(v[jid]).T, np.matmul(I[jid], v[jid])))
+    tau = np.zeros(len(q))
+    for jid in range(len(q) - 1, -1, -1):
+        tau[jid] = np.dot(S[jid], f[jid]) + robot.get_joint_by_id(jid).damping * qd[jid]
+        if parents[jid] != -1:
+            f[parents[jid]] = f[parents[jid]] + np.matmul(Xmats[jid].T, f[jid])
+    return tau
+
+def dense_mass_matrix(robot, q):
+    # column j is the inverse dynamics of qdd = e_j without velocity or gravity
+    n = len(q)
+    return np.array([dense_inverse_dynamics(robot, q, np.zeros(n), np.eye(n)[jid], 0) for jid in range(n)]).T
+
+def get_origin(obj):
+    return np.array(obj.origin.Xmat_sp_fixed_hom, dtype = float) if obj.origin.Xmat_sp_fixed_hom is not None else \
+           np.array([obj.origin.translation.x, obj.origin.translation.y, obj.origin.translation.z, \
+                     obj.origin.rotation.r, obj.origin.rotation.p, obj.origin.rotation.y], dtype = float)
+
+def assert_robots_equal(robot, other):
+    assert [link.get_name() for link in robot.get_links_ordered_by_id()] == \
+           [link.get_name() for link in other.get_links_ordered_by_id()]
+    for link in robot.get_links_ordered_by_id():
+        other_link = other.get_link_by_name(link.get_name())
+        assert link.get_parent_id() == other_link.get_parent_id()
+        assert np.array_equal(link.get_spatial_inertia(), other_link.get_spatial_inertia())
+        assert np.array_equal(get_origin(link), get_origin(other_link))
+    assert [joint.get_name() for joint in robot.get_joints_ordered_by_id()] == \
+           [joint.get_name() for joint in other.get_joints_ordered_by_id()]
+    for joint in robot.get_joints_ordered_by_id():
+        other_joint = other.get_joint_by_name(joint.get_name())
+        assert (joint.jtype, joint.get_parent(), joint.get_child()) == (other_joint.jtype, other_joint.get_parent(), other_joint.get_child())
+        assert np.array_equal(get_origin(joint), get_origin(other_joint))
+        assert np.array_equal(joint.get_joint_subspace(), other_joint.get_joint_subspace())
+        assert joint.get_joint_subspace().dtype == other_joint.get_joint_subspace().dtype
+        if joint.symbolic:
+            assert joint.get_transformation_matrix() == other_joint.get_transformation_matrix()
+        else:
+            assert np.array_equal(joint.get_fixed_transformation_matrix(), other_joint.get_fixed_transformation_matrix())
+        for coefficient, other_coefficient in zip(joint.get_transformation_matrix_coefficients(), \
+                                                  other_joint.get_transformation_matrix_coefficients()):
+            assert np.array_equal(coefficient, other_coefficient)
+    merges, other_merges = robot.fixed_joint_merges, other.fixed_joint_merges
+    assert other_merges is not None
+    assert sorted(merges.removed_links) == sorted(other_merges.removed_links)
+    assert sorted(merges.removed_joints) == sorted(other_merges.removed_joints)
+    assert [step["kind"] for step in merges.steps] == [step["kind"] for step in other_merges.steps]
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from ..RobotArrays import RobotArrays
+
+def test_arrays_match_robot(robot):
+    arrays = robot.to_arrays()
+    joints = robot.get_joints_ordered_by_id()
+    assert arrays.get_num_joints() == len(joints) and arrays.name == robot.get_name()
+    assert np.array_equal(arrays.parent, robot.get_parent_id_array())
+    assert np.array_equal(arrays.I, robot.get_Imats_ordered_by_id())
+    assert np.array_equal(arrays.S, [joint.get_joint_subspace() for joint in joints])
+    assert np.array_equal(arrays.damping, [joint.get_damping() for joint in joints])
+    assert [RobotArrays.JOINT_TYPES[code] for code in arrays.jtype] == [joint.jtype for joint in joints]
+    assert np.array_equal(arrays.bfs_order[arrays.bfs_id], np.arange(len(joints)))
+    for field in arrays.get_field_names():
+        assert not getattr(arrays, field).flags.writeable
+    assert robot.to_arrays() is arrays
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_arrays_save_load(robot, tmp_path, mmap):
+    arrays = robot.to_arrays()
+    path = str(tmp_path / "robot.arrays")
+    arrays.save(path)
+    loaded = RobotArrays.load(path, mmap = mmap)
+    assert isinstance(loaded.buffer, np.memmap) == mmap
+    assert (loaded.name, loaded.n) == (arrays.name, arrays.n)
+    for field in arrays.get_field_names():
+        assert getattr(loaded, field).dtype == getattr(arrays, field).dtype
+        assert np.array_equal(getattr(loaded, field), getattr(arrays, field))
+        assert not getattr(loaded, field).flags.writeable
+
+def test_arrays_load_rejects_other_files(tmp_path):
+    path = tmp_path / "robot.arrays"
+    path.write_bytes(b"not robot arrays")
+    with pytest.raises(ValueError):
+        RobotArrays.load(str(path))
@@ -0,0 +1,37 @@
+import pytest
+import sympy as sp
+from ..SpatialAlgebra import parse_srepr
+from ..URDFParser import URDFParser
+from .conftest import ARM_URDF, assert_robots_equal
+
+@pytest.mark.parametrize("rigid", [False, True], ids = ["snapped", "rigid"])
+def test_cache_hit_matches_miss(symbolic, rigid, tmp_path):
+    miss = URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False, rigid = rigid)
+    hit = URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False, rigid = rigid)
+    assert not miss.parse_stats.cache_hit and hit.parse_stats.cache_hit
+    assert_robots_equal(miss, hit)
+    assert all([joint.rigid == rigid for joint in hit.get_joints_ordered_by_id()])
+    # the other snapping is a different entry
+    other = URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False, rigid = not rigid)
+    assert not other.parse_stats.cache_hit
+
+def test_cache_hit_updates_by_name(symbolic, tmp_path):
+    robots = [URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False) for _ in range(2)]
+    for robot in robots:
+        # jt and tool are merged away by the fixed joint
+        robot.set_joint_origin_by_name("jt", xyz = [0.1, 0.2, 0.3], rpy = [0.2, 0, 0])
+        robot.set_link_inertial_by_name("tool", 1.0, 0.1, 0, 0, 0.1, 0, 0.1, com = [0, 0, 0.1])
+        robot.set_joint_origin_by_name("j2", rpy = [0, 0.4, 0])
+    assert_robots_equal(*robots)
+
+def test_srepr_parsing_does_not_evaluate(tmp_path):
+    robot = URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, verbose = False)
+    for joint in robot.get_joints_ordered_by_id():
+        Xmat = joint.get_transformation_matrix()
+        assert sp.Matrix(parse_srepr(sp.srepr(Xmat))) == Xmat
+    flag = tmp_path / "flag"
+    for string in ("__import__('pathlib').Path(%r).touch()" % str(flag), "Symbol('x').__class__", \
+                   "Integer(1) + Integer(2)", "Float(**{'num': '1.0'})"):
+        with pytest.raises(ValueError):
+            parse_srepr(string)
+    assert not flag.exists()
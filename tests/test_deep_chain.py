@@ -0,0 +1,10 @@
+import sys
+from ..URDFParser import URDFParser
+from ..benchmarks.deep_chain import check_chain
+from ..benchmarks.synthetic import serial_chain_urdf
+
+def test_deep_chain_renumbering():
+    # deeper than the recursion limit so a recursive traversal would fail
+    num_links = 2 * sys.getrecursionlimit()
+    robot = URDFParser().parse_or_raise(serial_chain_urdf(num_links, 10).encode(), symbolic = False, verbose = False)
+    assert check_chain(robot, num_links, 10) is None
@@ -0,0 +1,66 @@
+import numpy as np
+from ..Dynamics import inverse_dynamics, mass_matrix, mass_matrix_sparsity, forward_dynamics, \
+                       inverse_dynamics_derivatives
+from .conftest import random_state, dense_inverse_dynamics, dense_mass_matrix
+
+def test_inverse_dynamics(robot):
+    q, qd, qdd = random_state(robot)
+    reference = np.array([dense_inverse_dynamics(robot, *sample) for sample in zip(q, qd, qdd)])
+    assert np.allclose(inverse_dynamics(robot, q, qd, qdd), reference, rtol = 0, atol = 1e-10)
+    assert np.allclose(inverse_dynamics(robot, q[0], qd[0], qdd[0]), reference[0], rtol = 0, atol = 1e-10)
+    # gravity as a 3 vector
+    reference = dense_inverse_dynamics(robot, q[0], qd[0], qdd[0], gravity = 0)
+    assert np.allclose(inverse_dynamics(robot, q[0], qd[0], qdd[0], gravity = [0, 0, 0]), reference, rtol = 0, atol = 1e-10)
+
+def test_mass_matrix(robot):
+    q, _, _ = random_state(robot)
+    H = mass_matrix(robot, q)
+    for b in range(len(q)):
+        assert np.allclose(H[b], dense_mass_matrix(robot, q[b]), rtol = 0, atol = 1e-10)
+    values, (rows, cols) = mass_matrix(robot, q, packed = True)
+    assert np.array_equal(values, H[:, rows, cols])
+
+def test_mass_matrix_sparsity_pattern(robot):
+    rows, cols = mass_matrix_sparsity(robot)
+    H = mass_matrix(robot, random_state(robot)[0])
+    mask = np.zeros(H.shape[1:], dtype = bool)
+    mask[rows, cols] = True
+    mask[cols, rows] = True
+    assert np.all(H[:, ~mask] == 0)
+    assert np.sum(np.tril(mask)) == len(rows)
+
+def test_forward_dynamics(robot):
+    q, qd, tau = random_state(robot)
+    qdd = forward_dynamics(robot, q, qd, tau)
+    for b in range(len(q)):
+        bias = dense_inverse_dynamics(robot, q[b], qd[b], np.zeros(len(q[b])))
+        assert np.allclose(qdd[b], np.linalg.solve(dense_mass_matrix(robot, q[b]), tau[b] - bias), rtol = 0, atol = 1e-9)
+    assert np.allclose(forward_dynamics(robot, q[0], qd[0], tau[0]), qdd[0], rtol = 0, atol = 1e-12)
+
+def test_inverse_dynamics_derivatives(robot):
+    # against central differences of the dense reference
+    q, qd, qdd = random_state(robot, batch = 2)
+    dtau_dq, dtau_dqd = inverse_dynamics_derivatives(robot, q, qd, qdd)
+    step = 1e-6
+    for b in range(len(q)):
+        for jid in range(robot.get_num_joints()):
+            delta = np.eye(robot.get_num_joints())[jid] * step
+            dq = (dense_inverse_dynamics(robot, q[b] + delta, qd[b], qdd[b]) - \
+                  dense_inverse_dynamics(robot, q[b] - delta, qd[b], qdd[b])) / (2 * step)
+            dqd = (dense_inverse_dynamics(robot, q[b], qd[b] + delta, qdd[b]) - \
+                   dense_inverse_dynamics(robot, q[b], qd[b] - delta, qdd[b])) / (2 * step)
+            assert np.allclose(dtau_dq[b,:,jid], dq, rtol = 0, atol = 1e-6)
+            assert np.allclose(dtau_dqd[b,:,jid], dqd, rtol = 0, atol = 1e-6)
+    single = inverse_dynamics_derivatives(robot, q[0], qd[0], qdd[0])
+    assert np.allclose(single[0], dtau_dq[0], rtol = 0, atol = 1e-12)
+    assert np.allclose(single[1], dtau_dqd[0], rtol = 0, atol = 1e-12)
+
+def test_mass_matrix_sparsity_cached(arm):
+    rows, cols = mass_matrix_sparsity(arm)
+    assert mass_matrix_sparsity(arm)[0] is rows
+    # value only updates keep it (with the other structure caches), structure changes rebuild it
+    arm.set_link_inertial_by_name("l1", 3.0, 0.05, 0.001, 0, 0.06, 0.001, 0.02)
+    assert mass_matrix_sparsity(arm)[0] is rows
+    arm.clear_cache()
+    assert mass_matrix_sparsity(arm)[0] is not rows
+    assert np.array_equal(mass_matrix_sparsity(arm)[0], rows)
@@ -0,0 +1,22 @@
+import numpy as np
+from ..Dynamics import mass_matrix
+from ..Factorization import ltl_factor, ltl_solve
+from .conftest import random_state
+
+def test_ltl_factorization(robot):
+    q, _, b = random_state(robot)
+    H = mass_matrix(robot, q)
+    L = ltl_factor(robot, H)
+    # L has the sparsity of the lower triangle of H and L^T L = H
+    assert np.all(L[:, H[0] == 0] == 0) and np.all(np.triu(L[0], 1) == 0)
+    assert np.allclose(np.matmul(np.swapaxes(L, -1, -2), L), H, rtol = 0, atol = 1e-10)
+    assert np.allclose(ltl_solve(robot, L, b), np.linalg.solve(H, b[..., None])[..., 0], rtol = 0, atol = 1e-9)
+    assert np.allclose(ltl_solve(robot, L[0], b[0]), np.linalg.solve(H[0], b[0]), rtol = 0, atol = 1e-9)
+
+def test_ltl_factorization_packed(robot):
+    q, _, b = random_state(robot)
+    packed, (rows, cols) = mass_matrix(robot, q, packed = True)
+    L = ltl_factor(robot, mass_matrix(robot, q))
+    L_packed = ltl_factor(robot, packed, packed = True)
+    assert np.allclose(L_packed, L[:, rows, cols], rtol = 0, atol = 1e-12)
+    assert np.allclose(ltl_solve(robot, L_packed, b, packed = True), ltl_solve(robot, L, b), rtol = 0, atol = 1e-12)
@@ -0,0 +1,169 @@
+import numpy as np
+import pytest
+from ..URDFParser import URDFParser
+from ..Geometry import Geometry, Mesh, load_mesh, STL_HEADER_BYTES, STL_TRIANGLE
+
+# a unit square in the z = 0 plane as two triangles
+SQUARE = np.array([[[0,0,0], [1,0,0], [1,1,0]], [[0,0,0], [1,1,0], [0,1,0]]], dtype = np.float32)
+
+def write_binary_stl(path, triangles):
+    records = np.zeros(len(triangles), dtype = STL_TRIANGLE)
+    records["vertices"] = triangles
+    with open(path, "wb") as stl_file:
+        stl_file.write(b"\0" * 80 + np.uint32(len(triangles)).tobytes())
+        stl_file.write(records.tobytes())
+
+def write_ascii_stl(path, triangles):
+    lines = ["solid square"]
+    for triangle in triangles:
+        lines += ["facet normal 0 0 1", "outer loop"] + ["vertex %g %g %g" % tuple(vertex) for vertex in triangle]
+        lines += ["endloop", "endfacet"]
+    lines.append("endsolid square")
+    with open(path, "w") as stl_file:
+        stl_file.write("\n".join(lines))
+
+def mesh_geometry(filename, base_dir = None, scale = None):
+    geometry = Geometry("visual", "mesh", link = "part")
+    geometry.filename = filename
+    geometry.base_dir = base_dir
+    if scale is not None:
+        geometry.scale = np.array(scale, dtype = float)
+    return geometry
+
+################
+#    Meshes    #
+################
+
+def test_binary_stl_is_memory_mapped(tmp_path):
+    path = str(tmp_path / "square.stl")
+    write_binary_stl(path, SQUARE)
+    assert (tmp_path / "square.stl").stat().st_size == STL_HEADER_BYTES + 2 * STL_TRIANGLE.itemsize
+    mesh = load_mesh(path, scale = [2, 1, 1])
+    assert isinstance(mesh.triangles, np.memmap) and not mesh.triangles.flags.writeable
+    assert mesh.get_num_faces() == 2
+    assert np.array_equal(mesh.get_triangles(), SQUARE * [2, 1, 1])
+    vertices, faces = mesh.get_vertices_faces()
+    assert len(vertices) == 4 and np.array_equal(vertices[faces], SQUARE * [2, 1, 1])
+
+def test_empty_binary_stl(tmp_path):
+    path = str(tmp_path / "empty.stl")
+    write_binary_stl(path, np.zeros((0,3,3), dtype = np.float32))
+    mesh = load_mesh(path)
+    assert mesh.get_num_faces() == 0 and mesh.get_bounding_sphere()[1] == 0
+
+def test_ascii_stl(tmp_path):
+    path = str(tmp_path / "square.stl")
+    write_ascii_stl(path, SQUARE)
+    assert np.array_equal(load_mesh(path).get_triangles(), SQUARE)
+
+def test_obj_fan_triangulation(tmp_path):
+    # the square as one quad (with texture/normal indices) and a triangle using negative (relative) indices
+    path = tmp_path / "square.obj"
+    path.write_text("# square\nv 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nvn 0 0 1\n" + \
+                    "f 1/1/1 2/2/1 3/3/1 4/4/1\nf -4//1 -3//1 -1//1\n")
+    triangles = load_mesh(str(path)).get_triangles()
+    assert np.array_equal(triangles[:2], SQUARE)
+    assert np.array_equal(triangles[2], [[0,0,0], [1,0,0], [0,1,0]])
+
+def test_unsupported_mesh(tmp_path):
+    with pytest.raises(ValueError):
+        load_mesh(str(tmp_path / "part.dae"))
+
+def test_mesh_is_cached(tmp_path):
+    write_binary_stl(str(tmp_path / "square.stl"), SQUARE)
+    geometry = mesh_geometry("square.stl", str(tmp_path))
+    mesh = geometry.get_mesh()
+    assert geometry.get_mesh() is mesh and geometry.transformed(np.eye(4)).get_mesh() is mesh
+    with pytest.raises(ValueError):
+        Geometry("visual", "box").get_mesh()
+
+#########################
+#    Mesh Resolution    #
+#########################
+
+def test_package_resolution(tmp_path, monkeypatch):
+    (tmp_path / "pkg" / "meshes").mkdir(parents = True)
+    (tmp_path / "pkg" / "urdf").mkdir()
+    write_binary_stl(str(tmp_path / "pkg" / "meshes" / "square.stl"), SQUARE)
+    expected = str(tmp_path / "pkg" / "meshes" / "square.stl")
+    monkeypatch.delenv("ROS_PACKAGE_PATH", raising = False)
+    # a parent directory of the URDF named after the package
+    assert mesh_geometry("package://pkg/meshes/square.stl", str(tmp_path / "pkg" / "urdf")).get_mesh_path() == expected
+    # package_dirs and ROS_PACKAGE_PATH
+    geometry = mesh_geometry("package://pkg/meshes/square.stl")
+    assert geometry.get_mesh_path({"pkg": str(tmp_path / "pkg")}) == expected
+    monkeypatch.setenv("ROS_PACKAGE_PATH", str(tmp_path))
+    assert geometry.get_mesh_path() == expected
+    with pytest.raises(FileNotFoundError):
+        mesh_geometry("package://other/meshes/square.stl").get_mesh_path()
+    # file:// and relative filenames
+    assert mesh_geometry("file://" + expected).get_mesh_path() == expected
+    assert mesh_geometry("../meshes/square.stl", str(tmp_path / "pkg" / "urdf")).get_mesh_path() == expected
+
+#############################
+#    Bounding Primitives    #
+#############################
+
+def test_bounding_primitives(tmp_path):
+    box = Geometry("collision", "box")
+    box.size = [1, 2, 4]
+    lower, upper = box.get_bounding_box()
+    assert np.array_equal(lower, [-0.5, -1, -2]) and np.array_equal(upper, [0.5, 1, 2])
+    assert box.get_bounding_sphere()[1] == pytest.approx(np.sqrt(21) / 2)
+    cylinder = Geometry("collision", "cylinder")
+    cylinder.radius, cylinder.length = 0.5, 2
+    assert np.array_equal(cylinder.get_bounding_box()[1], [0.5, 0.5, 1])
+    sphere = Geometry("collision", "sphere")
+    sphere.radius = 0.3
+    assert np.array_equal(sphere.get_bounding_box()[0], [-0.3, -0.3, -0.3]) and sphere.get_bounding_sphere()[1] == 0.3
+    write_binary_stl(str(tmp_path / "square.stl"), SQUARE)
+    mesh = mesh_geometry("square.stl", str(tmp_path), scale = [2, -1, 1])
+    lower, upper = mesh.get_bounding_box()
+    assert np.array_equal(lower, [0, -1, 0]) and np.array_equal(upper, [2, 0, 0])
+    center, radius = mesh.get_bounding_sphere()
+    assert np.array_equal(center, [1, -0.5, 0]) and radius == pytest.approx(np.sqrt(1.25))
+
+def test_decimation():
+    # a fine grid of the unit square collapses to fewer faces covering the same extent
+    ticks = np.linspace(0, 1, 11)
+    triangles = []
+    for x0, x1 in zip(ticks[:-1], ticks[1:]):
+        for y0, y1 in zip(ticks[:-1], ticks[1:]):
+            triangles += [[[x0,y0,0], [x1,y0,0], [x1,y1,0]], [[x0,y0,0], [x1,y1,0], [x0,y1,0]]]
+    mesh = Mesh(np.array(triangles, dtype = np.float32))
+    decimated = mesh.decimate(0.25)
+    assert 0 < decimated.get_num_faces() < mesh.get_num_faces()
+    assert np.all(decimated.get_triangles() >= 0) and np.all(decimated.get_triangles() <= 1)
+    assert mesh.decimate(10).get_num_faces() == 0
+    assert mesh.decimate(1e-3).get_num_faces() == mesh.get_num_faces()
+
+#####################
+#    Fixed Joints    #
+#####################
+
+def test_geometry_moves_through_fixed_joints(symbolic):
+    urdf = b"""<?xml version="1.0"?>
+<robot name="gripper">
+  <link name="base"/>
+  <link name="palm"><visual><geometry><box size="0.1 0.1 0.1"/></geometry></visual></link>
+  <link name="camera">
+    <visual name="lens"><origin xyz="0 0 0.5" rpy="0 0 0"/><geometry><cylinder radius="0.1" length="0.2"/></geometry></visual>
+    <collision><geometry><sphere radius="0.2"/></geometry></collision>
+  </link>
+  <joint name="j1" type="revolute"><parent link="base"/><child link="palm"/><origin xyz="0 0 0" rpy="0 0 0"/><axis xyz="0 0 1"/></joint>
+  <joint name="mount" type="fixed"><parent link="palm"/><child link="camera"/><origin xyz="0.1 0 0" rpy="0 0 1.5707963267948966"/></joint>
+</robot>
+"""
+    robot = URDFParser().parse_or_raise(urdf, symbolic = symbolic, verbose = False)
+    palm = robot.get_link_by_name("palm")
+    assert robot.get_link_by_name("camera") is None
+    assert [geometry.gtype for geometry in palm.get_visuals()] == ["box", "cylinder"]
+    assert [geometry.gtype for geometry in palm.get_collisions()] == ["sphere"]
+    # the camera frame is at (0.1, 0, 0) rotated by 90 degrees about z so the lens (0.5 up) stays above it
+    expected = np.array([[0,-1,0,0.1], [1,0,0,0], [0,0,1,0.5], [0,0,0,1]])
+    lens = palm.get_visuals()[1]
+    assert lens.name == "lens" and lens.link == "camera"
+    assert np.allclose(lens.get_pose(), expected, rtol = 0, atol = 1e-9)
+    expected[2,3] = 0
+    assert np.allclose(palm.get_collisions()[0].get_pose(), expected, rtol = 0, atol = 1e-9)
+    assert np.array_equal(palm.get_visuals()[0].get_pose(), np.eye(4))
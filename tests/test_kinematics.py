@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from ..Kinematics import forward_kinematics, jacobians, jacobian_sparsity
+from .conftest import random_state, dense_model
+
+def test_forward_kinematics(robot):
+    q, _, _ = random_state(robot)
+    poses = forward_kinematics(robot, q)
+    for b in range(len(q)):
+        _, _, X0s, _, _ = dense_model(robot, q[b])
+        for jid, X0 in enumerate(X0s):
+            # X0 = [E 0; -E skew(p) E] with the link at rotation E^T and position p in the world
+            E = X0[:3,:3]
+            skew_p = -np.matmul(E.T, X0[3:,:3])
+            assert np.allclose(poses[b,jid+1,:3,:3], E.T, rtol = 0, atol = 1e-10)
+            assert np.allclose(poses[b,jid+1,:3,3], [skew_p[2,1], skew_p[0,2], skew_p[1,0]], rtol = 0, atol = 1e-10)
+    assert np.array_equal(poses[:,0], np.broadcast_to(np.eye(4), (len(q),4,4)))
+    links = [robot.get_num_joints() - 1, -1, 0]
+    assert np.allclose(forward_kinematics(robot, q, links), poses[:, np.array(links) + 1], rtol = 0, atol = 1e-12)
+    assert np.allclose(forward_kinematics(robot, q[0]), poses[0], rtol = 0, atol = 1e-12)
+
+def test_jacobians(robot):
+    q, _, _ = random_state(robot)
+    n = robot.get_num_joints()
+    body = jacobians(robot, q, kind = "body")
+    spatial = jacobians(robot, q, kind = "spatial")
+    geometric = jacobians(robot, q)
+    for b in range(len(q)):
+        parents, _, X0s, S, _ = dense_model(robot, q[b])
+        for jid in range(n):
+            # column j of link i is iX_j S_j = X0_i X0_j^-1 S_j for the link and its ancestors, zero otherwise
+            reference = np.zeros((6, n))
+            ancestor_id = jid
+            while ancestor_id != -1:
+                reference[:, ancestor_id] = np.matmul(X0s[jid], np.linalg.solve(X0s[ancestor_id], S[ancestor_id]))
+                ancestor_id = parents[ancestor_id]
+            assert np.allclose(body[b,jid], reference, rtol = 0, atol = 1e-10)
+            assert np.allclose(spatial[b,jid], np.linalg.solve(X0s[jid], reference), rtol = 0, atol = 1e-10)
+            # the body velocity of the link origin rotated into the world
+            R = np.kron(np.eye(2), X0s[jid][:3,:3].T)
+            assert np.allclose(geometric[b,jid], np.matmul(R, reference), rtol = 0, atol = 1e-10)
+    values, (rows, cols) = jacobians(robot, q, packed = True)
+    assert np.array_equal((rows, cols), jacobian_sparsity(robot))
+    assert np.array_equal(values, np.swapaxes(geometric[:, rows, :, cols], 0, 1))
+    links = [n - 1, 0]
+    assert np.allclose(jacobians(robot, q[0], links), geometric[0, links], rtol = 0, atol = 1e-12)
+    with pytest.raises(ValueError):
+        jacobians(robot, q, kind = "hybrid")
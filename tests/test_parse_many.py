@@ -0,0 +1,14 @@
+from lxml import etree
+from ..URDFParser import URDFParser, WorkerTraceback
+from .conftest import ARM_URDF
+
+def test_parse_many_keeps_worker_errors(tmp_path):
+    missing = str(tmp_path / "missing.urdf")
+    for workers in (1, 2):
+        robots = URDFParser().parse_many([ARM_URDF, missing, b"<robot name='broken'>"], workers = workers, verbose = False)
+        assert robots[0].get_num_joints() == 3
+        assert isinstance(robots[1], FileNotFoundError)
+        assert isinstance(robots[2], etree.XMLSyntaxError)
+        for error in robots[1:]:
+            assert isinstance(error.__cause__, WorkerTraceback)
+            assert "Traceback" in str(error.__cause__)
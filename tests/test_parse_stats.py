@@ -0,0 +1,47 @@
+import logging
+import threading
+from ..URDFParser import URDFParser
+from ..ParseStats import ParseStats, count
+from .conftest import ARM_URDF
+
+STAGES = ("load", "parse_links", "parse_joints", "remove_fixed_joints", "dfs_order_update", "bfs_order", \
+          "build_subtree_lists", "build_topology")
+
+def test_parse_stats(symbolic):
+    parser = URDFParser()
+    robot = parser.parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False)
+    stats = robot.parse_stats
+    assert stats is parser.stats and stats.error is None and not stats.cache_hit
+    for stage in STAGES:
+        assert stats.calls[stage] == 1 and stats.times[stage] >= 0
+    assert sum(stats.times.values()) <= stats.total_time
+    assert stats.counters["fixed_joints_removed"] == 1
+    assert stats.to_dict()["counters"] == stats.counters
+
+def test_parse_stats_cache_hit(tmp_path):
+    URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = False, verbose = False)
+    stats = URDFParser(str(tmp_path)).parse_or_raise(ARM_URDF, symbolic = False, verbose = False).parse_stats
+    assert stats.cache_hit and "load" not in stats.times and stats.calls["load_cached"] == 1
+
+def test_parse_stats_error(caplog):
+    parser = URDFParser()
+    with caplog.at_level(logging.ERROR):
+        assert parser.parse(b"<robot name='broken'><link", verbose = False) is None
+    assert parser.stats.error is not None and "Could not parse" in caplog.text
+    assert parser.stats.to_dict()["error"] == repr(parser.stats.error)
+
+def test_counters_are_per_thread():
+    # counts go to the stats active on the counting thread only (and are dropped without any)
+    count("ignored")
+    stats = ParseStats()
+    other = ParseStats()
+    def count_other():
+        with other:
+            count("operations", 2)
+    with stats:
+        count("operations")
+        thread = threading.Thread(target = count_other)
+        thread.start()
+        thread.join()
+    count("operations")
+    assert stats.counters == {"operations": 1} and other.counters == {"operations": 2}
@@ -0,0 +1,75 @@
+import sys
+import threading
+import types
+import numpy as np
+import pytest
+from ..RobotRegistry import RobotRegistry
+from ..SpatialAlgebra import Origin
+from .conftest import ARM_URDF
+
+@pytest.fixture
+def registry_path(tmp_path):
+    path = tmp_path / "arm.urdf"
+    path.write_bytes(ARM_URDF)
+    return str(path)
+
+def test_registry_robots_are_read_only(registry_path):
+    robot = RobotRegistry().get(registry_path, symbolic = False)
+    link = robot.get_link_by_name("l1")
+    joint = robot.get_joint_by_name("j1")
+    Imat = link.get_spatial_inertia()
+    for update in (lambda: joint.set_damping(1.0), lambda: joint.set_origin_xyz([0, 0, 0]), \
+                   lambda: joint.set_type("revolute", [0, 0, 1]), lambda: link.set_spatial_inertia(np.eye(6)), \
+                   lambda: link.set_inertia(1.0, 0.1, 0, 0, 0.1, 0, 0.1), lambda: robot.remove_joint(joint), \
+                   lambda: robot.set_link_inertial_by_name("l1", 1.0, 0.1, 0, 0, 0.1, 0, 0.1)):
+        with pytest.raises(RuntimeError):
+            update()
+    assert joint.get_damping() == 0 and np.array_equal(link.get_spatial_inertia(), Imat)
+    clone = robot.clone()
+    clone.get_joint_by_name("j1").set_damping(1.0)
+    assert clone.get_joint_by_name("j1").get_damping() == 1.0 and joint.get_damping() == 0
+
+def test_registry_counts_lazily_filled_caches(registry_path):
+    registry = RobotRegistry()
+    robot = registry.get(registry_path)
+    nbytes = registry.get_stats()["bytes"]
+    robot.get_Xmat_Func_all()
+    robot.to_arrays()
+    assert registry.get_stats()["bytes"] > nbytes
+
+def test_registry_counts_lambdified_functions(registry_path):
+    registry = RobotRegistry()
+    robot = registry.get(registry_path)
+    nbytes = registry.get_stats()["bytes"]
+    function = robot.get_Xmat_Func_all()
+    added = registry.get_stats()["bytes"] - nbytes
+    # the closure and the lambdified function it captures with its code object and namespace (but not numpy itself)
+    lambdified = [cell.cell_contents for cell in function.__closure__ if isinstance(cell.cell_contents, types.FunctionType)][0]
+    assert added >= sys.getsizeof(function) + sys.getsizeof(lambdified.__code__) + sys.getsizeof(lambdified.__globals__)
+    assert added < 1024*1024
+
+def test_restored_origins_are_thread_safe():
+    # concurrent first reads of a restored origin either build it or see it fully built (never partially)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errors = []
+    try:
+        for _ in range(200):
+            origin = Origin(symbolic = False)
+            origin.restore([0.1, 0.2, 0.3], [0.3, 0.2, 0.1], build_fixed = True)
+            barrier = threading.Barrier(4)
+            def read():
+                barrier.wait()
+                try:
+                    assert origin.rotation is not None and origin.translation is not None
+                    assert origin.Xmat_sp_fixed_hom_inv is not None
+                except Exception as error:
+                    errors.append(error)
+            threads = [threading.Thread(target = read) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
@@ -0,0 +1,11 @@
+import io
+from ..URDFParser import URDFParser
+from .conftest import ARM_URDF, assert_robots_equal
+
+def test_source_types(tmp_path):
+    path = tmp_path / "arm.urdf"
+    path.write_bytes(ARM_URDF)
+    robot = URDFParser().parse_or_raise(ARM_URDF, symbolic = False, verbose = False)
+    with open(path, "r") as text_file, open(path, "rb") as binary_file:
+        for source in (str(path), bytearray(ARM_URDF), io.StringIO(ARM_URDF.decode()), text_file, binary_file):
+            assert_robots_equal(robot, URDFParser().parse_or_raise(source, symbolic = False, verbose = False))
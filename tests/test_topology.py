@@ -0,0 +1,43 @@
+import numpy as np
+from ..URDFParser import URDFParser
+from ..Topology import Topology
+from ..benchmarks.synthetic import random_tree_urdf
+
+def get_ancestors(parents, jid):
+    # nearest first by walking the parents
+    ancestors = []
+    while parents[jid] != -1:
+        jid = parents[jid]
+        ancestors.append(jid)
+    return ancestors
+
+def test_topology_matches_parent_walks():
+    robot = URDFParser().parse_or_raise(random_tree_urdf(40).encode(), symbolic = False, verbose = False)
+    n = robot.get_num_joints()
+    parents = robot.get_parent_id_array()
+    ancestors = [get_ancestors(parents, jid) for jid in range(n)]
+    for jid in range(n):
+        assert robot.get_ancestors_by_id(jid) == ancestors[jid]
+        assert robot.get_subtree_by_id(jid) == [other for other in range(n) if other == jid or jid in ancestors[other]]
+        for other in range(n):
+            assert robot.get_is_ancestor_of(jid, other) == (jid in ancestors[other])
+            assert robot.get_is_in_subtree_of(other, jid) == (other == jid or jid in ancestors[other])
+    assert robot.get_subtree_by_id(-1) == [-1] + list(range(n))
+    assert robot.get_total_ancestor_count() == sum([len(ids) for ids in ancestors])
+    assert robot.get_total_subtree_count() == sum([len(ids) for ids in ancestors]) + n
+    # bfs levels are the depths
+    topology = robot.get_topology()
+    assert np.array_equal(topology.depth, [len(ids) for ids in ancestors])
+    for level in range(robot.get_max_bfs_level() + 1):
+        assert sorted(robot.get_ids_by_bfs_level(level)) == [jid for jid in range(n) if len(ancestors[jid]) == level]
+    assert robot.get_max_bfs_width() == max(np.bincount(topology.depth))
+    assert robot.get_ids_by_bfs_level(robot.get_max_bfs_level() + 1) == []
+    matrix = topology.get_ancestor_matrix()
+    assert not matrix.flags.writeable
+    assert np.array_equal(matrix, [[jid in ancestors[other] for other in range(n)] for jid in range(n)])
+
+def test_topology_of_empty_robot():
+    topology = Topology([], [])
+    assert topology.get_subtree(-1) == [-1]
+    assert topology.get_total_ancestor_count() == 0
+    assert topology.get_ids_by_level(0).shape == (0,)
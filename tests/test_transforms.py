@@ -0,0 +1,68 @@
+import os
+from fractions import Fraction
+import numpy as np
+import pytest
+import sympy as sp
+from ..CodeGenerator import load_kernels, KERNEL_DIR
+from ..URDFParser import URDFParser
+from ..Dynamics import inverse_dynamics
+from ..SpatialAlgebra import snap_to_rational
+from .conftest import ARM_URDF, random_state
+
+@pytest.fixture
+def rigid_arm(symbolic):
+    return URDFParser().parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False, rigid = True)
+
+def test_default_snapping_is_unchanged(arm):
+    # by default each entry of X_free * X_fixed is snapped as it always was (so existing Xmats are unchanged)
+    for joint in arm.get_joints_ordered_by_id():
+        if joint.symbolic:
+            Xmat = joint.build_free_transformation_matrix(joint.theta) * joint.origin.Xmat_sp_fixed
+            assert joint.get_transformation_matrix() == sp.nsimplify(Xmat, tolerance=1e-6, rational=True).evalf()
+        else:
+            assert np.array_equal(joint.get_fixed_transformation_matrix(), snap_to_rational(joint.origin.Xmat_sp_fixed, 1000000))
+
+def test_snap_to_rational_matches_fractions():
+    # the exact values skipped by the fast path and the snapped ones are bit-identical to limit_denominator
+    rng = np.random.default_rng(0)
+    values = np.concatenate((rng.uniform(-4, 4, 200), np.cos(rng.uniform(-4, 4, 200)), np.round(rng.uniform(-4, 4, 200), 3), \
+                             [0.0, -0.0, 1.0, -1.0, 0.5, 2.0**-19, 2.0**-20, 3 * 2.0**-21, 1e300, 5e-324]))
+    for max_denominator in (1, 7, 1000000, 1000000000000):
+        expected = np.array([float(Fraction(value).limit_denominator(max_denominator)) for value in values])
+        assert snap_to_rational(values, max_denominator).tobytes() == expected.tobytes()
+        assert snap_to_rational(values.reshape(-1, 2), max_denominator).tobytes() == expected.tobytes()
+
+def test_fixed_transforms_are_rigid(rigid_arm):
+    for joint in rigid_arm.get_joints_ordered_by_id():
+        A, B, K = joint.get_transformation_matrix_coefficients()
+        X = A + K if joint.jtype == "revolute" else K
+        E = X[:3,:3]
+        assert np.allclose(np.matmul(E.T, E), np.eye(3), rtol = 0, atol = 1e-14)
+        assert np.allclose(X[3:,3:], E, rtol = 0, atol = 0)
+        # the lower left block is -E skew(r) so E^T times it is skew symmetric
+        ErE = np.matmul(E.T, X[3:,:3])
+        assert np.allclose(ErE, -ErE.T, rtol = 0, atol = 1e-14)
+
+@pytest.mark.parametrize("rigid, tolerance", [(True, 1e-10), (False, 1e-5)], ids = ["rigid", "snapped"])
+def test_compact_matches_dense(symbolic, rigid, tolerance):
+    # exactly with rigid transforms and to the snapping tolerance otherwise
+    robot = URDFParser().parse_or_raise(ARM_URDF, symbolic = symbolic, verbose = False, rigid = rigid)
+    q, _, _ = random_state(robot, batch = 20)
+    compact = robot.eval_transforms(q).to_matrix()
+    assert np.max(np.abs(robot.eval_Xmats(q) - compact)) < tolerance
+    Xmat_Func_all = robot.get_Xmat_Func_all()
+    assert np.max(np.abs(np.array([Xmat_Func_all(sample) for sample in q]) - compact)) < tolerance
+
+def test_kernels_match_engines(rigid_arm, tmp_path):
+    q, qd, qdd = random_state(rigid_arm, batch = 20)
+    kernels = load_kernels(rigid_arm, str(tmp_path))
+    assert np.max(np.abs(kernels.inverse_dynamics(q, qd, qdd) - inverse_dynamics(rigid_arm, q, qd, qdd))) < 1e-10
+
+def test_kernels_default_next_to_urdf(tmp_path):
+    path = tmp_path / "arm.urdf"
+    path.write_bytes(ARM_URDF)
+    robot = URDFParser().parse_or_raise(str(path), symbolic = False, verbose = False)
+    kernels = load_kernels(robot)
+    assert os.path.dirname(kernels.__file__) == str(tmp_path / KERNEL_DIR)
+    with pytest.raises(ValueError):
+        load_kernels(URDFParser().parse_or_raise(ARM_URDF, symbolic = False, verbose = False))
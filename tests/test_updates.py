@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from ..URDFParser import URDFParser
+from .conftest import ARM_URDF, assert_robots_equal
+
+def test_updates_match_reparse(arm, symbolic):
+    # jt and tool are merged away by the fixed joint
+    arm.set_joint_origin_by_name("jt", xyz = [0.1, 0.2, 0.3], rpy = [0.2, 0, 0])
+    arm.set_link_inertial_by_name("tool", 1.0, 0.1, 0, 0, 0.1, 0, 0.1, com = [0, 0, 0.1])
+    arm.set_joint_origin_by_name("j2", rpy = [0, 0.4, 0])
+    arm.set_link_inertial_by_name("l1", 3.0, 0.05, 0.001, 0, 0.06, 0.001, 0.02)
+    urdf = ARM_URDF.replace(b'<origin xyz="0.02 0.03 0.15" rpy="0.7854 0 1.5708"/>', b'<origin xyz="0.1 0.2 0.3" rpy="0.2 0 0"/>') \
+                   .replace(b'<origin xyz="0 0 0.02" rpy="0 0 0"/><mass value="0.2"/><inertia ixx="0.001" ixy="0" ixz="0" iyy="0.001" iyz="0" izz="0.001"/>', \
+                            b'<origin xyz="0 0 0.1" rpy="0 0 0"/><mass value="1.0"/><inertia ixx="0.1" ixy="0" ixz="0" iyy="0.1" iyz="0" izz="0.1"/>') \
+                   .replace(b'rpy="0.3 -0.7 1.1"', b'rpy="0 0.4 0"') \
+                   .replace(b'<mass value="2.0"/>', b'<mass value="3.0"/>')
+    reparsed = URDFParser().parse_or_raise(urdf, symbolic = symbolic, verbose = False)
+    assert_robots_equal(reparsed, arm)
+
+def test_update_errors(arm):
+    Imat = arm.get_link_by_name("l1").get_spatial_inertia()
+    with pytest.raises(KeyError):
+        arm.set_joint_origin_by_name("missing", xyz = [0, 0, 0])
+    with pytest.raises(ValueError):
+        arm.set_link_inertial_by_name("l1", 1.0, 0.1, 0, 0, 0.1, 0, 0.1, com = [0, 0])
+    clone = arm.clone()
+    arm.read_only = True
+    with pytest.raises(RuntimeError):
+        arm.set_link_inertial_by_name("l1", 1.0, 0.1, 0, 0, 0.1, 0, 0.1)
+    assert np.array_equal(arm.get_link_by_name("l1").get_spatial_inertia(), Imat)
+    clone.set_link_inertial_by_name("l1", 1.0, 0.1, 0, 0, 0.1, 0, 0.1)
+    clone.fixed_joint_merges = None
+    with pytest.raises(RuntimeError):
+        clone.set_joint_origin_by_name("j1", xyz = [0, 0, 0])